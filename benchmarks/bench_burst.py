@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连拍模式最高无丢帧速率基准测试
+
+用内存假剪贴板按固定速率连续复制 --frames 张互不相同的截图，驱动完整的监控循环，
+分别在普通模式和连拍模式下统计实际保存的帧数。剪贴板变化的检测方式可选:
+  - sequence: 每 50ms 读取一次序列号（与 Windows 相同）
+  - polling: 没有变化通知时的自适应轮询（Linux X11 无 TIMESTAMP 时）
+  - event: 变化时立即唤醒（Wayland 的 wl-paste --watch）
+连拍模式还会检查编号文件的顺序与复制顺序一致。输出每个速率下两种模式保存的帧数，
+以及没有丢帧的最高速率；连拍模式在 --expect 帧/秒及以下丢帧时以非零状态退出。
+
+用法: python benchmarks/bench_burst.py [--watcher sequence] [--rates 5,10,20,50,100,200] [--frames 60] [--size 640x400]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from PIL import Image  # noqa: E402
+
+from clipboard_backends import AdaptivePollingWatcher, ClipboardBackend, MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from screenshot_encoders import parse_dib_header  # noqa: E402
+from synthetic import GENERATORS, to_dib  # noqa: E402
+
+
+class WatchedMemoryClipboard(MemoryClipboardBackend):
+    """用指定方式检测变化的内存剪贴板，模拟各平台的监视器"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def create_watcher(self):
+        if self.watcher == 'sequence':
+            return ClipboardBackend.create_watcher(self)
+        if self.watcher == 'polling':
+            return AdaptivePollingWatcher()
+        return super().create_watcher()
+
+
+def variant(base, index):
+    """在第一个像素中写入序号，得到内容不同的截图"""
+    offset = parse_dib_header(base)[3]
+    data = bytearray(base)
+    data[offset:offset + 3] = index.to_bytes(3, 'little')
+    return bytes(data)
+
+
+def read_index(path):
+    """读取帧文件第一个像素中的序号（DIB 自下而上存储，第一个像素在最后一行的开头）"""
+    with Image.open(path) as image:
+        b, g, r = image.convert('RGB').getpixel((0, image.height - 1))
+    return b | (g << 8) | (r << 16)
+
+
+def run(workdir, watcher, burst, frames, rate):
+    """
+    按 rate 帧/秒复制 frames 张截图
+
+    Returns:
+        tuple: (保存的帧数, 帧的序号列表（仅连拍）)
+    """
+    clipboard = WatchedMemoryClipboard(watcher)
+    save_path = workdir / f"{'burst' if burst else 'normal'}_{rate:g}"
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        saver = ClipboardScreenshotSaver(save_path=str(save_path), clipboard=clipboard, headless=True)
+        saver.encoder_settings['png'] = {'compress_level': 1}
+        saver.encoder = saver.create_encoder()
+        saver.burst_settings.update(hotkey=None, idle_timeout=None, max_frames=None)
+        monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+        monitor.start()
+        while saver.worker_pool is None:
+            time.sleep(0.01)
+        session = saver.start_burst() if burst else None
+
+        start = time.perf_counter()
+        for index in range(1, frames + 1):
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            clipboard.set_dib(DATA[index])
+        # 给监控循环留出看到最后一帧的时间
+        time.sleep(0.3)
+        if burst:
+            saver.stop_burst().join()
+        saver.stop_monitoring()
+        monitor.join()
+
+    if not burst:
+        return len(list(save_path.glob('screenshot_*'))), None
+    files = sorted(session.directory.glob('frame_*'))
+    return len(files), [read_index(path) for path in files]
+
+
+DATA = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连拍模式最高无丢帧速率基准测试")
+    parser.add_argument('--watcher', choices=('sequence', 'polling', 'event'), default='sequence')
+    parser.add_argument('--rates', default='5,10,20,50,100,200', help="复制速率（帧/秒），逗号分隔")
+    parser.add_argument('--frames', type=int, default=60, help="每个速率复制的帧数")
+    parser.add_argument('--size', default='640x400')
+    parser.add_argument('--expect', type=float, default=50, help="连拍模式至少在此速率下不丢帧")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    base = to_dib(GENERATORS['ui'](width, height))
+    DATA.update((index, variant(base, index)) for index in range(1, args.frames + 1))
+    rates = [float(rate) for rate in args.rates.split(',')]
+
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_burst_'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    failures = []
+    best = {False: 0, True: 0}
+    lossless = {False: True, True: True}
+    try:
+        print(f"检测方式 {args.watcher}，每个速率复制 {args.frames} 帧 {width}x{height}")
+        print(f"{'速率(帧/秒)':<12}{'普通模式':>12}{'连拍模式':>12}")
+        for rate in rates:
+            saved = {}
+            for burst in (False, True):
+                count, order = run(workdir, args.watcher, burst, args.frames, rate)
+                saved[burst] = count
+                if count >= args.frames and lossless[burst]:
+                    best[burst] = rate
+                else:
+                    lossless[burst] = False
+                if burst and order != sorted(order):
+                    failures.append(f"{rate:g} 帧/秒时连拍文件的顺序与复制顺序不一致")
+                if burst and count < args.frames and rate <= args.expect:
+                    failures.append(f"连拍模式在 {rate:g} 帧/秒时丢失了 {args.frames - count} 帧")
+            print(f"{rate:<12g}{saved[False]:>8}/{args.frames:<3}{saved[True]:>8}/{args.frames:<3}")
+        print(f"无丢帧的最高速率: 普通模式 {best[False]:g} 帧/秒，连拍模式 {best[True]:g} 帧/秒")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DIB 解码内存与延迟基准测试
+
+对比两种把剪贴板 CF_DIB 数据变成像素的方式:
+  - 旧路径: Image.open(io.BytesIO(data)) 格式探测 + BMP 解码
+  - 新路径: 解析信息头后用 Image.frombuffer 直接在 memoryview 上解码
+
+每种方式在独立子进程中运行，报告每帧耗时和进程峰值RSS（仅 Linux/macOS）。
+
+用法: python benchmarks/bench_dib_decode.py [--width 3840] [--height 2160] [--frames 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+WORKER = r'''
+import io, json, resource, sys, time
+sys.path[:0] = {paths!r}
+from PIL import Image
+from screenshot_encoders import decode_dib
+
+def peak_mb():
+    # Linux 上优先读 VmHWM（exec 后重新计数），否则用 ru_maxrss
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+with open({source!r}, 'rb') as f:
+    data = f.read()
+baseline = peak_mb()
+
+def old_path(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+def new_path(data):
+    image = decode_dib(data)
+    image.load()
+    return image
+
+decode = {{'old': old_path, 'new': new_path}}[{variant!r}]
+decode(data)
+start = time.perf_counter()
+for _ in range({frames}):
+    image = decode(data)
+    image = None
+elapsed = (time.perf_counter() - start) / {frames}
+peak = peak_mb()
+print(json.dumps({{'ms': elapsed * 1000, 'peak_mb': peak,
+                  'extra_mb': peak - baseline, 'frame_mb': len(data) / 2**20}}))
+'''
+
+
+def run_variant(variant, source, args):
+    code = WORKER.format(paths=[ROOT, os.path.join(ROOT, 'benchmarks')], source=source,
+                         frames=args.frames, variant=variant)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DIB 解码内存与延迟基准测试")
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--frames', type=int, default=10)
+    args = parser.parse_args()
+
+    from synthetic import photographic, to_dib
+
+    # 在父进程中生成数据，子进程的峰值RSS只反映解码本身
+    with tempfile.NamedTemporaryFile(suffix='.dib', delete=False) as f:
+        f.write(to_dib(photographic(args.width, args.height).convert('RGBA')))
+        source = f.name
+    try:
+        results = {variant: run_variant(variant, source, args) for variant in ('old', 'new')}
+    finally:
+        os.remove(source)
+    print(f"帧大小: {args.width}x{args.height} 32bpp, DIB {results['new']['frame_mb']:.1f} MB")
+    for variant, label in (('old', '旧路径 (BytesIO + Image.open)'), ('new', '新路径 (frombuffer)')):
+        r = results[variant]
+        print(f"{label:<32} {r['ms']:8.2f} ms/帧  峰值RSS {r['peak_mb']:7.1f} MB  "
+              f"(读入数据后增加 {r['extra_mb']:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出编码器基准测试
+
+对每种编码器和每类合成截图，报告编码延迟、吞吐量（按原始DIB大小计算的MB/s）
+和输出文件大小。
+
+用法: python benchmarks/bench_encoders.py [--width 1920] [--height 1080] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_encoders import create_encoder, DEFAULT_ENCODER_SETTINGS  # noqa: E402
+from synthetic import corpus  # noqa: E402
+
+
+ENCODER_VARIANTS = [
+    ('png-1', {'format': 'png', 'png': {'compress_level': 1}}),
+    ('png-6', {'format': 'png', 'png': {'compress_level': 6}}),
+    ('png-9', {'format': 'png', 'png': {'compress_level': 9}}),
+    ('webp-lossless', {'format': 'webp', 'webp': {'lossless': True, 'quality': 80, 'method': 4}}),
+    ('webp-lossy', {'format': 'webp', 'webp': {'lossless': False, 'quality': 80, 'method': 4}}),
+    ('qoi', {'format': 'qoi'}),
+    ('dib', {'format': 'dib'}),
+]
+
+
+def bench_encoder(encoder, dib, repeat):
+    """返回 (平均延迟秒数, 输出字节数)"""
+    encoded = encoder.encode(dib)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoder.encode(dib)
+    return (time.perf_counter() - start) / repeat, len(encoded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输出编码器基准测试")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    samples = corpus(args.width, args.height)
+    print(f"{'编码器':<14}{'内容':<8}{'延迟(ms)':>10}{'MB/s':>10}{'输出(KB)':>12}{'压缩比':>8}")
+    for name, overrides in ENCODER_VARIANTS:
+        settings = dict(DEFAULT_ENCODER_SETTINGS, **overrides)
+        encoder = create_encoder(settings)
+        for kind, dib in samples:
+            latency, size = bench_encoder(encoder, dib, args.repeat)
+            throughput = len(dib) / 1024 / 1024 / latency if latency else float('inf')
+            print(f"{name:<14}{kind:<8}{latency * 1000:>10.1f}{throughput:>10.1f}"
+                  f"{size / 1024:>12.0f}{len(dib) / size:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导出基准测试
+
+在临时目录中生成 N 张已登记到索引的合成截图（默认 1000 张），分别导出为存储模式 zip、
+tar 和总览图，并与逐个读取、用 deflate 重新压缩的普通 zip（手动打包的做法）比较耗时。
+导出后校验归档中每个文件的内容与清单中的 SHA-256 一致。
+
+用法: python benchmarks/bench_export.py [--count 1000] [--workers 8] [--width 1920] [--height 1080]
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from screenshot_encoders import PngEncoder  # noqa: E402
+from screenshot_export import export_captures, select_captures, MANIFEST_NAME  # noqa: E402
+from screenshot_store import ScreenshotStore, content_hash  # noqa: E402
+from synthetic import GENERATORS, to_dib  # noqa: E402
+
+
+def make_folder(root, count, width, height):
+    """写入 count 张截图并登记到索引；用少量不同的底图加上唯一的文本块区分内容"""
+    encoder = PngEncoder(compress_level=1)
+    bases = [encoder.encode(to_dib(GENERATORS[kind](width, height, seed)))
+             for seed in range(4) for kind in ('ui', 'photo')]
+    store = ScreenshotStore(root)
+    entries = []
+    start = time.time() - count
+    for index in range(count):
+        base = bases[index % len(bases)]
+        # 在 IEND 之前插入一个 tEXt 块，文件内容各不相同且仍是合法的PNG
+        text = b'tEXt' + f'index\x00{index}'.encode()
+        chunk = len(text[4:]).to_bytes(4, 'big') + text + zlib.crc32(text).to_bytes(4, 'big')
+        data = base[:-12] + chunk + base[-12:]
+        path = root / f'screenshot_{index:06d}.png'
+        path.write_bytes(data)
+        entries.append({'hash': content_hash(data), 'path': path.name, 'size': len(data),
+                        'created': start + index, 'width': width, 'height': height,
+                        'source_format': 'png'})
+    store.add_many(entries)
+    return store
+
+
+def naive_zip(items, output):
+    """逐个读取并用 deflate 重新压缩，相当于手动选中文件后“压缩为zip”"""
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for item in items:
+            archive.write(item['path'], Path(item['path']).name)
+
+
+def verify(output, entries):
+    """归档中的文件与清单的哈希一致"""
+    expected = {entry.name: entry.sha256 for entry in entries}
+    if output.suffix == '.zip':
+        with zipfile.ZipFile(output) as archive:
+            names = [name for name in archive.namelist() if name != MANIFEST_NAME]
+            actual = {name: hashlib.sha256(archive.read(name)).hexdigest() for name in names}
+    else:
+        with tarfile.open(output) as archive:
+            actual = {member.name: hashlib.sha256(archive.extractfile(member).read()).hexdigest()
+                      for member in archive.getmembers() if member.name != MANIFEST_NAME}
+    return actual == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导出基准测试")
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_export_'))
+    failures = []
+    try:
+        shots = workdir / 'shots'
+        shots.mkdir()
+        start = time.perf_counter()
+        store = make_folder(shots, args.count, args.width, args.height)
+        items = select_captures(store)
+        total = sum(item['size'] for item in items)
+        print(f"已生成 {len(items)} 张截图（{total / 2**20:.0f} MB），用时 {time.perf_counter() - start:.1f}s")
+
+        print(f"{'方式':<22}{'耗时(s)':>10}{'输出(MB)':>12}{'校验':>8}")
+        for label, name, workers in (('zip 存储模式', 'export.zip', args.workers),
+                                     ('zip 存储模式（单线程）', 'export_serial.zip', 1),
+                                     ('tar', 'export.tar', args.workers),
+                                     ('总览图', 'sheet.jpg', args.workers)):
+            output = workdir / name
+            start = time.perf_counter()
+            entries, skipped = export_captures(items, output, workers=workers)
+            elapsed = time.perf_counter() - start
+            checked = '-' if output.suffix == '.jpg' else ('✅' if verify(output, entries) else '❌')
+            if checked == '❌' or skipped or len(entries) != len(items):
+                failures.append(label)
+            print(f"{label:<22}{elapsed:>10.2f}{output.stat().st_size / 2**20:>12.1f}{checked:>8}")
+
+        output = workdir / 'naive.zip'
+        start = time.perf_counter()
+        naive_zip(items, output)
+        elapsed = time.perf_counter() - start
+        print(f"{'zip deflate（逐个压缩）':<22}{elapsed:>10.2f}{output.stat().st_size / 2**20:>12.1f}{'-':>8}")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print(f"❌ 导出结果与清单不一致: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
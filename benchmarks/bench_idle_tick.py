@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+空闲轮询开销基准测试
+
+对比剪贴板内容未变化时，每次轮询的CPU耗时：
+  - 旧路径: 解码DIB -> 重新编码PNG -> MD5
+  - 新路径: ClipboardScreenshotSaver.get_fingerprint 直接对原始DIB字节计算指纹
+    （保存器使用内存假剪贴板，在临时目录中创建）
+
+用法: python benchmarks/bench_idle_tick.py [--width 3840] [--height 2160] [--ticks 20]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from clipboard_backends import MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+
+
+def make_dib(width, height):
+    """生成一张类似截图内容的DIB数据（CF_DIB格式，无文件头）"""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='DIB')
+    return buffer.getvalue()
+
+
+def old_tick(dib):
+    """旧实现: 解码后重新编码为PNG再计算MD5"""
+    image = Image.open(io.BytesIO(dib))
+    img_bytes = io.BytesIO()
+    image.save(img_bytes, format='PNG')
+    return hashlib.md5(img_bytes.getvalue()).hexdigest()
+
+
+def measure(func, dib, ticks):
+    """返回每次调用的平均CPU耗时（毫秒）"""
+    func(dib)
+    start = time.process_time()
+    for _ in range(ticks):
+        func(dib)
+    return (time.process_time() - start) * 1000 / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="空闲轮询开销基准测试")
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    dib = make_dib(args.width, args.height)
+    print(f"帧大小: {args.width}x{args.height}, DIB {len(dib) / 1024 / 1024:.1f} MB")
+
+    workdir = tempfile.mkdtemp(prefix='screenshot_idle_tick_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            saver = ClipboardScreenshotSaver(save_path='shots', clipboard=MemoryClipboardBackend(), headless=True)
+        old_ms = measure(old_tick, dib, args.ticks)
+        new_ms = measure(saver.get_fingerprint, dib, args.ticks)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"旧路径 (解码+PNG+MD5): {old_ms:8.2f} ms CPU/次")
+    print(f"新路径 (get_fingerprint): {new_ms:8.2f} ms CPU/次")
+    print(f"加速比: {old_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+
+用 `python -X importtime` 测量导入 clipboard_screenshot_saver 的耗时，并检查
+界面、快捷键、图像、平台相关的重量级模块，以及只有命令行、索引、IPC、导出、迁移和连拍
+才用到的模块没有在导入时被加载。
+发现回归时以非零状态码退出，可以放进构建脚本作为守卫。
+
+用法: python benchmarks/bench_import_time.py [--runs 5] [--max-ms 150]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULE = 'clipboard_screenshot_saver'
+
+# 这些模块必须等到第一次使用时才导入
+DEFERRED_MODULES = (
+    'tkinter', 'PIL', 'keyboard', 'pynput', 'pyperclip',
+    'win32clipboard', 'win32con', 'numpy',
+    'argparse', 'sqlite3', 'socketserver', 'subprocess',
+    'screenshot_ipc', 'screenshot_export', 'screenshot_migrate', 'screenshot_burst',
+)
+
+
+def import_profile():
+    """
+    在新进程中导入一次模块
+
+    Returns:
+        tuple: (累计导入耗时毫秒, 导入过的顶层模块名集合)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == MODULE:
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=150.0, help="导入耗时中位数上限")
+    args = parser.parse_args()
+
+    timings = []
+    eager = set()
+    for _ in range(args.runs):
+        elapsed, imported = import_profile()
+        timings.append(elapsed)
+        eager |= imported.intersection(DEFERRED_MODULES)
+
+    median = statistics.median(timings)
+    print(f"导入 {MODULE}: 中位数 {median:.1f} ms，最小 {min(timings):.1f} ms（{args.runs} 次）")
+
+    failed = False
+    if eager:
+        print(f"❌ 以下模块在导入时就被加载: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.max_ms:
+        print(f"❌ 导入耗时超过上限 {args.max_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ 启动耗时正常，重量级模块均为延迟导入")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+剪贴板多格式读取基准测试
+
+比较同一批截图以不同剪贴板格式到达时，每保存一张所花的 CPU 时间和延迟:
+  - dib: CF_DIB 位图，解码后编码为PNG（原有路径）
+  - png-reencode: 已编码的PNG，关闭 png_passthrough，解码后重新编码
+  - png-passthrough: 已编码的PNG，原样写盘
+  - file-reencode: 复制的图片文件，读取、解码后重新编码（不使用链接时的做法）
+  - file-link: 复制的图片文件，以硬链接放入保存目录
+
+每张截图内容不同，不会命中去重。
+
+用法: python benchmarks/bench_ingest.py [--width 1920] [--height 1080] [--count 10]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from clipboard_backends import MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from synthetic import GENERATORS, to_dib  # noqa: E402
+
+
+def make_saver(save_path, png_passthrough=True):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        saver = ClipboardScreenshotSaver(save_path=str(save_path), clipboard=MemoryClipboardBackend(), headless=True)
+        saver.encoder_settings['png_passthrough'] = png_passthrough
+        saver.encoder = saver.create_encoder()
+    return saver
+
+
+def measure(func, items):
+    """返回每项平均 (CPU毫秒, 墙钟毫秒)"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for item in items:
+            if not func(item):
+                raise RuntimeError("保存失败")
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    return cpu / len(items) * 1000, wall / len(items) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="剪贴板多格式读取基准测试")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--kinds', default='ui,photo')
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='screenshot_ingest_'))
+    cwd = os.getcwd()
+    os.chdir(root)  # 保存器在当前目录读写配置文件
+    try:
+        print(f"{'内容':<8}{'读取方式':<18}{'CPU(ms/张)':>12}{'延迟(ms/张)':>13}")
+        for kind in args.kinds.split(','):
+            images = [GENERATORS[kind](args.width, args.height, seed) for seed in range(args.count)]
+            dibs = [to_dib(image) for image in images]
+            pngs = []
+            sources = root / f'source_{kind}'
+            sources.mkdir()
+            files = []
+            for i, image in enumerate(images):
+                buffer = io.BytesIO()
+                image.save(buffer, 'PNG', compress_level=6)
+                pngs.append(buffer.getvalue())
+                files.append(sources / f'copied_{i}.png')
+                files[-1].write_bytes(pngs[-1])
+            del images
+
+            def reencode_file(path, saver=make_saver(root / f'{kind}_file_reencode', False)):
+                return saver.save_clipboard_image(path.read_bytes())
+
+            cases = [
+                ('dib', make_saver(root / f'{kind}_dib').save_clipboard_image, dibs),
+                ('png-reencode', make_saver(root / f'{kind}_png', False).save_clipboard_image, pngs),
+                ('png-passthrough', make_saver(root / f'{kind}_passthrough').save_clipboard_image, pngs),
+                ('file-reencode', reencode_file, files),
+                ('file-link', make_saver(root / f'{kind}_link').ingest_file, files),
+            ]
+            for name, func, items in cases:
+                cpu, wall = measure(func, items)
+                print(f"{kind:<8}{name:<18}{cpu:>12.2f}{wall:>13.2f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
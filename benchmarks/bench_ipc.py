@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IPC 接口负载测试
+
+在临时目录中运行完整的监控循环和 IPC 服务（内存假剪贴板），同时连接数百个客户端:
+  1. 广播: 所有客户端同时 wait，复制一张截图后每个客户端都应收到同一张
+  2. 跟随: 每个客户端从 latest 的 seq 开始用 wait(after=seq) 连续跟随，期间持续复制截图，
+     每个客户端都应按顺序收到每一张，没有遗漏
+  3. 查询: 所有客户端并发发送 latest / list / stats，统计吞吐量和延迟
+
+任何客户端出错、漏收或乱序时以非零状态退出。
+
+用法: python benchmarks/bench_ipc.py [--clients 300] [--captures 20] [--requests 50]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from PIL import Image  # noqa: E402
+
+from clipboard_backends import MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from screenshot_ipc import CaptureClient  # noqa: E402
+from synthetic import to_dib  # noqa: E402
+
+
+def numbered_dib(index):
+    image = Image.new('RGB', (64, 48), (40, 44, 52))
+    image.putpixel((0, 0), ((index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF))
+    return to_dib(image)
+
+
+def run_clients(count, target):
+    """启动 count 个客户端线程，返回 (线程, 结果列表, 错误列表, 与主线程同步开始的屏障)"""
+    results = [None] * count
+    errors = []
+    barrier = threading.Barrier(count + 1)
+
+    def worker(index):
+        try:
+            results[index] = target(index, barrier)
+        except Exception as e:
+            errors.append(f"客户端 {index}: {type(e).__name__}: {e}")
+            barrier.abort()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors, barrier
+
+
+def wait_for_waiters(server, expected, timeout=10):
+    """等到 expected 个 wait 请求都已到达服务端"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.requests >= expected:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] if samples else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPC 接口负载测试")
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--captures', type=int, default=20, help="跟随阶段复制的截图数")
+    parser.add_argument('--requests', type=int, default=50, help="查询阶段每个客户端的请求数")
+    args = parser.parse_args()
+
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        # 每个客户端在本进程中占用两个套接字（客户端和服务端各一个）
+        wanted = min(hard, max(soft, args.clients * 3 + 256))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    # 保存器的输出全部丢弃，测试结果写到原来的标准输出
+    out = sys.stdout
+
+    def log(message):
+        print(message, file=out, flush=True)
+
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_ipc_'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    clipboard = MemoryClipboardBackend()
+    failures = []
+    devnull = open(os.devnull, 'w')
+    redirect = contextlib.redirect_stdout(devnull)
+    redirect.__enter__()
+    saver = ClipboardScreenshotSaver(save_path=str(workdir / 'shots'), clipboard=clipboard, headless=True)
+    saver.ipc_settings['enabled'] = True
+    monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+    monitor.start()
+    while saver.ipc is None:
+        time.sleep(0.01)
+    server = saver.ipc
+    root = workdir / 'shots'
+    clients = [CaptureClient(root, timeout=30).connect() for _ in range(args.clients)]
+    log(f"已连接 {args.clients} 个客户端（{server.describe_address()}）")
+
+    try:
+        # 1. 广播
+        def broadcast(index, barrier):
+            barrier.wait()
+            return clients[index].wait(timeout=20)
+
+        before = server.requests
+        threads, results, errors, barrier = run_clients(args.clients, broadcast)
+        barrier.wait()
+        wait_for_waiters(server, before + args.clients)
+        start = time.perf_counter()
+        clipboard.set_dib(numbered_dib(0))
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        failures += errors
+        received = {(item['seq'], item['path']) for item in results if item}
+        delivered = sum(1 for item in results if item)
+        log(f"广播: {delivered}/{args.clients} 个客户端收到截图，全部送达用时 {elapsed * 1000:.1f} ms")
+        if delivered != args.clients or len(received) != 1:
+            failures.append(f"广播: {delivered} 个客户端收到，内容 {len(received)} 种")
+
+        # 2. 跟随
+        def follow(index, barrier):
+            client = clients[index]
+            seq = client.latest()['seq']
+            barrier.wait()
+            seen = []
+            while len(seen) < args.captures:
+                capture = client.wait(timeout=20, after=seq)
+                if capture is None:
+                    raise RuntimeError(f"等待超时，已收到 {len(seen)} 张")
+                seq = capture['seq']
+                seen.append(seq)
+            return seen
+
+        threads, results, errors, barrier = run_clients(args.clients, follow)
+        barrier.wait()
+        first = server._seq + 1
+        start = time.perf_counter()
+        for i in range(1, args.captures + 1):
+            clipboard.set_dib(numbered_dib(i))
+            # 等这一张保存并发布后再复制下一张，监控循环只会看到剪贴板的最新内容
+            deadline = time.monotonic() + 10
+            while server._seq < first + i - 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        failures += errors
+        expected = list(range(first, first + args.captures))
+        complete = sum(1 for seen in results if seen == expected)
+        log(f"跟随: {complete}/{args.clients} 个客户端按顺序收到全部 {args.captures} 张，用时 {elapsed:.2f}s")
+        if complete != args.clients:
+            failures.append(f"跟随: {args.clients - complete} 个客户端漏收或乱序")
+
+        # 3. 查询
+        def query(index, barrier):
+            client = clients[index]
+            latencies = []
+            barrier.wait()
+            for i in range(args.requests):
+                begin = time.perf_counter()
+                if i % 3 == 0:
+                    client.latest()
+                elif i % 3 == 1:
+                    client.recent(10)
+                else:
+                    client.stats()
+                latencies.append(time.perf_counter() - begin)
+            return latencies
+
+        threads, results, errors, barrier = run_clients(args.clients, query)
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        failures += errors
+        latencies = [value for item in results if item for value in item]
+        log(f"查询: {len(latencies)} 个请求，{len(latencies) / elapsed:.0f} 请求/秒，"
+            f"p50 {percentile(latencies, 50) * 1000:.2f} ms，p99 {percentile(latencies, 99) * 1000:.2f} ms")
+        stats = clients[0].stats()
+        log(f"服务端: 连接 {stats['connections']} 个，共处理 {stats['requests']} 个请求，"
+            f"发布 {stats['captures']} 张截图")
+    finally:
+        for client in clients:
+            client.close()
+        saver.stop_monitoring()
+        monitor.join()
+        redirect.__exit__(None, None, None)
+        devnull.close()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        for failure in failures[:20]:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ 所有客户端都正确收到了截图")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量迁移基准测试
+
+在临时目录中生成 N 个旧版本命名（screenshot_20241201_143022.png）、默认压缩级别的
+合成截图（默认 50000 个）并登记到索引，然后:
+  1. 对前 --sample 个文件试运行，确认不修改任何文件
+  2. 迁移一半后停止，模拟中断
+  3. 再次运行，从检查点继续迁移剩下的文件
+  4. 第三次运行应当没有任何需要迁移的文件
+最后检查: 每个文件恰好迁移一次、目录中不再有旧文件名、索引中的路径全部存在、
+抽样的新文件与原图逐像素一致。任何一项不满足时以非零状态退出。
+
+用法: python benchmarks/bench_migrate.py [--count 50000] [--format webp] [--workers N] [--width 320] [--height 200]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from PIL import Image  # noqa: E402
+
+from screenshot_encoders import create_encoder, encode_png, DEFAULT_ENCODER_SETTINGS  # noqa: E402
+from screenshot_migrate import migrate_folder, CHECKPOINT_FILENAME  # noqa: E402
+from screenshot_store import ScreenshotStore, content_hash  # noqa: E402
+from synthetic import GENERATORS  # noqa: E402
+
+
+def make_folder(root, count, width, height):
+    """写入 count 个旧版本命名的截图并登记到索引，返回 {文件名: 底图序号} 和底图"""
+    images = [GENERATORS[kind](width, height, seed) for seed in range(4) for kind in ('ui', 'photo')]
+    bases = [encode_png(image) for image in images]
+    store = ScreenshotStore(root)
+    entries, sources = [], {}
+    start = int(time.time()) - count - 3600
+    for index in range(count):
+        base = bases[index % len(bases)]
+        # 在 IEND 之前插入一个 tEXt 块，文件内容各不相同且仍是合法的PNG
+        text = b'tEXt' + f'index\x00{index}'.encode()
+        chunk = len(text[4:]).to_bytes(4, 'big') + text + zlib.crc32(text).to_bytes(4, 'big')
+        data = base[:-12] + chunk + base[-12:]
+        created = start + index
+        name = f"screenshot_{datetime.fromtimestamp(created).strftime('%Y%m%d_%H%M%S')}.png"
+        path = root / name
+        path.write_bytes(data)
+        os.utime(path, (created, created))
+        sources[name] = index % len(bases)
+        entries.append({'hash': content_hash(data), 'path': name, 'size': len(data), 'created': created,
+                        'width': width, 'height': height, 'source_format': 'png'})
+    store.add_many(entries)
+    return store, sources, images
+
+
+def listing(root):
+    return sorted(name for name in os.listdir(root) if name.startswith('screenshot_'))
+
+
+def show(label, report):
+    print(f"{label:<14}{report.processed:>8}{report.elapsed:>10.1f}{report.processed / max(report.elapsed, 1e-9):>10.0f}"
+          f"{report.size_before / 2**20 / max(report.elapsed, 1e-9):>10.1f}{report.saved / 2**20:>12.1f}"
+          f"{report.counts['failed']:>6}")
+
+
+def read_checkpoint(root):
+    """检查点中的迁移记录"""
+    with open(root / CHECKPOINT_FILENAME, encoding='utf-8') as f:
+        next(f)
+        for line in f:
+            yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量迁移基准测试")
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--format', default='webp', help="目标格式 png / webp / qoi / dib")
+    parser.add_argument('--workers', type=int, default=None, help="进程数（默认为CPU核数）")
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=200)
+    parser.add_argument('--sample', type=int, default=1000, help="试运行和逐像素抽查的文件数")
+    args = parser.parse_args()
+
+    settings = dict(DEFAULT_ENCODER_SETTINGS, format=args.format)
+    encoder = create_encoder(settings)
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_migrate_'))
+    failures = []
+    try:
+        shots = workdir / 'shots'
+        shots.mkdir()
+        start = time.perf_counter()
+        store, sources, images = make_folder(shots, args.count, args.width, args.height)
+        total = sum(entry.stat().st_size for entry in os.scandir(shots) if entry.name.startswith('screenshot_'))
+        print(f"已生成 {args.count} 个旧版本截图（{total / 2**20:.0f} MB），用时 {time.perf_counter() - start:.1f}s，"
+              f"目标格式 {encoder.name}，{args.workers or os.cpu_count()} 个进程")
+        print(f"{'阶段':<14}{'文件数':>8}{'耗时(s)':>10}{'文件/秒':>10}{'MB/秒':>10}{'节省(MB)':>12}{'失败':>6}")
+
+        before = listing(shots)
+        report = migrate_folder(shots, encoder, rename=True, workers=args.workers, dry_run=True,
+                                limit=args.sample, store=store)
+        show('试运行（抽样）', report)
+        if listing(shots) != before:
+            failures.append("试运行修改了文件")
+
+        half = migrate_folder(shots, encoder, rename=True, workers=args.workers, limit=args.count // 2, store=store)
+        show('迁移一半后中断', half)
+        rest = migrate_folder(shots, encoder, rename=True, workers=args.workers, store=store)
+        show('从检查点继续', rest)
+        again = migrate_folder(shots, encoder, rename=True, workers=args.workers, store=store)
+        show('再次运行', again)
+
+        processed = half.processed + rest.processed
+        saved = half.saved + rest.saved
+        print(f"合计迁移 {processed} 个文件，节省 {saved / 2**20:.1f} MB（{saved / total * 100:.1f}%）")
+        if processed != args.count or rest.resumed != half.processed or again.planned:
+            failures.append(f"文件没有恰好迁移一次（{half.processed} + {rest.processed}，再次运行 {again.planned}）")
+        if half.counts['failed'] or rest.counts['failed']:
+            failures.append("有文件迁移失败")
+
+        names = listing(shots)
+        legacy = [name for name in names if name.endswith('.png') and name.count('_') == 2]
+        if legacy or len(names) != args.count:
+            failures.append(f"目录中剩余 {len(legacy)} 个旧文件名，共 {len(names)} 个文件")
+        results = store.find()
+        missing = [item['path'] for item in results if not os.path.exists(item['path'])]
+        if missing or len(results) != args.count:
+            failures.append(f"索引中有 {len(missing)} 个路径不存在")
+
+        # 抽查新文件的像素与生成时的底图一致
+        originals = {record['dst']: record['src'] for record in read_checkpoint(shots)}
+        for name in random.Random(0).sample(names, min(args.sample, len(names))):
+            with Image.open(shots / name) as image:
+                expected = images[sources[originals[name]]]
+                if image.convert('RGB').tobytes() != expected.convert('RGB').tobytes():
+                    failures.append(f"{name} 的像素与原图不一致")
+                    break
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ 所有文件恰好迁移一次，索引和像素校验通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩小版副本基准测试
+
+对每类合成截图（默认 4K），报告生成副本的耗时和文件大小，并与原图PNG比较，
+用于选择上传给 LLM / CLI 工具时的格式和质量。
+
+用法: python benchmarks/bench_renditions.py [--width 3840] [--height 2160] [--max-width 1280]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_encoders import PngEncoder  # noqa: E402
+from screenshot_renditions import RenditionRenderer  # noqa: E402
+from synthetic import corpus  # noqa: E402
+
+
+VARIANTS = [
+    ('jpeg-80', {'format': 'jpeg', 'quality': 80}),
+    ('jpeg-60', {'format': 'jpeg', 'quality': 60}),
+    ('webp-80', {'format': 'webp', 'quality': 80}),
+    ('png', {'format': 'png'}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缩小版副本基准测试")
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--max-width', type=int, default=1280)
+    parser.add_argument('--max-height', type=int, default=1280)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    samples = corpus(args.width, args.height)
+    png = PngEncoder()
+    print(f"{'副本':<10}{'内容':<8}{'耗时(ms)':>10}{'副本(KB)':>12}{'原图PNG(KB)':>14}{'缩小比例':>10}")
+    originals = {kind: len(png.encode(dib)) for kind, dib in samples}
+    for name, options in VARIANTS:
+        renderer = RenditionRenderer(args.max_width, args.max_height, **options)
+        for kind, dib in samples:
+            rendition = renderer.render(dib)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                renderer.render(dib)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{name:<10}{kind:<8}{elapsed * 1000:>10.1f}{len(rendition) / 1024:>12.0f}"
+                  f"{originals[kind] / 1024:>14.0f}{originals[kind] / len(rendition):>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保留策略基准测试
+
+在临时目录中生成 10 万个小截图文件并登记到索引（最后使用时间分布在过去 90 天内），
+然后检查:
+  - 试运行报告的耗时，且不删除任何文件
+  - 按文件数 / 总大小 / 天数清理后满足所有策略
+  - 被粘贴过（最后使用时间更新）的旧文件保留，清理严格按最后使用时间从旧到新
+  - 每次保存后的 notify_saved 只做内存计数，不查询索引
+  - 索引外的文件不受影响
+
+用法: python benchmarks/bench_retention.py [--files 100000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_retention import RetentionEngine  # noqa: E402
+from screenshot_store import ScreenshotStore, content_hash  # noqa: E402
+
+
+def build_folder(root, count, now):
+    """生成 count 个文件并批量登记，第 i 个文件的最后使用时间为 90 天前到现在均匀分布"""
+    store = ScreenshotStore(root)
+    entries = []
+    span = 90 * 86400
+    for i in range(count):
+        name = f"screenshot_{i:07d}.png"
+        data = i.to_bytes(4, 'big') * (64 + i % 64)
+        with open(root / name, 'wb') as f:
+            f.write(data)
+        entries.append({'hash': content_hash(data), 'path': name, 'size': len(data),
+                        'created': now - span + span * i / count,
+                        'width': 32, 'height': 32, 'source_format': 'png'})
+        if len(entries) >= 5000:
+            store.add_many(entries)
+            entries = []
+    store.add_many(entries)
+    return store
+
+
+def check(condition, message):
+    if not condition:
+        print(f"❌ {message}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保留策略基准测试")
+    parser.add_argument('--files', type=int, default=100000)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='screenshot_retention_'))
+    try:
+        now = time.time()
+        start = time.perf_counter()
+        store = build_folder(root, args.files, now)
+        print(f"生成并登记 {args.files} 个文件，用时 {time.perf_counter() - start:.1f}s")
+        (root / 'notes.txt').write_text('索引外的文件')
+        count, size = store.totals()
+
+        # 最旧的 100 个文件被粘贴过，应当保留
+        pasted = [str(root / f"screenshot_{i:07d}.png") for i in range(100)]
+        store.touch(pasted, when=now)
+
+        # 1. 试运行：保留一半的文件
+        engine = RetentionEngine(store, max_files=args.files // 2)
+        start = time.perf_counter()
+        report = engine.run_once(dry_run=True)
+        elapsed = time.perf_counter() - start
+        print(f"试运行（max_files={args.files // 2}）: 计划删除 {len(report.candidates)} 个，用时 {elapsed * 1000:.1f} ms")
+        check(len(report.candidates) == args.files - args.files // 2, "试运行计划删除的文件数不对")
+        check(store.totals()[0] == args.files and (root / 'screenshot_0000000.png').exists(),
+              "试运行删除了文件")
+
+        # 2. 按文件数清理
+        start = time.perf_counter()
+        report = engine.run_once()
+        elapsed = time.perf_counter() - start
+        print(f"按文件数清理: 删除 {report.deleted} 个，用时 {elapsed:.2f}s")
+        check(store.totals()[0] == args.files // 2, "清理后文件数不符合上限")
+        check(all(os.path.exists(path) for path in pasted), "被粘贴过的旧文件被删除了")
+        check(not (root / f"screenshot_{100:07d}.png").exists(), "没有从最久未使用的文件开始删除")
+        check((root / f"screenshot_{args.files - 1:07d}.png").exists(), "最新的文件被删除了")
+
+        # 3. 按总大小清理
+        count, size = store.totals()
+        engine = RetentionEngine(store, max_total_mb=size / 2 / 2**20)
+        report = engine.run_once()
+        print(f"按总大小清理: 删除 {report.deleted} 个，释放 {report.freed / 2**20:.1f} MB")
+        check(store.totals()[1] <= size / 2, "清理后总大小超出上限")
+
+        # 4. 按天数清理：只保留最近 10 天用过的
+        engine = RetentionEngine(store, max_age_days=10)
+        report = engine.run_once(now=now)
+        print(f"按天数清理: 删除 {report.deleted} 个")
+        oldest = store.least_recently_used(1)[0]
+        check(oldest['last_used'] >= now - 10 * 86400, "仍有超过保留天数的文件")
+
+        # 5. 保存路径上的增量计数
+        engine = RetentionEngine(store, max_files=store.totals()[0] + 1000)
+        engine.refresh()
+        start = time.perf_counter()
+        for _ in range(1000):
+            engine.notify_saved(4096)
+        per_call = (time.perf_counter() - start) / 1000
+        print(f"notify_saved: {per_call * 1e6:.2f} µs/次")
+        check(not engine._wake.is_set(), "未超出配额时唤醒了后台清理")
+        engine.notify_saved(4096)
+        check(engine._wake.is_set(), "超出配额时没有唤醒后台清理")
+
+        files_on_disk = sum(1 for _ in root.glob('screenshot_*'))
+        check(files_on_disk == store.totals()[0], "磁盘上的文件与索引不一致")
+        check((root / 'notes.txt').exists(), "删除了索引外的文件")
+        store.close()
+        print("✅ 所有保留策略检查通过")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
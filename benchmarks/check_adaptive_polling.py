@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询退避检查
+
+用只能自适应轮询的内存假剪贴板（与没有 wl-paste --watch 的 Wayland、没有 TIMESTAMP 的 xclip 相同）
+驱动完整的监控循环，空闲 --idle 秒，让轮询间隔退避到上限（可能长于监控循环每次等待的 1 秒），然后检查:
+  - 退避到上限之后仍在按间隔检查剪贴板，相邻两次检查的间隔不超过上限太多
+  - 空闲之后复制的截图在一个轮询上限之内被保存
+
+任何一项不满足时以非零状态退出。
+
+用法: python benchmarks/check_adaptive_polling.py [--idle 10]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clipboard_backends import AdaptivePollingWatcher, MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from stress_capture import numbered_image  # noqa: E402
+from synthetic import to_dib  # noqa: E402
+
+# 允许的调度误差（秒）
+SLACK = 0.3
+
+
+class PollingMemoryClipboard(MemoryClipboardBackend):
+    """只能自适应轮询的内存剪贴板，记录每次读取的时间"""
+
+    def __init__(self):
+        super().__init__()
+        self.read_times = []
+
+    def create_watcher(self):
+        return AdaptivePollingWatcher()
+
+    def get_dib(self):
+        self.read_times.append(time.monotonic())
+        return super().get_dib()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应轮询退避检查")
+    parser.add_argument('--idle', type=float, default=10, help="空闲的秒数，应明显长于退避到上限所需的时间")
+    args = parser.parse_args()
+
+    max_interval = AdaptivePollingWatcher().max_interval
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_polling_'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    clipboard = PollingMemoryClipboard()
+    failures = []
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            saver = ClipboardScreenshotSaver(save_path=str(workdir / 'shots'), clipboard=clipboard, headless=True)
+            monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+            monitor.start()
+            while saver.worker_pool is None:
+                time.sleep(0.01)
+            start = time.monotonic()
+            time.sleep(args.idle)
+            idle_end = time.monotonic()
+
+            dib = to_dib(numbered_image(1))
+            fingerprint = saver.get_fingerprint(dib)
+            clipboard.set_dib(dib)
+            deadline = time.monotonic() + max_interval + SLACK
+            while saver.last_seen_hash != fingerprint and time.monotonic() < deadline:
+                time.sleep(0.01)
+            delay = time.monotonic() - idle_end
+            seen = saver.last_seen_hash == fingerprint
+            saver.stop_monitoring()
+            monitor.join()
+
+        idle_reads = [t for t in clipboard.read_times if start <= t <= idle_end]
+        gaps = [b - a for a, b in zip(idle_reads, idle_reads[1:])]
+        # 最后一次检查之后到空闲结束也算一个间隔，停止检查时只有这里会变长
+        if idle_reads:
+            gaps.append(idle_end - idle_reads[-1])
+        longest = max(gaps, default=args.idle)
+        late = [t for t in idle_reads if t - start >= args.idle / 2]
+        print(f"空闲 {args.idle:g} 秒内检查 {len(idle_reads)} 次（后半段 {len(late)} 次），"
+              f"最长间隔 {longest:.2f} 秒，轮询上限 {max_interval:g} 秒")
+        print(f"空闲后复制的截图 {'在 %.2f 秒后被看到' % delay if seen else '没有被看到'}")
+
+        if longest > max_interval + SLACK:
+            failures.append(f"相邻两次检查间隔 {longest:.2f} 秒，超过轮询上限 {max_interval:g} 秒")
+        if not late:
+            failures.append("退避之后不再检查剪贴板")
+        if not seen:
+            failures.append(f"空闲后复制的截图在 {max_interval + SLACK:g} 秒内没有被看到")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ 退避到上限之后仍按间隔检查剪贴板")
+
+
+if __name__ == "__main__":
+    main()
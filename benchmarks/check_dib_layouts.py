@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DIB 像素排列回归检查
+
+为 _BITFIELD_RAWMODES 中的每种颜色掩码构造 32 位 BI_BITFIELDS / BI_ALPHABITFIELDS 的 DIB，
+覆盖 BITMAPINFOHEADER 之后附带掩码和 V5 信息头内含掩码两种写法、有无 alpha、
+自下而上和自上而下两种存储方向，然后检查:
+  - decode_dib 得到 RGB / RGBA 图片，像素与构造时一致
+  - 每个编码器都能编码，读回的像素与构造时一致
+  - 能按条带写入的编码器（stream）写出的文件读回的像素与构造时一致
+  - 原样保存为BMP时，文件头中的像素偏移指向像素数据的开头
+另外为 BITMAPINFOHEADER / V4 / V5 信息头构造带调色板的 8 位 DIB（完整调色板和 biClrUsed 指定的
+部分调色板），检查原样保存的BMP的像素偏移跳过了调色板，读回的像素一致。
+
+任何一项不满足时以非零状态退出。
+
+用法: python benchmarks/check_dib_layouts.py
+"""
+import io
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from screenshot_encoders import (  # noqa: E402
+    BI_ALPHABITFIELDS, BI_BITFIELDS, _BITFIELD_RAWMODES, ENCODERS, RawDibEncoder, decode_dib, parse_dib_header,
+)
+
+WIDTH, HEIGHT = 7, 5
+ALPHA_MASK = 0xFF000000
+
+
+def sample_pixels():
+    """每个像素的 RGBA 都不相同，通道顺序或方向错了都能看出来"""
+    return [((x * 37 + y) & 0xFF, (y * 53 + x * 3) & 0xFF, (x * 11 + y * 29) & 0xFF, (40 + x * 30 + y) & 0xFF)
+            for y in range(HEIGHT) for x in range(WIDTH)]
+
+
+def make_dib(masks, alpha, header, top_down):
+    """
+    构造 32 位带颜色掩码的 DIB
+
+    Args:
+        masks (tuple): (红, 绿, 蓝) 掩码
+        alpha (bool): 是否带 alpha 掩码
+        header (str): info（40 字节信息头，掩码跟在后面）/ v5（掩码在信息头内）
+        top_down (bool): 自上而下存储（高度为负）
+    """
+    rows = []
+    pixels = sample_pixels()
+    for y in range(HEIGHT):
+        row = bytearray()
+        for r, g, b, a in pixels[y * WIDTH:(y + 1) * WIDTH]:
+            value = 0
+            for channel, mask in zip((r, g, b), masks):
+                value |= channel << ((mask & -mask).bit_length() - 1)
+            if alpha:
+                value |= a << 24
+            row += struct.pack('<I', value)
+        rows.append(bytes(row))
+    if not top_down:
+        rows.reverse()
+    data = b''.join(rows)
+    height = -HEIGHT if top_down else HEIGHT
+    all_masks = masks + ((ALPHA_MASK if alpha else 0),)
+    if header == 'info':
+        compression = BI_ALPHABITFIELDS if alpha else BI_BITFIELDS
+        info = struct.pack('<IiiHHIIiiII', 40, WIDTH, height, 1, 32, compression, len(data), 0, 0, 0, 0)
+        count = 4 if alpha else 3
+        return info + struct.pack(f'<{count}I', *all_masks[:count]) + data
+    info = struct.pack('<IiiHHIIiiII', 124, WIDTH, height, 1, 32, BI_BITFIELDS, len(data), 0, 0, 0, 0)
+    info += struct.pack('<4I', *all_masks) + b'\x00' * (124 - 56)
+    return info + data
+
+
+def expected(alpha):
+    if alpha:
+        return b''.join(bytes(pixel) for pixel in sample_pixels())
+    return b''.join(bytes(pixel[:3]) for pixel in sample_pixels())
+
+
+def pixels_of(image, alpha):
+    return image.convert('RGBA' if alpha else 'RGB').tobytes()
+
+
+def cases():
+    for masks in _BITFIELD_RAWMODES:
+        for alpha in (False, True):
+            for header in ('info', 'v5'):
+                for top_down in (False, True):
+                    label = (f"{_BITFIELD_RAWMODES[masks]}{'A' if alpha else 'X'} {header} "
+                             f"{'自上而下' if top_down else '自下而上'}")
+                    yield label, alpha, make_dib(masks, alpha, header, top_down)
+
+
+def check(label, alpha, data):
+    """返回失败原因列表"""
+    failures = []
+    want = expected(alpha)
+    image = decode_dib(data)
+    if image.mode != ('RGBA' if alpha else 'RGB'):
+        failures.append(f"{label}: decode_dib 得到 {image.mode} 图片")
+    elif pixels_of(image, alpha) != want:
+        failures.append(f"{label}: decode_dib 的像素不一致")
+    for name, encoder_class in ENCODERS.items():
+        encoder = encoder_class()
+        writers = [('encode', encoder.encode)]
+        if encoder.can_stream(data):
+            # 每个条带两行，覆盖条带之间的衔接
+            writers.append(('stream', lambda data: stream_bytes(encoder, data)))
+        for how, write in writers:
+            try:
+                with Image.open(io.BytesIO(write(data))) as written:
+                    got = pixels_of(written, alpha)
+            except Exception as e:
+                failures.append(f"{label}: {name} {how} 失败: {e}")
+                continue
+            if got != want:
+                failures.append(f"{label}: {name} {how} 写入的像素不一致")
+    header = RawDibEncoder().file_header(data)
+    if struct.unpack_from('<I', header, 10)[0] - len(header) != parse_dib_header(data)[3]:
+        failures.append(f"{label}: BMP 文件头中的像素偏移错误")
+    return failures
+
+
+def make_paletted_dib(header_size, colors_used):
+    """构造带调色板的 8 位 DIB，返回 (数据, 每个像素的调色板索引)"""
+    count = colors_used or 256
+    palette = b''.join(bytes((index, index * 3 & 0xFF, index * 5 & 0xFF, 0)) for index in range(count))
+    indexes = [(y * WIDTH + x) * 7 % count for y in range(HEIGHT) for x in range(WIDTH)]
+    stride = (WIDTH + 3) // 4 * 4
+    rows = [bytes(indexes[y * WIDTH:(y + 1) * WIDTH]).ljust(stride, b'\x00') for y in range(HEIGHT)]
+    data = b''.join(reversed(rows))
+    info = struct.pack('<IiiHHIIiiII', header_size, WIDTH, HEIGHT, 1, 8, 0, len(data), 0, 0, colors_used, 0)
+    return info.ljust(header_size, b'\x00') + palette + data, indexes
+
+
+def check_paletted():
+    """返回 (检查的排列数, 失败原因列表)"""
+    failures = []
+    total = 0
+    for header_size in (40, 108, 124):
+        for colors_used in (0, 16):
+            total += 1
+            label = f"8 位调色板 信息头 {header_size} 字节 biClrUsed={colors_used}"
+            data, indexes = make_paletted_dib(header_size, colors_used)
+            written = RawDibEncoder().encode(data)
+            offset, = struct.unpack_from('<I', written, 10)
+            if offset != len(written) - HEIGHT * ((WIDTH + 3) // 4 * 4):
+                failures.append(f"{label}: BMP 文件头中的像素偏移错误")
+                continue
+            with Image.open(io.BytesIO(written)) as image:
+                if image.tobytes() != bytes(indexes):
+                    failures.append(f"{label}: 读回的像素不一致")
+    return total, failures
+
+
+def stream_bytes(encoder, data):
+    buffer = io.BytesIO()
+    encoder.stream(data, buffer, strip_rows=2)
+    return buffer.getvalue()
+
+
+def main():
+    failures = []
+    total = 0
+    for label, alpha, data in cases():
+        total += 1
+        failures.extend(check(label, alpha, data))
+    paletted, paletted_failures = check_paletted()
+    total += paletted
+    failures.extend(paletted_failures)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ {total} 种 DIB 排列的解码和编码结果全部正确")
+
+
+if __name__ == "__main__":
+    main()
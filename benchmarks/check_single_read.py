@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单次读取检查
+
+通过内存假剪贴板逐张复制截图（其中一部分是重复复制之前的截图），驱动完整的监控循环。
+剪贴板变化的检测方式分别为:
+  - sequence: 每 50ms 读取一次序列号（与 Windows 相同）
+  - event: 变化时立即唤醒
+每种方式都检查:
+  - 每次剪贴板变化恰好读取一次剪贴板（读取、指纹、解码、编码、写入共用这一次读到的数据）
+  - 剪贴板不变时不再读取
+  - 每张不同的截图都写成了文件
+
+任何一项不满足时以非零状态退出。
+
+用法: python benchmarks/check_single_read.py [--count 200] [--repeat-every 10]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clipboard_backends import ClipboardBackend, MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from stress_capture import numbered_image  # noqa: E402
+from synthetic import to_dib  # noqa: E402
+
+
+class SequenceMemoryClipboard(MemoryClipboardBackend):
+    """读取序列号检测变化的内存剪贴板，与 Windows 后端相同"""
+
+    def create_watcher(self):
+        return ClipboardBackend.create_watcher(self)
+
+
+def run(clipboard, save_path, dibs, repeat_every):
+    """
+    逐张复制截图，每次等监控循环看到后再复制下一张
+
+    Returns:
+        tuple: (每次复制引起的读取次数列表, 最后一次复制之后的多余读取次数, 保存的文件数)
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        saver = ClipboardScreenshotSaver(save_path=str(save_path), clipboard=clipboard, headless=True)
+        monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+        monitor.start()
+        while saver.worker_pool is None:
+            time.sleep(0.01)
+        # 启动时的第一次检查（剪贴板为空）不计入
+        time.sleep(0.2)
+
+        reads = []
+        copies = []
+        for index, dib in enumerate(dibs):
+            copies.append(dib)
+            if repeat_every and index % repeat_every == repeat_every - 1:
+                # 重复复制之前的截图：剪贴板变化了，但内容已经保存过
+                copies.append(dibs[index // 2])
+        for dib in copies:
+            fingerprint = saver.get_fingerprint(dib)
+            before = clipboard.read_count
+            clipboard.set_dib(dib)
+            while saver.last_seen_hash != fingerprint or clipboard.read_count == before:
+                time.sleep(0.001)
+            # 再等一个检查间隔，第二次读取也会被计入
+            time.sleep(0.06)
+            reads.append(clipboard.read_count - before)
+
+        idle = clipboard.read_count
+        time.sleep(0.5)
+        idle = clipboard.read_count - idle
+        saver.stop_monitoring()
+        monitor.join()
+    return reads, idle, len(list(save_path.glob('screenshot_*')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单次读取检查")
+    parser.add_argument('--count', type=int, default=200, help="不同截图的张数")
+    parser.add_argument('--repeat-every', type=int, default=10, help="每隔N张重复复制一张之前的截图，0 表示不重复")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_single_read_'))
+    os.chdir(workdir)
+    dibs = [to_dib(numbered_image(i)) for i in range(args.count)]
+    failures = []
+    for name, backend_class in (('sequence', SequenceMemoryClipboard), ('event', MemoryClipboardBackend)):
+        reads, idle, saved = run(backend_class(), workdir / name, dibs, args.repeat_every)
+        extra = [count for count in reads if count != 1]
+        print(f"{name:<9} 复制 {len(reads)} 次，读取剪贴板 {sum(reads)} 次，空闲时读取 {idle} 次，保存文件 {saved} 个")
+        if extra:
+            failures.append(f"{name}: {len(extra)} 次复制没有恰好读取一次（{sorted(set(extra))} 次）")
+        if idle:
+            failures.append(f"{name}: 剪贴板不变时读取了 {idle} 次")
+        if saved != args.count:
+            failures.append(f"{name}: 保存了 {saved} 个文件，应为 {args.count} 个")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ 每次剪贴板变化恰好读取一次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+剪贴板截图保存器基准测试套件
+
+在 Linux 上无界面运行，用内存假剪贴板驱动真实的监控循环、工作池和写盘，测量:
+  - idle: 剪贴板内容不变时监控循环的 CPU 占用和剪贴板读取次数
+          （事件通知 / 序列号轮询 / 自适应轮询三种监视器）
+  - capture: 复制一张截图到文件落盘的延迟（界面 / 照片 / 噪声三类内容）
+  - burst: 按递增速率连续复制截图，找出不丢失截图的最高速率
+  - memory: 4K / 8K 截图完整保存一次的进程峰值内存（独立子进程）
+  - paste: 从按下快捷键到发出粘贴按键的延迟，以及快捷键回调返回所需的时间
+
+所有合成图片使用固定 seed。结果以 JSON 写出，可以用 --compare 与之前的结果比较，
+有指标变差超过 --tolerance 时以非零状态退出。
+
+用法:
+  python benchmarks/run_suite.py --output results.json
+  python benchmarks/run_suite.py --quick --compare results.json
+  python benchmarks/run_suite.py --only idle,paste
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from clipboard_backends import (  # noqa: E402
+    AdaptivePollingWatcher, ClipboardBackend, MemoryClipboardBackend,
+)
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from paste_executor import PasteExecutor  # noqa: E402
+from pipeline_metrics import LatencyHistogram  # noqa: E402
+from synthetic import GENERATORS, to_dib  # noqa: E402
+
+
+SCENARIOS = ('idle', 'capture', 'burst', 'memory', 'paste')
+
+
+class SequencePollingBackend(MemoryClipboardBackend):
+    """模拟 Windows：只轮询序列号，没有变化通知"""
+
+    def create_watcher(self):
+        return ClipboardBackend.create_watcher(self)
+
+
+class PlainPollingBackend(MemoryClipboardBackend):
+    """模拟既没有序列号也没有变化通知的平台，只能自适应轮询"""
+
+    def get_sequence_number(self):
+        return None
+
+    def create_watcher(self):
+        return AdaptivePollingWatcher()
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽保存器的控制台输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def running_saver(clipboard, workdir, **worker_settings):
+    """在临时目录中运行一个完整的监控循环"""
+    (workdir / 'shots').mkdir(parents=True, exist_ok=True)
+    with quiet():
+        saver = ClipboardScreenshotSaver(save_path=str(workdir / 'shots'), clipboard=clipboard, headless=True)
+        saver.worker_settings.update(worker_settings)
+        monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+        monitor.start()
+        while saver.watcher is None or saver.worker_pool is None:
+            time.sleep(0.001)
+        try:
+            yield saver
+        finally:
+            saver.stop_monitoring()
+            monitor.join()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pick(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+    return {
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': pick(50) * 1000,
+        'p95_ms': pick(95) * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def numbered_dib(base, index):
+    """在像素数据开头写入序号，得到内容互不相同的截图"""
+    frame = bytearray(base)
+    frame[-16:-12] = index.to_bytes(4, 'little')
+    return bytes(frame)
+
+
+def bench_idle(args, workdir):
+    """剪贴板内容不变时的 CPU 占用"""
+    dib = to_dib(GENERATORS['ui'](args.idle_width, args.idle_height))
+    results = {}
+    backends = (('event', MemoryClipboardBackend), ('sequence', SequencePollingBackend),
+                ('polling', PlainPollingBackend))
+    for name, backend_class in backends:
+        clipboard = backend_class()
+        clipboard.set_dib(dib)
+        with running_saver(clipboard, workdir / f'idle_{name}') as saver:
+            # 先等第一张截图保存完，之后剪贴板保持不变
+            while saver.latest_saved_file is None:
+                time.sleep(0.01)
+            time.sleep(0.2)
+            reads = clipboard.read_count
+            cpu = time.process_time()
+            wall = time.perf_counter()
+            time.sleep(args.idle_seconds)
+            cpu = time.process_time() - cpu
+            wall = time.perf_counter() - wall
+            reads = clipboard.read_count - reads
+        results[name] = {
+            'cpu_ms_per_s': cpu / wall * 1000,
+            'reads_per_s': reads / wall,
+        }
+    return results
+
+
+def bench_capture(args, workdir):
+    """复制截图到文件落盘的延迟"""
+    results = {}
+    for kind, generator in GENERATORS.items():
+        frames = [to_dib(generator(args.width, args.height, seed)) for seed in range(args.captures)]
+        clipboard = MemoryClipboardBackend()
+        with running_saver(clipboard, workdir / f'capture_{kind}') as saver:
+            saved = threading.Event()
+            original = saver.on_screenshot_saved
+
+            def on_saved(filepath, job, original=original):
+                original(filepath, job)
+                saved.set()
+
+            saver.worker_pool.on_saved = on_saved
+            samples = []
+            for frame in frames:
+                saved.clear()
+                start = time.perf_counter()
+                clipboard.set_dib(frame)
+                if not saved.wait(30):
+                    raise RuntimeError(f"{kind} 截图在30秒内没有保存")
+                samples.append(time.perf_counter() - start)
+        results[kind] = percentiles(samples)
+        results[kind]['frame_mb'] = len(frames[0]) / 2**20
+    return results
+
+
+def bench_burst(args, workdir):
+    """按递增速率复制截图，统计保存、丢弃和未被看到的截图"""
+    base = to_dib(GENERATORS['ui'](args.width, args.height))
+    rates = {}
+    max_lossless = 0
+    index = 0
+    for rate in args.rates:
+        clipboard = MemoryClipboardBackend()
+        count = max(1, int(rate * args.burst_seconds))
+        with running_saver(clipboard, workdir / f'burst_{rate}') as saver:
+            seen = set()
+            start = time.perf_counter()
+            for i in range(count):
+                frame = numbered_dib(base, index)
+                index += 1
+                deadline = start + (i + 1) / rate
+                clipboard.set_dib(frame)
+                # 记录监控循环在下一张到来之前是否看到了这一张
+                fingerprint = saver.get_fingerprint(frame)
+                while time.perf_counter() < deadline:
+                    if saver.last_seen_hash == fingerprint:
+                        seen.add(i)
+                    time.sleep(0.0005)
+                if saver.last_seen_hash == fingerprint:
+                    seen.add(i)
+            pushed = time.perf_counter() - start
+            saver.worker_pool.join()
+            drained = time.perf_counter() - start
+            dropped = saver.worker_pool.dropped
+        saved_files = len(list((workdir / f'burst_{rate}' / 'shots').glob('screenshot_*')))
+        lost = count - saved_files
+        rates[str(rate)] = {
+            'offered_per_s': count / pushed,
+            'saved': saved_files,
+            'dropped': dropped,
+            'missed': count - len(seen),
+            'saved_per_s': saved_files / drained,
+        }
+        if lost == 0:
+            max_lossless = rate
+        else:
+            break
+    return {'max_lossless_per_s': max_lossless, 'rates': rates}
+
+
+PEAK_CHILD_FLAG = '--peak-child'
+
+
+def peak_memory_child(source, save_path):
+    """子进程: 读入DIB后完整保存一次，输出峰值内存"""
+    def peak_mb():
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+    with quiet():
+        saver = ClipboardScreenshotSaver(save_path=save_path, clipboard=MemoryClipboardBackend(), headless=True)
+    with open(source, 'rb') as f:
+        data = f.read()
+    baseline = peak_mb()
+    start = time.perf_counter()
+    with quiet():
+        path = saver.save_clipboard_image(data)
+    elapsed = time.perf_counter() - start
+    if not path:
+        raise SystemExit("保存失败")
+    peak = peak_mb()
+    print(json.dumps({'peak_mb': peak, 'extra_mb': peak - baseline,
+                      'frame_mb': len(data) / 2**20, 'save_ms': elapsed * 1000}))
+
+
+def bench_memory(args, workdir):
+    """4K / 8K 截图完整保存一次的峰值内存"""
+    results = {}
+    for label, (width, height) in args.memory_sizes.items():
+        source = workdir / f'{label}.dib'
+        source.write_bytes(to_dib(GENERATORS['photo'](width, height)))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), PEAK_CHILD_FLAG, str(source),
+             str(workdir / f'memory_{label}')],
+            capture_output=True, text=True, check=True, cwd=str(workdir),
+        ).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])
+        source.unlink()
+    return results
+
+
+def bench_paste(args, workdir):
+    """快捷键到粘贴的延迟（剪贴板和按键为内存中的替身，测量的是本程序自身的开销）"""
+    clipboard = MemoryClipboardBackend()
+    clipboard.set_dib(to_dib(GENERATORS['ui'](320, 200)))
+    text = {'value': 'original'}
+    with running_saver(clipboard, workdir / 'paste') as saver:
+        while saver.latest_saved_file is None:
+            time.sleep(0.01)
+        saver.paste_executor = PasteExecutor(
+            copy_text=lambda value: text.__setitem__('value', value),
+            read_text=lambda: text['value'],
+            restore_delay=0.01,
+            histogram=LatencyHistogram(),
+        )
+        saver.send_paste_keys = lambda: None
+        hook = []
+        with quiet():
+            for _ in range(args.pastes):
+                start = time.perf_counter()
+                saver.on_paste_latest_hotkey()
+                hook.append(time.perf_counter() - start)
+                saver.paste_executor.join()
+        histogram = saver.paste_executor.histogram
+        _, count, total, maximum = histogram.snapshot()
+        saver.paste_executor.stop()
+    return {
+        'hotkey_to_paste_mean_ms': total / count,
+        'hotkey_to_paste_p95_ms': histogram.percentile(95),
+        'hotkey_to_paste_max_ms': maximum,
+        'hook_return_mean_us': sum(hook) / len(hook) * 1e6,
+        'hook_return_max_us': max(hook) * 1e6,
+        'pastes': count,
+    }
+
+
+BENCHMARKS = {
+    'idle': bench_idle,
+    'capture': bench_capture,
+    'burst': bench_burst,
+    'memory': bench_memory,
+    'paste': bench_paste,
+}
+
+
+def flatten(results, prefix=''):
+    """把嵌套结果展开为 {"capture.ui.p50_ms": 值}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def direction(name):
+    """指标的好坏方向: -1 越小越好，1 越大越好，0 仅供参考"""
+    leaf = name.rsplit('.', 1)[-1]
+    if leaf.startswith('max_') and leaf != 'max_lossless_per_s':
+        return 0  # 单次最大值受调度影响太大，不参与比较
+    if leaf.endswith(('_ms', '_us', '_mb')) and leaf != 'frame_mb' or leaf.startswith('cpu_'):
+        return -1
+    if leaf.endswith('_per_s') and leaf not in ('reads_per_s', 'offered_per_s'):
+        return 1
+    if leaf == 'reads_per_s':
+        return -1
+    return 0
+
+
+def compare(current, baseline, tolerance):
+    """
+    与之前的结果比较
+
+    Returns:
+        list: 变差超过容差的指标
+    """
+    current = flatten(current['results'])
+    previous = flatten(baseline['results'])
+    regressions = []
+    print(f"\n与基线比较（容差 {tolerance:.0%}）:")
+    for name in sorted(current):
+        sign = direction(name)
+        if name not in previous or sign == 0:
+            continue
+        old, new = previous[name], current[name]
+        if old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = change * -sign > tolerance
+        marker = '❌' if worse else ('✅' if change * sign > tolerance else '  ')
+        print(f"  {marker} {name:<48} {old:12.3f} -> {new:12.3f} ({change:+.1%})")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def environment():
+    from PIL import __version__ as pillow_version
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pillow': pillow_version,
+        'commit': commit,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="剪贴板截图保存器基准测试套件")
+    parser.add_argument('--only', help=f"只运行指定场景，逗号分隔: {','.join(SCENARIOS)}")
+    parser.add_argument('--quick', action='store_true', help="缩小图片尺寸和次数，快速检查")
+    parser.add_argument('--output', help="把结果写入 JSON 文件")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果比较")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="比较时允许的变差比例（默认0.25）")
+    args = parser.parse_args(argv)
+
+    args.scenarios = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(sorted(unknown))}")
+    if args.quick:
+        args.width, args.height = 640, 360
+        args.idle_width, args.idle_height = 1280, 720
+        args.idle_seconds = 1.0
+        args.captures = 5
+        args.rates = [10, 40, 160]
+        args.burst_seconds = 0.5
+        args.memory_sizes = {'1080p': (1920, 1080)}
+        args.pastes = 50
+    else:
+        args.width, args.height = 1920, 1080
+        args.idle_width, args.idle_height = 3840, 2160
+        args.idle_seconds = 3.0
+        args.captures = 10
+        args.rates = [5, 10, 20, 40, 80, 160]
+        args.burst_seconds = 1.5
+        args.memory_sizes = {'4k': (3840, 2160), '8k': (7680, 4320)}
+        args.pastes = 200
+    return args
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == [PEAK_CHILD_FLAG]:
+        peak_memory_child(*argv[1:3])
+        return 0
+
+    args = parse_args(argv)
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_bench_'))
+    cwd = os.getcwd()
+    # 保存器会在当前目录读写配置文件，切换到临时目录避免影响仓库
+    os.chdir(workdir)
+    report = {'environment': environment(), 'quick': args.quick, 'results': {}}
+    try:
+        for name in args.scenarios:
+            print(f"▶ {name} ...", flush=True)
+            start = time.perf_counter()
+            report['results'][name] = BENCHMARKS[name](args, workdir)
+            print(f"  完成，用时 {time.perf_counter() - start:.1f}s")
+            for key, value in flatten(report['results'][name]).items():
+                print(f"  {key:<40} {value:12.3f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick:
+            print("⚠️ 基线与本次运行的 --quick 设置不同，结果不可直接比较")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} 项指标变差超过 {args.tolerance:.0%}")
+            return 1
+        print("✅ 没有超出容差的性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长时间运行的内存浸泡测试
+
+在临时目录中运行完整的监控循环和后台工作池（内存假剪贴板），连续复制数千张互不相同的
+截图，每隔 large_every 张复制一张大截图（默认 4K，超过条带写入阈值），并定期采样进程的
+常驻内存（RSS）。预热之后，最后四分之一采样的中位数比第一个四分之一高出超过
+--tolerance-mb 时以非零状态退出，说明有内存随截图数量增长。
+
+用法: python benchmarks/soak_memory.py [--count 3000] [--large-every 100] [--tolerance-mb 16]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from clipboard_backends import MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from screenshot_encoders import parse_dib_header  # noqa: E402
+from screenshot_memory import rss_mb  # noqa: E402
+from synthetic import GENERATORS, to_dib  # noqa: E402
+
+
+def variant(base, index):
+    """在第一个像素中写入序号，得到内容不同的截图"""
+    offset = parse_dib_header(base)[3]
+    data = bytearray(base)
+    data[offset:offset + 3] = index.to_bytes(3, 'little')
+    return bytes(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长时间运行的内存浸泡测试")
+    parser.add_argument('--count', type=int, default=3000, help="复制的截图总数")
+    parser.add_argument('--large-every', type=int, default=100, help="每隔多少张复制一张大截图")
+    parser.add_argument('--large-size', default='3840x2160', help="大截图的尺寸")
+    parser.add_argument('--warmup', type=int, default=300, help="不计入比较的预热截图数")
+    parser.add_argument('--samples', type=int, default=40, help="RSS 采样次数")
+    parser.add_argument('--tolerance-mb', type=float, default=16)
+    args = parser.parse_args()
+
+    if rss_mb() is None:
+        raise SystemExit("无法读取进程内存，跳过浸泡测试")
+    width, height = (int(value) for value in args.large_size.lower().split('x'))
+    small = to_dib(GENERATORS['ui'](640, 400))
+    large = to_dib(GENERATORS['ui'](width, height))
+
+    out = sys.stdout
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_soak_'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    clipboard = MemoryClipboardBackend()
+    samples = []
+    interval = max(1, (args.count - args.warmup) // args.samples)
+    devnull = open(os.devnull, 'w')
+    redirect = contextlib.redirect_stdout(devnull)
+    redirect.__enter__()
+    saver = ClipboardScreenshotSaver(save_path=str(workdir / 'shots'), clipboard=clipboard, headless=True)
+    monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+    monitor.start()
+    while saver.worker_pool is None:
+        time.sleep(0.01)
+    start = time.perf_counter()
+    try:
+        for index in range(1, args.count + 1):
+            is_large = args.large_every and index % args.large_every == 0
+            clipboard.set_dib(variant(large if is_large else small, index))
+            # 等这一张写完再复制下一张，监控循环只会看到剪贴板的最新内容
+            deadline = time.monotonic() + 60
+            while saver.latest_saved_seq < index and time.monotonic() < deadline:
+                time.sleep(0.0005)
+            if saver.latest_saved_seq < index:
+                raise RuntimeError(f"第 {index} 张截图没有在 60 秒内保存")
+            if index > args.warmup and (index - args.warmup) % interval == 0:
+                samples.append((index, rss_mb()))
+                print(f"  {index:>6} 张  RSS {samples[-1][1]:.1f} MB", file=out, flush=True)
+    finally:
+        saver.stop_monitoring()
+        monitor.join()
+        redirect.__exit__(None, None, None)
+        devnull.close()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    quarter = max(1, len(samples) // 4)
+    first = statistics.median(value for _, value in samples[:quarter])
+    last = statistics.median(value for _, value in samples[-quarter:])
+    peak = max(value for _, value in samples)
+    print(f"{args.count} 张截图（其中 {args.count // args.large_every if args.large_every else 0} 张 "
+          f"{width}x{height}），用时 {elapsed:.1f}s")
+    print(f"RSS: 开始 {first:.1f} MB，结束 {last:.1f} MB，峰值 {peak:.1f} MB，增长 {last - first:+.1f} MB")
+    if last - first > args.tolerance_mb:
+        print(f"❌ 内存增长超过 {args.tolerance_mb:g} MB")
+        sys.exit(1)
+    print("✅ 内存保持平稳")
+
+
+if __name__ == "__main__":
+    main()
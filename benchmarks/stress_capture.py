@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图保存压力测试
+
+通过内存假剪贴板以尽可能高的速率连续复制互不相同的小图片，驱动完整的监控循环、
+后台工作池和原子写入，然后检查:
+  - 每张被监控循环看到的截图都写成了独立的文件（没有同名覆盖）
+  - 所有文件都能完整解码，内容与复制的图片一一对应
+  - 没有残留的临时文件
+
+用法: python benchmarks/stress_capture.py [--count 5000] [--workers 4]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from clipboard_backends import MemoryClipboardBackend  # noqa: E402
+from clipboard_screenshot_saver import ClipboardScreenshotSaver  # noqa: E402
+from synthetic import to_dib  # noqa: E402
+
+
+def numbered_image(index, size=32):
+    """左上角像素编码序号的小图片"""
+    image = Image.new('RGB', (size, size), (40, 44, 52))
+    image.putpixel((0, 0), ((index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF))
+    return image
+
+
+def read_index(path):
+    with Image.open(path) as image:
+        image.load()
+        r, g, b = image.convert('RGB').getpixel((0, 0))
+    return (r << 16) | (g << 8) | b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="截图保存压力测试")
+    parser.add_argument('--count', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='screenshot_stress_'))
+    os.chdir(workdir)
+    save_path = workdir / 'shots'
+    clipboard = MemoryClipboardBackend()
+    dibs = [to_dib(numbered_image(i)) for i in range(args.count)]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        saver = ClipboardScreenshotSaver(save_path=str(save_path), clipboard=clipboard)
+        saver.encoder_settings['format'] = 'png'
+        saver.encoder_settings['png'] = {'compress_level': 1}
+        saver.encoder = saver.create_encoder()
+        saver.worker_settings.update(workers=args.workers, max_queue=256, backpressure='block')
+        monitor = threading.Thread(target=saver.run_monitor_loop, daemon=True)
+        monitor.start()
+
+        start = time.perf_counter()
+        for dib in dibs:
+            fingerprint = saver.get_fingerprint(dib)
+            clipboard.set_dib(dib)
+            # 等待监控循环看到这张截图后再复制下一张
+            while saver.last_seen_hash != fingerprint:
+                time.sleep(0)
+        saver.stop_monitoring()
+        monitor.join()
+        elapsed = time.perf_counter() - start
+
+    files = sorted(save_path.glob('screenshot_*.png'))
+    leftovers = [p for p in save_path.iterdir() if p.name.endswith('.tmp')]
+    indexes = [read_index(p) for p in files]
+
+    print(f"复制 {args.count} 张，用时 {elapsed:.2f}s，{args.count / elapsed:.0f} 张/秒")
+    print(f"保存文件 {len(files)} 个，临时文件残留 {len(leftovers)} 个")
+    assert len(files) == args.count, "有截图丢失或被覆盖"
+    assert sorted(indexes) == list(range(args.count)), "文件内容与复制的图片不一致"
+    assert indexes == list(range(args.count)), "文件名顺序与截图顺序不一致"
+    assert not leftovers, "存在残留的临时文件"
+    print("✅ 没有丢失、覆盖或损坏的截图")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成截图生成器
+
+生成几类典型的截图内容，供基准测试使用:
+  - ui: 大面积纯色、窗口边框和文字行，类似应用界面
+  - photo: 平滑渐变加少量噪声，类似照片或视频画面
+  - noise: 随机像素，压缩最困难的情况
+
+相同的尺寸和 seed 总是生成相同的图片，基准测试结果可以相互比较。
+"""
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+
+def ui_like(width, height, seed=0):
+    """类似应用界面的截图"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (width, height), (243, 243, 243))
+    draw = ImageDraw.Draw(image)
+    # 标题栏和侧边栏
+    bar = min(32, height // 4)
+    draw.rectangle((0, 0, width, bar), fill=(32, 33, 36))
+    draw.rectangle((0, bar, width // 6, height), fill=(225, 228, 232))
+    # 若干窗口和文字行
+    for _ in range(12):
+        x0 = rng.randrange(width // 6, max(width // 6 + 1, width * 7 // 8))
+        y0 = rng.randrange(min(40, height // 4), max(min(40, height // 4) + 1, height * 7 // 8))
+        x1 = min(width - 1, x0 + rng.randrange(width // 8, max(width // 8 + 1, width // 2)))
+        y1 = min(height - 1, y0 + rng.randrange(height // 8, max(height // 8 + 1, height // 2)))
+        draw.rectangle((x0, y0, x1, y1), fill=(255, 255, 255), outline=(200, 200, 200))
+        for line_y in range(y0 + 12, y1 - 12, 18):
+            line_end = x0 + 12 + rng.randrange(40, max(41, x1 - x0 - 24))
+            draw.line((x0 + 12, line_y, line_end, line_y), fill=(60, 60, 60), width=2)
+    return image
+
+
+def photographic(width, height, seed=0):
+    """类似照片的平滑内容"""
+    rng = random.Random(seed)
+    small = Image.new('RGB', (16, 9))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(16 * 9)])
+    image = small.resize((width, height), Image.BICUBIC)
+    # 颗粒噪声也由 seed 决定，同一参数生成的图片完全相同
+    grain = Image.frombytes('L', (width, height), rng.randbytes(width * height)).convert('RGB')
+    return Image.blend(image, grain, 0.08).filter(ImageFilter.SMOOTH)
+
+
+def noisy(width, height, seed=0):
+    """随机像素"""
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+
+
+GENERATORS = {
+    'ui': ui_like,
+    'photo': photographic,
+    'noise': noisy,
+}
+
+
+def to_dib(image):
+    """把图片转换为剪贴板中的CF_DIB数据（无文件头的BMP）"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='DIB')
+    return buffer.getvalue()
+
+
+def corpus(width=1920, height=1080, kinds=None, seed=0):
+    """生成 (名称, DIB数据) 列表"""
+    kinds = kinds or list(GENERATORS)
+    return [(kind, to_dib(GENERATORS[kind](width, height, seed))) for kind in kinds]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图历史环形缓冲区
+
+在内存中保留最近若干次截图的记录（路径、内容哈希、大小、时间），按位置和按哈希
+查找都是 O(1)。每次新增记录只向保存目录下的日志文件追加一行，重启后从日志恢复，
+不需要重新扫描保存目录；日志过长时整体压缩为最近的记录。
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+HISTORY_FILENAME = '.capture_history.jsonl'
+
+DEFAULT_HISTORY_SETTINGS = {
+    'capacity': 50,                        # 内存中保留的截图记录数
+    'paste_count': 3,                      # 粘贴最近N张截图时的N
+    'paste_recent_hotkey': 'ctrl+alt+shift+p',
+    'cycle_hotkey': 'ctrl+alt+o',          # 连续按下时依次换成更早的截图
+    'cycle_timeout': 3.0,                  # 超过该秒数未按下则从最新一张重新开始
+}
+
+
+class CaptureRecord:
+    """一次截图的记录"""
+    __slots__ = ('path', 'hash', 'size', 'timestamp')
+
+    def __init__(self, path, hash=None, size=0, timestamp=None):
+        self.path = path
+        self.hash = hash
+        self.size = size
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_json(self):
+        return json.dumps({'path': self.path, 'hash': self.hash, 'size': self.size,
+                           'timestamp': self.timestamp}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line):
+        item = json.loads(line)
+        return cls(item['path'], item.get('hash'), item.get('size', 0), item.get('timestamp'))
+
+
+class CaptureHistory:
+    """固定容量的截图历史环形缓冲区"""
+
+    def __init__(self, log_path=None, capacity=50):
+        """
+        Args:
+            log_path (str): 持久化日志路径，为None时只保存在内存中
+            capacity (int): 保留的记录数
+        """
+        self.capacity = max(1, int(capacity))
+        self.log_path = Path(log_path) if log_path is not None else None
+        self._items = [None] * self.capacity
+        self._next = 0    # 下一条记录写入的位置
+        self._count = 0
+        self._by_hash = {}
+        self._log_lines = 0
+        self._lock = threading.Lock()
+        if self.log_path is not None:
+            self._load()
+
+    def _load(self):
+        """从日志恢复最近的记录"""
+        if not self.log_path.exists():
+            return
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self._log_lines += 1
+                    try:
+                        self._push(CaptureRecord.from_json(line))
+                    except (ValueError, KeyError):
+                        continue  # 跳过写了一半的行
+        except OSError as e:
+            print(f"⚠️ 读取截图历史失败: {e}")
+
+    def _push(self, record):
+        old = self._items[self._next]
+        if old is not None and old.hash is not None and self._by_hash.get(old.hash) is old:
+            del self._by_hash[old.hash]
+        self._items[self._next] = record
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        if record.hash is not None:
+            self._by_hash[record.hash] = record
+
+    def add(self, path, hash=None, size=0, timestamp=None):
+        """新增一条记录并追加到日志"""
+        record = CaptureRecord(str(path), hash, size, timestamp)
+        with self._lock:
+            self._push(record)
+            if self.log_path is not None:
+                self._append(record)
+        return record
+
+    def _append(self, record):
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(record.to_json() + '\n')
+            self._log_lines += 1
+            if self._log_lines > self.capacity * 4:
+                self._compact()
+        except OSError as e:
+            print(f"⚠️ 写入截图历史失败: {e}")
+
+    def _compact(self):
+        """把日志重写为当前保留的记录"""
+        tmp = self.log_path.with_name(self.log_path.name + '.tmp')
+        records = list(reversed(self._recent(self._count)))
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(record.to_json() + '\n')
+        os.replace(tmp, self.log_path)
+        self._log_lines = len(records)
+
+    def _recent(self, n):
+        n = min(n, self._count)
+        return [self._items[(self._next - 1 - i) % self.capacity] for i in range(n)]
+
+    def get(self, index=0):
+        """按位置取记录，0 为最新一张，不存在时返回None"""
+        with self._lock:
+            if not 0 <= index < self._count:
+                return None
+            return self._items[(self._next - 1 - index) % self.capacity]
+
+    def recent(self, n):
+        """最近 n 条记录，最新的在前"""
+        with self._lock:
+            return self._recent(n)
+
+    def find(self, hash):
+        """按内容哈希查找记录"""
+        with self._lock:
+            return self._by_hash.get(hash)
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+剪贴板后端与变化通知
+
+提供剪贴板图片数据的读取后端，以及检测剪贴板变化的监视器：
+  - Win32ClipboardBackend: Windows 剪贴板（注册的 PNG 格式、CF_DIB、HTML、CF_HDROP）
+  - LinuxClipboardBackend: 通过 wl-paste (Wayland) 或 xclip (X11) 子进程读取 image/png 等
+  - MemoryClipboardBackend: 纯内存的假剪贴板，可在无桌面环境下驱动整个监控循环
+
+读取顺序：
+  1. 已编码的PNG（截图工具和浏览器通常同时提供），可以不解码直接写盘
+  2. 位图（CF_DIB / image/bmp）
+  3. HTML 中以 data: URI 内嵌的图片
+  4. 复制的文件列表（CF_HDROP / text/uri-list），由 get_files 返回，保存时链接而不是重新编码
+
+变化检测：
+  - 支持序列号的平台（Windows 的 GetClipboardSequenceNumber、X11 的 TIMESTAMP）只轮询
+    一个廉价的计数器，内容未变化时不读取图片数据
+  - Wayland 使用 wl-paste --watch 的变化事件
+  - 其他情况退回自适应轮询，剪贴板空闲时逐步拉长检查间隔
+"""
+import os
+import re
+import sys
+import threading
+import time
+
+
+# HTML 片段中的 <img src="...">
+_IMG_SRC = re.compile(r"""<img\b[^>]*?\bsrc\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+
+def parse_uri_list(text):
+    """
+    解析 text/uri-list，返回其中的本地文件路径
+
+    以 # 开头的行是注释；非 file:// 的地址被忽略。
+    """
+    from urllib.parse import unquote, urlparse
+    paths = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        uri = urlparse(line)
+        if uri.scheme == 'file' and uri.netloc in ('', 'localhost'):
+            paths.append(unquote(uri.path))
+        elif uri.scheme == 'file':
+            # Windows 网络共享路径 file://server/share/...
+            paths.append(f"//{uri.netloc}{unquote(uri.path)}")
+        elif not uri.scheme and os.path.isabs(line):
+            paths.append(line)
+    return paths
+
+
+def extract_html_image(html):
+    """
+    从剪贴板的 HTML 片段中取出第一张图片
+
+    Returns:
+        tuple: ('data', 图片字节) 表示以 data: URI 内嵌的图片，
+            ('file', 路径) 表示指向本地文件的图片，没有可用图片时返回None
+    """
+    for src in _IMG_SRC.findall(html):
+        if src.startswith('data:image/'):
+            header, _, payload = src.partition(',')
+            if not header.endswith(';base64') or not payload:
+                continue
+            import base64
+            import binascii
+            try:
+                return 'data', base64.b64decode(payload, validate=False)
+            except (binascii.Error, ValueError):
+                continue
+        if src.startswith('file:'):
+            paths = parse_uri_list(src)
+            if paths:
+                return 'file', paths[0]
+    return None
+
+
+class ClipboardWatcher:
+    """剪贴板变化监视器基类"""
+
+    def __init__(self):
+        self._closed = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        等待剪贴板可能发生变化
+
+        Args:
+            timeout (float): 最长等待秒数，None 表示一直等待
+
+        Returns:
+            bool: True 表示需要检查剪贴板，False 表示超时或监视器已关闭
+        """
+        raise NotImplementedError
+
+    def feedback(self, changed):
+        """告知上一次检查是否真的发现了新内容（供自适应轮询调整间隔）"""
+        pass
+
+    def set_burst(self, interval):
+        """连拍期间临时把检查间隔缩短到 interval 秒，None 表示恢复；事件驱动的监视器不需要"""
+        pass
+
+    def close(self):
+        """关闭监视器，唤醒正在等待的线程"""
+        self._closed.set()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+
+class SequenceNumberWatcher(ClipboardWatcher):
+    """基于剪贴板序列号的变化检测，只有序列号改变时才通知检查"""
+
+    def __init__(self, get_sequence, interval=0.05):
+        """
+        Args:
+            get_sequence (callable): 返回当前剪贴板序列号的函数
+            interval (float): 读取序列号的间隔秒数
+        """
+        super().__init__()
+        self.get_sequence = get_sequence
+        self.interval = interval
+        self.normal_interval = interval
+        self.last_sequence = None
+
+    def set_burst(self, interval):
+        self.interval = interval or self.normal_interval
+
+    def wait(self, timeout=None):
+        remaining = timeout
+        while not self.closed:
+            sequence = self.get_sequence()
+            if sequence != self.last_sequence:
+                self.last_sequence = sequence
+                return True
+
+            step = self.interval if remaining is None else min(self.interval, remaining)
+            if step <= 0:
+                return False
+            self._closed.wait(step)
+            if remaining is not None:
+                remaining -= step
+        return False
+
+
+class AdaptivePollingWatcher(ClipboardWatcher):
+    """没有变化通知时的自适应轮询：剪贴板空闲时逐步退避，有新内容时恢复最短间隔"""
+
+    def __init__(self, min_interval=0.1, max_interval=2.0, backoff=1.5):
+        super().__init__()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.burst_interval = None
+        self._last_check = None
+        self._wakeup = threading.Event()
+
+    def wait(self, timeout=None):
+        if self.closed:
+            return False
+        if self._last_check is None:
+            # 第一次立即检查
+            self._last_check = time.monotonic()
+            return True
+
+        # 从上次检查起累计计时：退避后的间隔可能长于调用方的 timeout，需要跨多次调用等满
+        remaining = self._last_check + self.interval - time.monotonic()
+        step = remaining if timeout is None else min(remaining, timeout)
+        woken = self._wakeup.wait(step) if step > 0 else False
+        self._wakeup.clear()
+        if self.closed:
+            return False
+        now = time.monotonic()
+        if woken or now >= self._last_check + self.interval:
+            self._last_check = now
+            return True
+        # 只是 timeout 到了，还没到下一次检查的时间
+        return False
+
+    def set_burst(self, interval):
+        self.burst_interval = interval
+        self.interval = interval or self.min_interval
+        if interval:
+            # 退避后的等待可能长达 max_interval，立即检查一次并改用新的间隔
+            self._wakeup.set()
+
+    def close(self):
+        super().close()
+        self._wakeup.set()
+
+    def feedback(self, changed):
+        if self.burst_interval:
+            # 连拍期间不退避
+            self.interval = self.burst_interval
+        elif changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+
+class ClipboardBackend:
+    """剪贴板后端基类"""
+
+    def get_dib(self):
+        """获取剪贴板中图片的原始数据（PNG、DIB 或 BMP 字节），没有图片时返回None"""
+        raise NotImplementedError
+
+    def get_files(self):
+        """获取剪贴板中复制的文件路径列表，没有文件时返回None"""
+        return None
+
+    def get_sequence_number(self):
+        """获取剪贴板序列号，平台不支持时返回None"""
+        return None
+
+    # 读取序列号的间隔秒数
+    sequence_interval = 0.05
+
+    def create_watcher(self):
+        """创建适合此后端的变化监视器"""
+        if self.get_sequence_number() is not None:
+            return SequenceNumberWatcher(self.get_sequence_number, self.sequence_interval)
+        return AdaptivePollingWatcher()
+
+
+class Win32ClipboardBackend(ClipboardBackend):
+    """基于 win32clipboard 的 Windows 剪贴板后端"""
+
+    def __init__(self):
+        # pywin32 在第一次读取剪贴板时才导入
+        self._get_sequence = None
+        self._formats = None
+        try:
+            import ctypes
+            self._get_sequence = ctypes.windll.user32.GetClipboardSequenceNumber
+        except Exception:
+            pass
+
+    def _registered_formats(self):
+        """注册的剪贴板格式编号: PNG 和 HTML Format"""
+        if self._formats is None:
+            import win32clipboard
+            self._formats = (
+                win32clipboard.RegisterClipboardFormat('PNG'),
+                win32clipboard.RegisterClipboardFormat('HTML Format'),
+            )
+        return self._formats
+
+    def get_dib(self):
+        import win32clipboard
+        import win32con
+        png_format, html_format = self._registered_formats()
+        # 使用win32clipboard来获取剪贴板中的图片
+        win32clipboard.OpenClipboard()
+        try:
+            # 优先使用已编码的PNG，保存时无需解码和重新编码
+            if win32clipboard.IsClipboardFormatAvailable(png_format):
+                data = win32clipboard.GetClipboardData(png_format)
+                if data:
+                    return data
+
+            # 只提供 CF_BITMAP（位图句柄）的程序，系统会自动合成 CF_DIB，
+            # 所以这里总是读取 CF_DIB 的像素数据，而不是无法直接解码的句柄
+            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_DIB):
+                return win32clipboard.GetClipboardData(win32con.CF_DIB)
+
+            # 浏览器等程序复制的 HTML 中可能内嵌 data: URI 图片
+            if win32clipboard.IsClipboardFormatAvailable(html_format):
+                html = win32clipboard.GetClipboardData(html_format)
+                image = extract_html_image(html.decode('utf-8', 'replace') if isinstance(html, bytes) else html)
+                if image is not None and image[0] == 'data':
+                    return image[1]
+        finally:
+            win32clipboard.CloseClipboard()
+        return None
+
+    def get_files(self):
+        import win32clipboard
+        import win32con
+        _, html_format = self._registered_formats()
+        win32clipboard.OpenClipboard()
+        try:
+            # 资源管理器中复制的文件
+            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_HDROP):
+                return list(win32clipboard.GetClipboardData(win32con.CF_HDROP))
+            if win32clipboard.IsClipboardFormatAvailable(html_format):
+                html = win32clipboard.GetClipboardData(html_format)
+                image = extract_html_image(html.decode('utf-8', 'replace') if isinstance(html, bytes) else html)
+                if image is not None and image[0] == 'file':
+                    return [image[1]]
+        finally:
+            win32clipboard.CloseClipboard()
+        return None
+
+    def get_sequence_number(self):
+        if self._get_sequence is None:
+            return None
+        return self._get_sequence()
+
+
+class _CommandWatcher(ClipboardWatcher):
+    """读取外部命令的输出，每输出一行视为剪贴板变化一次（例如 wl-paste --watch）"""
+
+    def __init__(self, command):
+        super().__init__()
+        self.changed = threading.Condition()
+        self.events = 1  # 启动后先检查一次
+        self.seen = 0
+        import subprocess
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+        )
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for _ in self.process.stdout:
+            with self.changed:
+                self.events += 1
+                self.changed.notify_all()
+        # 命令意外退出时唤醒等待方，由调用方决定是否重建监视器
+        with self.changed:
+            self.changed.notify_all()
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def wait(self, timeout=None):
+        with self.changed:
+            self.changed.wait_for(lambda: self.closed or not self.alive or self.events != self.seen, timeout)
+            if self.closed:
+                return False
+            if self.events != self.seen:
+                self.seen = self.events
+                return True
+        if not self.alive:
+            # 命令已退出，退化为每秒检查一次
+            self._closed.wait(1.0 if timeout is None else min(timeout, 1.0))
+            return not self.closed
+        return False
+
+    def close(self):
+        super().close()
+        if self.alive:
+            self.process.terminate()
+        with self.changed:
+            self.changed.notify_all()
+
+
+class LinuxClipboardBackend(ClipboardBackend):
+    """通过 wl-paste (Wayland) 或 xclip (X11) 子进程读取剪贴板图片"""
+
+    # 按优先级尝试的图片类型
+    IMAGE_TYPES = ('image/png', 'image/bmp')
+
+    # xclip 每次读取序列号都要启动子进程，间隔放宽一些
+    sequence_interval = 0.25
+
+    def __init__(self, tool=None, timeout=2.0):
+        """
+        Args:
+            tool (str): wl-paste 或 xclip，为None时根据当前会话自动选择
+            timeout (float): 子进程超时秒数
+        """
+        if tool is None:
+            import shutil
+            if os.environ.get('WAYLAND_DISPLAY') and shutil.which('wl-paste'):
+                tool = 'wl-paste'
+            elif os.environ.get('DISPLAY') and shutil.which('xclip'):
+                tool = 'xclip'
+            else:
+                raise RuntimeError("未找到图形会话或剪贴板工具，需要 WAYLAND_DISPLAY 和 wl-clipboard，"
+                                   "或 DISPLAY 和 xclip")
+        if tool not in ('wl-paste', 'xclip'):
+            raise ValueError(f"不支持的剪贴板工具: {tool}")
+        self.tool = tool
+        self.timeout = timeout
+        self._timestamp_supported = None
+        self._failed_reads = 0
+
+    def _run(self, args):
+        """运行剪贴板命令，失败时返回None"""
+        # subprocess 只有 Linux 后端用到，第一次运行命令时才导入
+        import subprocess
+        try:
+            result = subprocess.run(args, capture_output=True, timeout=self.timeout, stdin=subprocess.DEVNULL)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    def _target_args(self, target):
+        if self.tool == 'wl-paste':
+            return ['wl-paste', '--no-newline', '--type', target]
+        return ['xclip', '-selection', 'clipboard', '-t', target, '-o']
+
+    def list_types(self):
+        """列出剪贴板中当前可用的数据类型"""
+        if self.tool == 'wl-paste':
+            output = self._run(['wl-paste', '--list-types'])
+        else:
+            output = self._run(self._target_args('TARGETS'))
+        if not output:
+            return []
+        return output.decode('utf-8', 'replace').split()
+
+    def get_dib(self):
+        types = self.list_types()
+        for image_type in self.IMAGE_TYPES:
+            if image_type in types:
+                data = self._run(self._target_args(image_type))
+                if data:
+                    return data
+        if 'text/html' in types:
+            html = self._run(self._target_args('text/html'))
+            image = extract_html_image(html.decode('utf-8', 'replace')) if html else None
+            if image is not None and image[0] == 'data':
+                return image[1]
+        return None
+
+    def get_files(self):
+        types = self.list_types()
+        if 'text/uri-list' in types:
+            output = self._run(self._target_args('text/uri-list'))
+            paths = parse_uri_list(output.decode('utf-8', 'replace')) if output else []
+            if paths:
+                return paths
+        if 'text/html' in types:
+            html = self._run(self._target_args('text/html'))
+            image = extract_html_image(html.decode('utf-8', 'replace')) if html else None
+            if image is not None and image[0] == 'file':
+                return [image[1]]
+        return None
+
+    def get_sequence_number(self):
+        # X11 选择的 TIMESTAMP 在剪贴板所有者变化时改变，可以当作序列号
+        if self.tool != 'xclip' or self._timestamp_supported is False:
+            return None
+        output = self._run(self._target_args('TIMESTAMP'))
+        value = output.strip() if output else b''
+        if value.isdigit():
+            self._timestamp_supported = True
+            return int(value)
+        if self._timestamp_supported is None:
+            # 只有第一次探测失败才认为不支持，create_watcher 随之改用自适应轮询
+            self._timestamp_supported = False
+            return None
+        # 之后的失败是暂时的（剪贴板所有者退出、xclip 超时、新的所有者不回应 TIMESTAMP），
+        # 返回每次都不同的值让监视器照常检查剪贴板，重复的内容由哈希过滤
+        self._failed_reads += 1
+        return -self._failed_reads
+
+    def create_watcher(self):
+        if self.tool == 'wl-paste':
+            try:
+                return _CommandWatcher(['wl-paste', '--watch', 'echo'])
+            except OSError:
+                return AdaptivePollingWatcher()
+        return super().create_watcher()
+
+
+class _MemoryWatcher(ClipboardWatcher):
+    """内存剪贴板的事件驱动监视器，内容变化时立即唤醒"""
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+        self.last_sequence = None
+
+    def wait(self, timeout=None):
+        with self.backend.changed:
+            notified = self.backend.changed.wait_for(
+                lambda: self.closed or self.backend.sequence != self.last_sequence,
+                timeout,
+            )
+            if not notified or self.closed:
+                return False
+            self.last_sequence = self.backend.sequence
+            return True
+
+    def close(self):
+        super().close()
+        with self.backend.changed:
+            self.backend.changed.notify_all()
+
+
+class MemoryClipboardBackend(ClipboardBackend):
+    """纯内存的假剪贴板，用于无桌面环境下的测试和基准测试"""
+
+    def __init__(self):
+        self.data = None
+        self.files = None
+        self.sequence = 0
+        self.read_count = 0
+        self.changed = threading.Condition()
+
+    def set_dib(self, data):
+        """模拟截图软件把图片（DIB、BMP 或 PNG 字节）复制到剪贴板"""
+        with self.changed:
+            self.data = data
+            self.files = None
+            self.sequence += 1
+            self.changed.notify_all()
+
+    def set_files(self, paths):
+        """模拟在文件管理器中复制文件"""
+        with self.changed:
+            self.data = None
+            self.files = [str(path) for path in paths]
+            self.sequence += 1
+            self.changed.notify_all()
+
+    def set_image(self, image):
+        """把PIL图片以CF_DIB格式放入剪贴板"""
+        import io
+        buffer = io.BytesIO()
+        image.save(buffer, format='DIB')
+        self.set_dib(buffer.getvalue())
+
+    def clear(self):
+        """清空剪贴板"""
+        self.set_dib(None)
+
+    def get_dib(self):
+        with self.changed:
+            self.read_count += 1
+            return self.data
+
+    def get_files(self):
+        with self.changed:
+            return list(self.files) if self.files else None
+
+    def get_sequence_number(self):
+        return self.sequence
+
+    def create_watcher(self):
+        return _MemoryWatcher(self)
+
+
+BACKENDS = {
+    'win32': Win32ClipboardBackend,
+    'linux': LinuxClipboardBackend,
+    'memory': MemoryClipboardBackend,
+}
+
+
+def create_backend(name='auto'):
+    """
+    创建剪贴板后端
+
+    Args:
+        name (str): auto 根据当前平台选择，也可以指定 win32 / linux / memory
+    """
+    if name == 'auto':
+        if sys.platform == 'win32':
+            name = 'win32'
+        elif sys.platform.startswith('linux'):
+            name = 'linux'
+        else:
+            raise RuntimeError(f"当前平台不支持剪贴板读取: {sys.platform}")
+    if name not in BACKENDS:
+        raise ValueError(f"未知的剪贴板后端: {name}")
+    return BACKENDS[name]()
@@ -1,53 +1,135 @@
 import os
 import sys
+import errno
 import time
-import json
-import keyboard
-import pyperclip
-from datetime import datetime
 from pathlib import Path
 import threading
-from PIL import Image
-import io
-import win32clipboard
-import win32con
-import hashlib
-from pynput.keyboard import Key, Controller
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import zlib
+from clipboard_backends import create_backend
+from screenshot_encoders import decode_dib, image_info, create_encoder, DEFAULT_ENCODER_SETTINGS
+from screenshot_workers import SaveWorkerPool, DEFAULT_WORKER_SETTINGS
+from screenshot_store import ScreenshotStore, content_hash, index_folder, parse_since, IMAGE_SUFFIXES
+from screenshot_files import ScreenshotNamer, atomic_write, atomic_write_stream, link_or_copy
+from screenshot_memory import megabytes, release_memory, rss_mb, DEFAULT_MEMORY_SETTINGS
+from perceptual_hash import NearDuplicateIndex, DEFAULT_NEAR_DUPLICATE_SETTINGS
+from capture_history import CaptureHistory, CaptureRecord, HISTORY_FILENAME, DEFAULT_HISTORY_SETTINGS
+from screenshot_retention import RetentionEngine, create_retention_engine, DEFAULT_RETENTION_SETTINGS
+from screenshot_renditions import (
+    active_window_box, create_renderer, remove_renditions, rendition_path, DEFAULT_RENDITION_SETTINGS,
+)
+from paste_executor import PasteExecutor
+from pipeline_metrics import NullMetrics, create_metrics, DEFAULT_METRICS_SETTINGS
+from screenshot_config import ConfigManager, CONFIG_FILENAME
 
 class ClipboardScreenshotSaver:
-    def __init__(self, save_path=None):
+    # 定期检查快捷键状态的间隔（秒）
+    HOTKEY_CHECK_INTERVAL = 50
+    # 粘贴后恢复剪贴板原内容的延迟（秒）
+    PASTE_RESTORE_DELAY = 0.5
+    # 配置分组 -> 保存该分组可修改副本的属性
+    SETTINGS_ATTRIBUTES = {
+        'save_workers': 'worker_settings',
+        'encoder': 'encoder_settings',
+        'near_duplicate': 'near_duplicate_settings',
+        'history': 'history_settings',
+        'retention': 'retention_settings',
+        'renditions': 'rendition_settings',
+        'memory': 'memory_settings',
+        'metrics': 'metrics_settings',
+        'ipc': 'ipc_settings',
+        'burst': 'burst_settings',
+    }
+    
+    def __init__(self, save_path=None, clipboard=None, headless=False):
         """
         初始化剪贴板截图保存器
         
+        界面、快捷键和剪贴板文本相关的模块在第一次用到时才导入，构造时不会加载。
+        
         Args:
             save_path (str): 截图保存路径，如果为None则会提示用户选择
+            clipboard (ClipboardBackend): 剪贴板后端，为None时按配置（默认根据当前平台）创建
+            headless (bool): 无界面模式，不弹出任何对话框，保存路径直接取自配置文件
         """
-        self.config_file = Path("screenshot_config.json")
+        self.config_file = Path(CONFIG_FILENAME)
+        self.config = ConfigManager(self.config_file)  # 校验后的配置快照，文件变化时热加载
+        self.config_lock = threading.RLock()  # 应用新配置时与剪贴板检查互斥
+        self.cli_overrides = {}  # 命令行参数覆盖的配置项 {(分组, 键): 值}，不写入配置文件
+        self.hotkeys_registered = False  # 是否已注册全局快捷键（热加载时需要重新注册）
         self.last_clipboard_content = None
         self.last_image_hash = None
         self.latest_saved_file = None  # 存储最新保存的文件路径
         self.hotkey = 'ctrl+alt+p'  # 默认快捷键
-        self.keyboard_controller = Controller()  # 用于模拟键盘输入
-        self.hotkey_check_counter = 0  # 用于定期检查快捷键状态
+        self._keyboard_controller = None  # 用于模拟键盘输入，首次使用时创建
+        self.paste_executor = None  # 专门执行粘贴的线程，首次粘贴时创建
+        self.headless = headless
+        self.last_hotkey_check = time.monotonic()  # 用于定期检查快捷键状态
         self.is_monitoring = False  # 添加监控状态标志
+        self.last_seen_hash = None  # 最近一次在剪贴板中看到的内容指纹
+        self.stop_event = threading.Event()
+        self.watcher = None
+        self.clipboard_backend = 'auto'  # 剪贴板后端: auto / win32 / linux / memory
+        self.file_drop = 'link'  # 复制的图片文件的处理方式，见 screenshot_config.FILE_DROP_MODES
+        self.worker_settings = dict(DEFAULT_WORKER_SETTINGS)  # 后台保存工作池设置
+        self.encoder_settings = dict(DEFAULT_ENCODER_SETTINGS)  # 输出编码器设置
+        self.near_duplicate_settings = dict(DEFAULT_NEAR_DUPLICATE_SETTINGS)  # 近似重复过滤设置
+        self.history_settings = dict(DEFAULT_HISTORY_SETTINGS)  # 截图历史与多张粘贴设置
+        self.retention_settings = dict(DEFAULT_RETENTION_SETTINGS)  # 保存目录保留策略
+        self.rendition_settings = dict(DEFAULT_RENDITION_SETTINGS)  # 缩小版副本设置
+        self.memory_settings = dict(DEFAULT_MEMORY_SETTINGS)  # 内存预算与大截图的条带写入
+        self.history = None  # 最近截图的环形缓冲区
+        self.retention = None  # 保存目录的后台清理
+        self.metrics_settings = dict(DEFAULT_METRICS_SETTINGS)  # 指标与结构化日志设置
+        self.metrics = NullMetrics()  # 未启用时所有埋点都是空操作
+        # IPC、连拍等模块在第一次用到时才导入，默认设置取自配置的默认快照
+        self.ipc_settings = self.config.snapshot.section('ipc')  # 本机 IPC 查询接口设置
+        self.ipc = None  # 本机 IPC 查询服务，监控期间运行
+        self.ipc_events = []  # 上一个 IPC 服务最近发布的截图，服务重建后序号接着编号
+        self.ipc_epoch = None  # 上一个 IPC 服务的 epoch，重建后沿用
+        self.burst_settings = self.config.snapshot.section('burst')  # 连拍模式设置
+        self.burst = None  # 进行中的连拍
+        self.burst_namer = ScreenshotNamer('burst_')
+        self.burst_finishers = []  # 正在写完连拍的后台线程
+        self.cycle_index = 0  # 循环粘贴历史时当前的位置
+        self.cycle_last_time = 0.0
+        self.cycle_last_text = None
+        self.worker_pool = None
+        self.latest_saved_seq = 0  # 最新已写入截图的任务序号
+        self.saved_lock = threading.Lock()
+        self.store = None  # 按内容寻址的截图索引
+        self.namer = ScreenshotNamer()  # 生成不冲突的截图文件名
         
         # 加载配置
         self.load_config()
+        self.clipboard = clipboard if clipboard is not None else create_backend(self.clipboard_backend)
+        self.encoder = self.create_encoder()
+        self.renderer = self.create_renderer()
+        self.near_duplicates = self.create_near_duplicate_index()
+        configured_path = self.save_path
         
-        # 如果没有指定保存路径，则让用户选择
+        # 如果没有指定保存路径，则让用户选择（无界面模式直接使用配置中的路径）
         if save_path is None:
-            save_path = self.select_save_folder()
+            save_path = configured_path if headless else self.select_save_folder()
             if save_path is None:
                 # 用户取消了选择，使用默认路径
                 save_path = "screenshots"
         
         self.save_path = Path(save_path)
         self.save_path.mkdir(exist_ok=True)
+        self.open_store()
+        self.metrics = self.create_metrics()
         
-        # 保存更新后的配置
-        self.save_config()
+        # 保存路径有变化时才更新配置文件
+        if self.save_path != configured_path:
+            self.save_config()
+    
+    @property
+    def keyboard_controller(self):
+        """模拟键盘输入的控制器，第一次使用时才导入 pynput"""
+        if self._keyboard_controller is None:
+            from pynput.keyboard import Controller
+            self._keyboard_controller = Controller()
+        return self._keyboard_controller
     
     def hide_console_window(self):
         """隐藏控制台窗口"""
@@ -96,22 +178,19 @@ class ClipboardScreenshotSaver:
     def select_save_folder(self):
         """弹出文件夹选择对话框"""
         try:
+            import tkinter as tk
+            from tkinter import filedialog
+            
             # 创建一个隐藏的根窗口
             root = tk.Tk()
             root.withdraw()  # 隐藏主窗口
             root.attributes("-topmost", True)  # 确保对话框在最前面
             
-            # 尝试从配置文件中获取上次的保存路径作为初始目录
+            # 使用配置中上次的保存路径作为初始目录
             initial_dir = None
-            if self.config_file.exists():
-                try:
-                    with open(self.config_file, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                        last_path = config.get('save_path', None)
-                        if last_path and Path(last_path).exists():
-                            initial_dir = last_path
-                except:
-                    pass
+            last_path = self.config.snapshot.get('save_path')
+            if self.config.exists() and last_path and Path(last_path).exists():
+                initial_dir = last_path
             
             if initial_dir is None:
                 initial_dir = str(Path.home() / "Pictures")  # 默认使用图片文件夹
@@ -134,6 +213,9 @@ class ClipboardScreenshotSaver:
     def show_startup_notification(self):
         """显示启动通知"""
         try:
+            import tkinter as tk
+            from tkinter import messagebox
+            
             root = tk.Tk()
             root.withdraw()
             root.attributes("-topmost", True)
@@ -156,35 +238,274 @@ class ClipboardScreenshotSaver:
             print(f"显示启动通知失败: {e}")
         
     def load_config(self):
-        """加载配置文件"""
-        if self.config_file.exists():
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    self.save_path = Path(config.get('save_path', 'screenshots'))
-                    self.save_path.mkdir(exist_ok=True)
-                    self.hotkey = config.get('hotkey', 'ctrl+alt+p')
-            except Exception as e:
-                print(f"加载配置文件失败: {e}")
-                self.set_default_config()
-        else:
+        """加载并校验配置文件，之后都从内存中的快照读取配置"""
+        if not self.config.exists():
             self.set_default_config()
+            return
+        self.apply_config_values(self.config.load())
+        self.save_path.mkdir(exist_ok=True)
+    
+    def apply_config_values(self, snapshot):
+        """把配置快照中的值复制到各项设置（可修改的副本）"""
+        self.save_path = Path(snapshot['save_path'])
+        self.hotkey = snapshot['hotkey']
+        self.clipboard_backend = snapshot['clipboard_backend']
+        self.file_drop = snapshot['file_drop']
+        self.worker_settings = snapshot.section('save_workers')
+        self.encoder_settings = snapshot.section('encoder')
+        self.near_duplicate_settings = snapshot.section('near_duplicate')
+        self.history_settings = snapshot.section('history')
+        self.retention_settings = snapshot.section('retention')
+        self.rendition_settings = snapshot.section('renditions')
+        self.memory_settings = snapshot.section('memory')
+        self.metrics_settings = snapshot.section('metrics')
+        self.ipc_settings = snapshot.section('ipc')
+        self.burst_settings = snapshot.section('burst')
+        # 热加载也不能丢掉命令行参数
+        self.apply_overrides()
+    
+    def set_override(self, section, key, value):
+        """
+        用命令行参数覆盖某个配置项（例如 --daemon 启用 ipc）
+        
+        覆盖值在每次加载或热加载配置后重新应用，保存配置时写回的仍是文件中原来的值。
+        """
+        with self.config_lock:
+            self.cli_overrides[(section, key)] = value
+            self.apply_overrides()
+    
+    def apply_overrides(self):
+        for (section, key), value in self.cli_overrides.items():
+            getattr(self, self.SETTINGS_ATTRIBUTES[section])[key] = value
     
     def set_default_config(self):
         """设置默认配置"""
+        self.save_path = Path("screenshots")
         self.save_config()
     
-    def save_config(self):
-        """保存配置文件"""
-        config = {
+    def config_values(self):
+        """当前设置对应的配置文件内容，命令行覆盖的配置项保持文件中的值"""
+        values = {
             'save_path': str(self.save_path),
-            'hotkey': self.hotkey
+            'hotkey': self.hotkey,
+            'clipboard_backend': self.clipboard_backend,
+            'file_drop': self.file_drop,
+            'save_workers': self.worker_settings,
+            'encoder': self.encoder_settings,
+            'near_duplicate': self.near_duplicate_settings,
+            'history': self.history_settings,
+            'retention': self.retention_settings,
+            'renditions': self.rendition_settings,
+            'memory': self.memory_settings,
+            'metrics': self.metrics_settings,
+            'ipc': self.ipc_settings,
+            'burst': self.burst_settings
         }
+        for section, key in self.cli_overrides:
+            saved = self.config.snapshot.section(section)
+            values[section] = dict(values[section])
+            if key in saved:
+                values[section][key] = saved[key]
+            else:
+                values[section].pop(key, None)
+        return values
+    
+    def save_config(self):
+        """保存配置文件（内容有变化时才写入，短时间内的多次保存合并为一次原子写入）"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            self.config.update(self.config_values())
         except Exception as e:
             print(f"保存配置文件失败: {e}")
+    
+    def on_config_changed(self, old, new):
+        """
+        配置文件被外部修改后，在不停止监控的情况下应用新配置
+        
+        先等后台工作池写完已提交的截图，再切换保存路径、编码器等设置，
+        期间剪贴板检查暂停，不会丢失截图；剪贴板后端和指标设置需要重启程序才能生效。
+        """
+        changed = set(new.changed_keys(old))
+        if not changed:
+            return
+        print(f"🔄 检测到配置文件变化: {', '.join(sorted(changed))}")
+        with self.config_lock:
+            old_path = self.save_path
+            old_hotkeys = (self.hotkey, self.history_settings.get('paste_recent_hotkey'),
+                           self.history_settings.get('cycle_hotkey'), self.burst_settings.get('hotkey'))
+            restart_pool = self.worker_pool is not None and bool(
+                changed & {'save_path', 'save_workers', 'encoder', 'renditions', 'memory'})
+            if restart_pool:
+                # 已提交的截图用原来的设置写入原来的目录
+                self.stop_workers(wait=True)
+            
+            self.apply_config_values(new)
+            new_path, self.save_path = self.save_path, old_path
+            if 'encoder' in changed:
+                self.encoder = self.create_encoder()
+            if 'renditions' in changed:
+                self.renderer = self.create_renderer()
+            if 'near_duplicate' in changed:
+                self.near_duplicates = self.create_near_duplicate_index()
+            if new_path.resolve() != old_path.resolve():
+                self.set_save_path(new_path)
+            elif changed & {'history', 'retention'}:
+                self.open_store()
+            if 'ipc' in changed and self.is_monitoring:
+                self.stop_ipc()
+                self.start_ipc()
+            if restart_pool:
+                self.start_workers()
+            
+            new_hotkeys = (self.hotkey, self.history_settings.get('paste_recent_hotkey'),
+                           self.history_settings.get('cycle_hotkey'), self.burst_settings.get('hotkey'))
+            if self.hotkeys_registered and new_hotkeys != old_hotkeys:
+                self.refresh_hotkeys(old_hotkeys)
+        
+        for key in sorted(changed & {'clipboard_backend', 'metrics'}):
+            print(f"⚠️ 配置项 {key} 需要重启程序才能生效")
+        print("✅ 新配置已生效")
+    
+    def create_encoder(self):
+        """根据配置创建输出编码器，配置无效时使用默认PNG编码器"""
+        try:
+            return create_encoder(self.encoder_settings)
+        except Exception as e:
+            print(f"⚠️ 输出格式配置无效，使用默认PNG: {e}")
+            return create_encoder(DEFAULT_ENCODER_SETTINGS)
+
+    def create_renderer(self):
+        """根据配置创建缩小版副本的渲染器，未启用或配置无效时返回None"""
+        try:
+            return create_renderer(self.rendition_settings)
+        except Exception as e:
+            print(f"⚠️ 截图副本配置无效，已禁用: {e}")
+            return None
+
+    def rendition_path_for(self, original):
+        """原图对应的副本路径"""
+        return rendition_path(original, self.rendition_settings.get('folder', 'optimized'),
+                              self.renderer.extension)
+
+    def paste_path_for(self, path):
+        """
+        粘贴快捷键实际粘贴的路径
+        
+        paste 设置为 optimized 且副本已经生成时返回副本路径，否则返回原图路径
+        （例如截图后立即粘贴、副本还在生成中）。
+        """
+        if self.renderer is None or self.rendition_settings.get('paste') != 'optimized':
+            return path
+        candidate = self.rendition_path_for(path)
+        return str(candidate) if candidate.exists() else path
+
+    def capture_crop(self, info):
+        """截图时前台窗口在截图中的区域，用于副本裁剪；未启用时返回None"""
+        if self.renderer is None or not self.rendition_settings.get('crop_active_window'):
+            return None
+        width, height = info[:2]
+        if not width or not height:
+            return None
+        return active_window_box((width, height))
+
+    def write_rendition(self, encoded, original, job=None):
+        """写入原图的副本；原图已作为重复内容被删除时不写"""
+        if not os.path.exists(original):
+            return None
+        path = self.rendition_path_for(original)
+        path.parent.mkdir(exist_ok=True)
+        try:
+            atomic_write(path, encoded)
+        except FileExistsError:
+            pass
+        self.metrics.event('rendition', path=str(path), bytes=len(encoded))
+        return str(path)
+
+    def save_rendition(self, data, original, crop=None):
+        """在当前线程中生成并写入副本（同步保存路径使用），失败不影响原图"""
+        if self.renderer is None:
+            return None
+        try:
+            with self.metrics.timer('render'):
+                encoded = self.renderer.render(data, crop)
+            return self.write_rendition(encoded, original)
+        except Exception as e:
+            print(f"⚠️ 生成截图副本失败: {e}")
+            return None
+
+    def remove_renditions(self, paths):
+        """保留策略删除原图后，同时删除对应的副本"""
+        remove_renditions(paths, self.rendition_settings.get('folder', 'optimized'))
+
+    def create_near_duplicate_index(self):
+        """根据配置创建近似重复索引，未启用时返回None"""
+        settings = self.near_duplicate_settings
+        if not settings.get('enabled'):
+            return None
+        try:
+            return NearDuplicateIndex(
+                method=settings.get('method', 'dhash'),
+                threshold=settings.get('threshold', 4),
+                capacity=settings.get('history', 64),
+            )
+        except Exception as e:
+            print(f"⚠️ 近似重复过滤配置无效，已禁用: {e}")
+            return None
+
+    def is_near_duplicate(self, data):
+        """检查截图是否与最近保存的截图几乎相同（在全分辨率编码之前）"""
+        if self.near_duplicates is None:
+            return False
+        try:
+            distance = self.near_duplicates.check(decode_dib(data))
+        except Exception as e:
+            print(f"⚠️ 计算感知哈希失败: {e}")
+            return False
+        if distance is None:
+            return False
+        self.metrics.inc('near_duplicate')
+        self.metrics.event('near_duplicate', distance=distance)
+        print(f"截图与最近的截图几乎相同（差异 {distance} 位），已忽略")
+        return True
+
+    def create_metrics(self):
+        """根据配置创建指标收集器，未启用或配置无效时返回空操作的 NullMetrics"""
+        try:
+            return create_metrics(self.metrics_settings, self.save_path)
+        except Exception as e:
+            print(f"⚠️ 指标配置无效，已禁用: {e}")
+            return NullMetrics()
+
+    def open_store(self):
+        """打开保存目录的内容索引，失败时不做跨重启去重"""
+        if self.retention is not None:
+            self.retention.stop()
+            self.retention = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        try:
+            self.store = ScreenshotStore(self.save_path)
+        except Exception as e:
+            print(f"⚠️ 打开截图索引失败，将只按最近一张截图去重: {e}")
+        else:
+            try:
+                self.retention = create_retention_engine(self.store, self.retention_settings)
+            except Exception as e:
+                print(f"⚠️ 保留策略配置无效，不会自动清理: {e}")
+            if self.retention is not None:
+                self.retention.on_removed = self.remove_renditions
+                if self.is_monitoring:
+                    self.retention.start()
+        
+        # 截图历史与保存目录绑定，重启后无需扫描目录即可恢复最新截图
+        self.history = CaptureHistory(
+            self.save_path / HISTORY_FILENAME,
+            capacity=self.history_settings.get('capacity', 50),
+        )
+        latest = self.history.get(0)
+        if latest is not None:
+            self.latest_saved_file = latest.path
+        return self.store
 
     def set_save_path(self, new_path):
         """设置新的保存路径"""
@@ -192,18 +513,21 @@ class ClipboardScreenshotSaver:
             old_path = self.save_path
             new_path = Path(new_path)
             new_path.mkdir(exist_ok=True)
-            self.save_path = new_path
-            self.save_config()
+            with self.config_lock:
+                # 已提交的截图先写入原来的目录，之后的截图保存到新目录
+                if self.worker_pool is not None:
+                    self.worker_pool.join()
+                self.save_path = new_path
+                self.open_store()
+                self.save_config()
+                if self.ipc is not None:
+                    # 连接方式文件在保存目录中，换目录后重新启动
+                    self.stop_ipc()
+                    self.start_ipc()
             
             print(f"📂 截图保存路径已更新:")
             print(f"   原路径: {old_path.resolve()}")
             print(f"   新路径: {self.save_path.resolve()}")
-
-            # 提示用户路径变更的影响
-            if hasattr(self, 'is_monitoring') and self.is_monitoring:
-                print("⚠️ 注意: 路径修改后正在运行的监控将使用新路径")
-                print("   如需确保生效，建议重启监控")
-            
             return True
         except Exception as e:
             print(f"❌ 设置保存路径失败: {e}")
@@ -212,56 +536,96 @@ class ClipboardScreenshotSaver:
     def get_clipboard_text(self):
         """获取剪贴板中的文本内容"""
         try:
+            import pyperclip
             return pyperclip.paste()
         except Exception as e:
             print(f"获取剪贴板文本失败: {e}")
             return None
     
+    def get_paste_executor(self):
+        """粘贴执行器，第一次粘贴时创建（此时才导入 pyperclip）"""
+        if self.paste_executor is None:
+            import pyperclip
+            self.paste_executor = PasteExecutor(
+                copy_text=pyperclip.copy,
+                read_text=self.get_clipboard_text,
+                get_sequence=self.clipboard.get_sequence_number,
+                restore_delay=self.PASTE_RESTORE_DELAY,
+                histogram=self.metrics.histogram('hotkey_to_paste'),
+            )
+        return self.paste_executor
+    
+    def request_paste(self, key, action, coalesce=True):
+        """在快捷键回调中调用：把粘贴交给粘贴线程后立即返回，不阻塞键盘钩子"""
+        self.get_paste_executor().submit(key, action, coalesce)
+    
+    def on_paste_latest_hotkey(self):
+        self.request_paste('latest', self.paste_latest_file_path)
+    
+    def on_paste_recent_hotkey(self):
+        self.request_paste('recent', self.paste_recent_file_paths)
+    
+    def on_cycle_hotkey(self):
+        # 每次按下都要向前循环一张，不合并
+        self.request_paste('cycle', self.cycle_history_path, coalesce=False)
+    
+    def on_copy_latest_hotkey(self):
+        self.request_paste('copy', self.copy_latest_file_path_to_clipboard)
+    
+    def wait_for_hotkey_release(self, timeout=0.1):
+        """等待快捷键中的 Alt/Shift/Win 松开（最多 timeout 秒），避免与模拟的 Ctrl+V 组合成其他快捷键"""
+        deadline = time.monotonic() + timeout
+        try:
+            import keyboard
+            while (time.monotonic() < deadline
+                   and any(keyboard.is_pressed(key) for key in ('alt', 'shift', 'windows'))):
+                time.sleep(0.005)
+        except Exception:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+    
+    def send_paste_keys(self):
+        """模拟 Ctrl+V"""
+        from pynput.keyboard import Key
+        
+        self.wait_for_hotkey_release()
+        self.keyboard_controller.press(Key.ctrl)
+        self.keyboard_controller.press('v')
+        self.keyboard_controller.release('v')
+        self.keyboard_controller.release(Key.ctrl)
+    
+    def type_text(self, text):
+        """备用方案：直接键盘输入文本"""
+        self.wait_for_hotkey_release()
+        self.keyboard_controller.type(text)
+    
+    def paste_text(self, text):
+        """
+        通过剪贴板（失败时直接键盘输入）把文本粘贴到当前光标位置
+        
+        在粘贴线程中执行；剪贴板原内容由粘贴线程在稍后恢复。
+        """
+        return self.get_paste_executor().paste_text(text, self.send_paste_keys, self.type_text)
+    
     def paste_latest_file_path(self):
         """粘贴最新保存的文件路径到当前光标位置"""
+        import keyboard
+        
         try:
-            if self.latest_saved_file:
-                # 检查文件是否仍然存在
-                if Path(self.latest_saved_file).exists():
-                    # 获取完整的绝对路径
-                    file_path = str(Path(self.latest_saved_file).resolve())
-                    
-                    # 首先尝试使用剪贴板方式粘贴（更可靠）
-                    try:
-                        # 备份当前剪贴板内容
-                        original_clipboard = self.get_clipboard_text()
-                        
-                        # 将文件路径复制到剪贴板
-                        pyperclip.copy(file_path)
-                        
-                        # 短暂延迟确保快捷键释放
-                        time.sleep(0.1)
-                        
-                        # 模拟Ctrl+V粘贴
-                        self.keyboard_controller.press(Key.ctrl)
-                        self.keyboard_controller.press('v')
-                        self.keyboard_controller.release('v')
-                        self.keyboard_controller.release(Key.ctrl)
-                        
-                        # 稍等一下让粘贴操作完成
-                        time.sleep(0.1)
-                        
-                        # 恢复原来的剪贴板内容
-                        if original_clipboard:
-                            threading.Timer(0.5, lambda: pyperclip.copy(original_clipboard)).start()
-                        
-                        print(f"✅ 已通过剪贴板粘贴文件路径: {Path(self.latest_saved_file).name}")
-                        return True
-                        
-                    except Exception as clipboard_error:
-                        print(f"⚠️ 剪贴板粘贴失败，尝试直接输入: {clipboard_error}")
-                        # 备用方案：直接键盘输入
-                        time.sleep(0.1)
-                        self.keyboard_controller.type(file_path)
-                        print(f"✅ 已通过键盘输入文件路径: {Path(self.latest_saved_file).name}")
-                        return True
+            # latest_saved_file 在保存时已经是绝对路径，这里不再解析
+            file_path = self.latest_saved_file
+            if file_path:
+                # 检查文件是否仍然存在（在粘贴线程中执行，不阻塞键盘钩子）
+                if os.path.exists(file_path):
+                    paste_path = self.paste_path_for(file_path)
+                    with self.metrics.timer('paste'):
+                        method = self.paste_text(paste_path)
+                    self.metrics.inc('pasted')
+                    self.metrics.event('pasted', path=paste_path, method=method)
+                    self.mark_used([file_path])
+                    print(f"✅ 已通过{method}粘贴文件路径: {Path(paste_path).name}")
+                    return True
                 else:
-                    print(f"⚠️ 文件不存在: {self.latest_saved_file}")
+                    print(f"⚠️ 文件不存在: {file_path}")
                     return False
             else:
                 print("📝 还没有保存任何截图文件")
@@ -274,14 +638,132 @@ class ClipboardScreenshotSaver:
                 print("🔄 尝试重新注册快捷键...")
                 keyboard.remove_hotkey(self.hotkey)
                 time.sleep(0.1)
-                keyboard.add_hotkey(self.hotkey, self.paste_latest_file_path)
+                keyboard.add_hotkey(self.hotkey, self.on_paste_latest_hotkey)
                 print(f"✅ 快捷键已重新注册: {self.hotkey.upper()}")
             except Exception as hotkey_error:
                 print(f"❌ 重新注册快捷键失败: {hotkey_error}")
             return False
     
+    def mark_used(self, paths):
+        """记录截图被使用的时间，保留策略按最后使用时间清理"""
+        if self.store is None:
+            return
+        try:
+            self.store.touch(paths)
+        except Exception as e:
+            print(f"⚠️ 更新截图使用时间失败: {e}")
+    
+    def format_paths(self, paths):
+        """把多个路径拼成一行，含空格的路径加引号"""
+        return ' '.join(f'"{path}"' if ' ' in path else path for path in paths)
+    
+    def paste_recent_file_paths(self, count=None):
+        """一次粘贴最近 N 张截图的路径（从历史缓冲区读取，不扫描目录）"""
+        try:
+            count = count or self.history_settings.get('paste_count', 3)
+            records = self.history.recent(count) if self.history is not None else []
+            if not records:
+                print("📝 还没有保存任何截图文件")
+                return False
+            # 按截图先后顺序排列，方便在提示词中引用
+            text = self.format_paths([self.paste_path_for(record.path) for record in reversed(records)])
+            method = self.paste_text(text)
+            self.mark_used([record.path for record in records])
+            print(f"✅ 已通过{method}粘贴最近 {len(records)} 张截图的路径")
+            return True
+        except Exception as e:
+            print(f"❌ 粘贴最近截图路径失败: {e}")
+            return False
+    
+    def cycle_history_path(self):
+        """
+        在截图历史中向前循环
+        
+        连续按下时删除上一次粘贴的路径，换成更早一张截图的路径；
+        超过 cycle_timeout 秒未按下则从最新一张重新开始。
+        """
+        from pynput.keyboard import Key
+        
+        try:
+            if self.history is None or len(self.history) == 0:
+                print("📝 还没有保存任何截图文件")
+                return False
+            now = time.monotonic()
+            continuing = (self.cycle_last_text is not None
+                          and now - self.cycle_last_time < self.history_settings.get('cycle_timeout', 3.0))
+            self.cycle_index = (self.cycle_index + 1) % len(self.history) if continuing else 0
+            record = self.history.get(self.cycle_index)
+            
+            if continuing:
+                # 删除上一次粘贴的路径
+                for _ in range(len(self.cycle_last_text)):
+                    self.keyboard_controller.press(Key.backspace)
+                    self.keyboard_controller.release(Key.backspace)
+            
+            text = self.format_paths([self.paste_path_for(record.path)])
+            self.paste_text(text)
+            self.mark_used([record.path])
+            self.cycle_last_text = text
+            self.cycle_last_time = time.monotonic()
+            print(f"✅ 已粘贴历史中第 {self.cycle_index + 1} 张截图: {Path(record.path).name}")
+            return True
+        except Exception as e:
+            print(f"❌ 循环粘贴截图历史失败: {e}")
+            return False
+    
+    def setup_history_hotkeys(self):
+        """注册粘贴最近多张截图和循环历史的快捷键"""
+        import keyboard
+        
+        bindings = (
+            ('paste_recent_hotkey', self.on_paste_recent_hotkey, "粘贴最近多张截图路径"),
+            ('cycle_hotkey', self.on_cycle_hotkey, "循环粘贴更早的截图路径"),
+        )
+        for key, callback, description in bindings:
+            hotkey = self.history_settings.get(key)
+            if not hotkey:
+                continue
+            try:
+                keyboard.add_hotkey(hotkey, callback)
+                print(f"⌨️  快捷键设置成功: {hotkey.upper()} - {description}")
+            except Exception as e:
+                print(f"⚠️ 快捷键 {hotkey.upper()} 设置失败: {e}")
+    
+    def setup_burst_hotkey(self):
+        """注册开始/结束连拍的快捷键"""
+        import keyboard
+        hotkey = self.burst_settings.get('hotkey')
+        if not hotkey:
+            return
+        try:
+            keyboard.add_hotkey(hotkey, self.on_burst_hotkey)
+            print(f"⌨️  快捷键设置成功: {hotkey.upper()} - 开始/结束连拍")
+        except Exception as e:
+            print(f"⚠️ 快捷键 {hotkey.upper()} 设置失败: {e}")
+    
+    def refresh_hotkeys(self, old_hotkeys):
+        """
+        配置中的快捷键变化后，移除旧的快捷键并注册新的
+        
+        Args:
+            old_hotkeys (tuple): (粘贴快捷键, 粘贴多张快捷键, 循环历史快捷键, 连拍快捷键) 的旧值
+        """
+        import keyboard
+        for hotkey in old_hotkeys:
+            if not hotkey:
+                continue
+            try:
+                keyboard.remove_hotkey(hotkey)
+            except (KeyError, ValueError):
+                pass
+        self.setup_hotkey()
+        self.setup_history_hotkeys()
+        self.setup_burst_hotkey()
+    
     def setup_hotkey(self):
         """设置全局快捷键"""
+        import keyboard
+        
         try:
             # 先尝试移除可能存在的旧快捷键
             try:
@@ -295,7 +777,7 @@ class ClipboardScreenshotSaver:
             time.sleep(0.1)
             
             # 使用配置文件中的快捷键
-            keyboard.add_hotkey(self.hotkey, self.paste_latest_file_path)
+            keyboard.add_hotkey(self.hotkey, self.on_paste_latest_hotkey)
             print(f"⌨️  快捷键设置成功: {self.hotkey.upper()} - 粘贴最新截图路径")
             print(f"🔧 调试信息: 快捷键已注册到全局热键系统")
             
@@ -314,7 +796,7 @@ class ClipboardScreenshotSaver:
             for backup_hotkey in backup_hotkeys:
                 try:
                     print(f"🔄 尝试使用备用快捷键: {backup_hotkey.upper()}")
-                    keyboard.add_hotkey(backup_hotkey, self.paste_latest_file_path)
+                    keyboard.add_hotkey(backup_hotkey, self.on_paste_latest_hotkey)
                     self.hotkey = backup_hotkey
                     self.save_config()  # 保存新的快捷键到配置文件
                     print(f"✅ 备用快捷键设置成功: {backup_hotkey.upper()}")
@@ -340,99 +822,404 @@ class ClipboardScreenshotSaver:
             print(f"⚠️ 快捷键状态检查时出现问题，尝试重新注册: {e}")
             self.setup_hotkey()
     
+    def get_fingerprint(self, data):
+        """计算剪贴板原始数据的指纹用于快速比较
+
+        使用 CRC32 加数据长度作为非加密指纹，直接作用于剪贴板中的原始字节，
+        无需解码像素或重新编码为PNG。
+        """
+        if not data:
+            return None
+        return f"{len(data):x}-{zlib.crc32(data):08x}"
+
     def get_image_hash(self, image):
         """计算图片的哈希值用于比较"""
         try:
-            img_bytes = io.BytesIO()
-            image.save(img_bytes, format='PNG')
-            img_data = img_bytes.getvalue()
-            return hashlib.md5(img_data).hexdigest()
+            with self.metrics.timer('image_hash'):
+                return self.get_fingerprint(image.tobytes())
         except Exception as e:
             print(f"计算图片哈希值失败: {e}")
             return None
     
-    def get_clipboard_image(self):
-        """获取剪贴板中的图片"""
+    def get_clipboard_dib(self):
+        """获取剪贴板中图片的原始数据（不解码）"""
         try:
-            # 使用win32clipboard来获取剪贴板中的图片
-            win32clipboard.OpenClipboard()
-            
-            # 检查是否有CF_DIB格式的图片
-            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_DIB):
-                try:
-                    # 获取DIB格式的图片数据
-                    dib_data = win32clipboard.GetClipboardData(win32con.CF_DIB)
-                    win32clipboard.CloseClipboard()
-                    
-                    # 将DIB数据转换为PIL Image
-                    image = Image.open(io.BytesIO(dib_data))
-                    return image
-                except Exception as e:
-                    print(f"处理DIB格式图片失败: {e}")
-            
-            # 检查是否有CF_BITMAP格式的图片
-            elif win32clipboard.IsClipboardFormatAvailable(win32con.CF_BITMAP):
-                try:
-                    # 获取BITMAP格式的图片数据
-                    bitmap_data = win32clipboard.GetClipboardData(win32con.CF_BITMAP)
-                    win32clipboard.CloseClipboard()
-                    
-                    # 将BITMAP数据转换为PIL Image
-                    image = Image.open(io.BytesIO(bitmap_data))
-                    return image
-                except Exception as e:
-                    print(f"处理BITMAP格式图片失败: {e}")
-            
-            else:
-                win32clipboard.CloseClipboard()
-                
+            with self.metrics.timer('read'):
+                return self.clipboard.get_dib()
         except Exception as e:
             print(f"获取剪贴板图片失败: {e}")
+        return None
+    
+    def get_clipboard_files(self):
+        """获取剪贴板中复制的文件路径列表"""
+        try:
+            with self.metrics.timer('read'):
+                return self.clipboard.get_files()
+        except Exception as e:
+            print(f"获取剪贴板文件列表失败: {e}")
+        return None
+    
+    def decode_clipboard_image(self, data):
+        """将剪贴板原始数据解码为PIL Image"""
+        try:
+            with self.metrics.timer('decode'):
+                image = decode_dib(data)
+                image.load()
+                return image
+        except Exception as e:
+            print(f"处理剪贴板图片数据失败: {e}")
+            return None
+    
+    def get_clipboard_image(self):
+        """获取剪贴板中的图片"""
+        data = self.get_clipboard_dib()
+        if data:
+            return self.decode_clipboard_image(data)
+        return None
+    
+    def encode_image(self, image):
+        """将解码后的图片按配置的输出格式编码"""
+        return self.encoder.encode_image(image)
+    
+    def write_screenshot(self, encoded, job=None):
+        """将编码后的数据原子地写入保存目录，返回文件路径"""
+        # 生成文件名（后台任务使用截图时确定的文件名）
+        name = job.name if job is not None and job.name else self.namer.next_name()
+        while True:
+            filepath = self.save_path / f"{name}{self.encoder.extension_for(encoded)}"
             try:
-                win32clipboard.CloseClipboard()
-            except:
-                pass
+                # 先写临时文件再重命名，读取方不会看到写了一半的图片
+                with self.metrics.timer('write'):
+                    path = atomic_write(filepath, encoded)
+                self.metrics.inc('bytes_written', len(encoded))
+                return path
+            except FileExistsError:
+                name = self.namer.next_name()
+    
+    def is_large_frame(self, data):
+        """原始数据是否达到按条带写入的大小"""
+        threshold = megabytes(self.memory_settings.get('stream_threshold_mb'))
+        return threshold is not None and len(data) >= threshold
+    
+    def stream_screenshot(self, data, job=None):
+        """
+        把大截图按条带编码并原子地写入保存目录，不解码整帧
         
-        return None
+        Returns:
+            Path: 文件路径，编码器不支持按条带写入这份数据时返回None
+        """
+        if not self.encoder.can_stream(data):
+            return None
+        strip_rows = self.memory_settings.get('strip_rows', 256)
+        written = []
+        
+        def write(f):
+            written.append(self.encoder.stream(data, f, strip_rows))
+        
+        name = job.name if job is not None and job.name else self.namer.next_name()
+        while True:
+            filepath = self.save_path / f"{name}{self.encoder.extension}"
+            try:
+                path = atomic_write_stream(filepath, write)
+                break
+            except FileExistsError:
+                written.clear()
+                name = self.namer.next_name()
+        self.metrics.inc('bytes_written', written[-1])
+        self.metrics.inc('streamed')
+        return path
+    
+    def stream_job(self, job):
+        """工作池中大截图的条带写入"""
+        return self.stream_screenshot(job.data, job)
     
-    def save_clipboard_image(self):
-        """保存剪贴板中的图片"""
+    def release_memory(self):
+        """处理完大截图后回收内存（配置了 trim 时）"""
+        if self.memory_settings.get('trim', True):
+            release_memory()
+    
+    def save_clipboard_image(self, data=None, digest=None, crop=None):
+        """
+        保存剪贴板中的图片
+        
+        读取 -> 解码 -> 编码 -> 写入，每个阶段只使用上一阶段的结果，
+        同一张截图只会读取一次剪贴板、最多解码一次（dib 格式不解码）。
+        
+        Args:
+            data (bytes): 已从剪贴板读取的原始数据，为None时才读取剪贴板
+            digest (str): 已计算并查询过索引的内容哈希，为None时才查询
+            crop (tuple): 缩小版副本的裁剪区域（截图时的前台窗口）
+        """
         try:
-            image = self.get_clipboard_image()
-            if image:
-                # 生成文件名
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"screenshot_{timestamp}.png"
-                filepath = self.save_path / filename
-                
-                # 保存图片
-                image.save(filepath, 'PNG')
-                
-                # 更新最新保存的文件路径（存储绝对路径）
-                self.latest_saved_file = str(filepath.resolve())
-                
-                print(f"截图已保存: {filepath.resolve()}")
-                return str(filepath.resolve())
-            else:
+            if data is None:
+                data = self.get_clipboard_dib()
+            if not data:
                 print("剪贴板中没有检测到图片")
                 return None
+            
+            # 以前保存过的内容直接返回已有文件
+            if digest is None:
+                digest, existing = self.find_existing_screenshot(data)
+                if existing:
+                    self.reuse_existing_screenshot(existing, digest)
+                    return existing
+            
+            start = time.perf_counter()
+            large = self.is_large_frame(data)
+            filepath = None
+            if large:
+                # 大截图按条带直接写入文件，不在内存中保留整帧解码结果和编码结果
+                with self.metrics.timer('stream'):
+                    filepath = self.stream_screenshot(data)
+            if filepath is None:
+                with self.metrics.timer('encode'):
+                    encoded = self.encoder.encode(data)
+                filepath = self.write_screenshot(encoded)
+                del encoded
+            size = os.path.getsize(filepath)
+            saved_path = self.register_screenshot(digest, filepath, image_info(data))
+            
+            # 更新最新保存的文件路径（存储绝对路径）
+            self.record_capture(saved_path, digest)
+            self.metrics.observe('capture_to_disk', time.perf_counter() - start)
+            self.metrics.inc('captured')
+            self.metrics.event('saved', path=saved_path, bytes=size)
+            
+            print(f"截图已保存: {saved_path}")
+            if saved_path == str(Path(filepath).resolve()):
+                self.save_rendition(data, saved_path, crop)
+            if large:
+                del data
+                self.release_memory()
+            return saved_path
                 
         except Exception as e:
             print(f"保存截图失败: {e}")
+            self.handle_save_error(e)
+            return None
+    
+    def ingest_files(self, paths):
+        """
+        保存剪贴板中复制的图片文件，非图片文件被忽略
+        
+        Returns:
+            list: 保存（或引用）的截图路径
+        """
+        images = [path for path in paths
+                  if Path(path).suffix.lower() in IMAGE_SUFFIXES and os.path.isfile(path)]
+        if not images:
+            print("剪贴板中复制的文件不是图片，已忽略")
+            return []
+        saved = [self.ingest_file(path) for path in images]
+        return [path for path in saved if path]
+    
+    def ingest_file(self, source):
+        """
+        把一个复制的图片文件作为截图：按 file_drop 设置引用原文件，或以硬链接放入保存目录
+        
+        文件内容不解码也不重新编码；只有计算内容哈希（去重）时读取一次文件。
+        """
+        try:
+            source = Path(source).resolve()
+            if self.file_drop == 'reference' or source.parent == self.save_path.resolve():
+                # 引用的文件不登记到索引，保留策略不会删除保存目录以外的原文件
+                path = str(source)
+                self.record_capture(path)
+                self.mark_used([path])
+                self.metrics.inc('referenced')
+                self.metrics.event('referenced', path=path)
+                print(f"已使用复制的图片文件: {path}")
+                return path
+            
+            with open(source, 'rb') as f:
+                data = f.read()
+            digest, existing = self.find_existing_screenshot(data)
+            if existing:
+                self.reuse_existing_screenshot(existing, digest)
+                return existing
+            
+            start = time.perf_counter()
+            while True:
+                filepath = self.save_path / f"{self.namer.next_name()}{source.suffix.lower()}"
+                try:
+                    with self.metrics.timer('write'):
+                        linked = link_or_copy(source, filepath)
+                    break
+                except FileExistsError:
+                    continue
+            saved_path = self.register_screenshot(digest, filepath, image_info(data))
+            self.record_capture(saved_path, digest)
+            self.metrics.observe('capture_to_disk', time.perf_counter() - start)
+            self.metrics.inc('linked')
+            self.metrics.event('linked', path=saved_path, source=str(source), hardlink=linked)
+            print(f"复制的图片文件已{'链接' if linked else '复制'}到: {saved_path}")
+            self.save_rendition(data, saved_path)
+            return saved_path
+        except Exception as e:
+            print(f"保存复制的图片文件失败: {e}")
+            self.handle_save_error(e)
             return None
     
+    def reuse_existing_screenshot(self, existing, digest):
+        """剪贴板内容以前保存过：不编码也不写盘，直接把已有文件记为最新截图"""
+        self.record_capture(existing, digest)
+        self.mark_used([existing])
+        self.metrics.inc('deduplicated')
+        self.metrics.event('deduplicated', path=existing)
+        print(f"截图已存在，无需重复保存: {existing}")
+    
+    def find_existing_screenshot(self, data):
+        """
+        在内容索引中查找相同内容的已保存截图
+        
+        Returns:
+            tuple: (内容哈希, 已有文件路径或None)
+        """
+        if self.store is None:
+            return None, None
+        with self.metrics.timer('content_hash'):
+            digest = content_hash(data)
+        try:
+            with self.metrics.timer('lookup'):
+                return digest, self.store.lookup(digest)
+        except Exception as e:
+            print(f"⚠️ 查询截图索引失败: {e}")
+            return digest, None
+    
+    def register_screenshot(self, digest, filepath, info=None):
+        """
+        把新写入的文件登记到内容索引和截图目录
+        
+        如果同一内容已由其他任务先保存，删除这次写入的重复文件并返回已有文件。
+        
+        Args:
+            info (tuple): (宽, 高, 来源格式)，由 image_info 从剪贴板数据头部读取
+        """
+        saved_path = str(Path(filepath).resolve())
+        if self.store is None or digest is None:
+            return saved_path
+        width, height, source_format = info or (None, None, None)
+        try:
+            canonical = self.store.add(digest, filepath, width, height, source_format)
+        except Exception as e:
+            print(f"⚠️ 登记截图索引失败: {e}")
+            return saved_path
+        if canonical != saved_path:
+            try:
+                os.remove(saved_path)
+            except OSError:
+                pass
+        elif self.retention is not None:
+            try:
+                self.retention.notify_saved(os.path.getsize(saved_path))
+            except OSError:
+                pass
+        return canonical
+    
+    def start_workers(self):
+        """启动后台编码/写入工作池"""
+        if self.worker_pool is not None:
+            return self.worker_pool
+        settings = self.worker_settings
+        try:
+            self.worker_pool = SaveWorkerPool(
+                encode=self.encoder.encode,
+                write=self.write_screenshot,
+                on_saved=self.on_screenshot_saved,
+                on_error=self.on_screenshot_error,
+                mode=settings.get('mode', 'thread'),
+                workers=settings.get('workers', 2),
+                max_queue=settings.get('max_queue', 8),
+                backpressure=settings.get('backpressure', 'drop_oldest'),
+                spill_dir=self.save_path / '.spill',
+                metrics=self.metrics,
+                render=self.renderer.render if self.renderer is not None else None,
+                write_rendition=self.write_rendition,
+                max_bytes=megabytes(self.memory_settings.get('budget_mb')),
+                stream=self.stream_job,
+                stream_threshold=megabytes(self.memory_settings.get('stream_threshold_mb')),
+                release=self.release_memory,
+            ).start()
+        except Exception as e:
+            print(f"⚠️ 启动后台保存工作池失败，将在监控线程中直接保存: {e}")
+            self.worker_pool = None
+        return self.worker_pool
+    
+    def stop_workers(self, wait=True):
+        """停止后台工作池，wait为True时等待已提交的截图写完"""
+        pool, self.worker_pool = self.worker_pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+    
+    def on_screenshot_saved(self, filepath, job):
+        """工作池写入完成后的回调，只有写入成功后才更新最新文件路径"""
+        saved_path = self.register_screenshot(job.fingerprint, filepath, job.info)
+        self.record_capture(saved_path, job.fingerprint, job.seq)
+        # 从监控线程提交到文件落盘的时间，包括排队等待
+        self.metrics.observe('capture_to_disk', time.perf_counter() - job.submitted)
+        self.metrics.inc('captured')
+        self.metrics.event('saved', path=saved_path, seq=job.seq)
+        print(f"截图已保存: {saved_path}")
+    
+    def record_capture(self, saved_path, digest=None, seq=None):
+        """
+        记录一次截图：更新最新文件路径并加入截图历史
+        
+        Args:
+            saved_path (str): 截图文件的绝对路径
+            digest (str): 内容哈希
+            seq (int): 后台任务序号；为None表示同步保存或命中已有文件，视为最新
+        """
+        with self.saved_lock:
+            if seq is None:
+                seq = self.latest_saved_seq
+                if self.worker_pool is not None:
+                    seq = max(seq, self.worker_pool.last_seq)
+            # 多个工作线程可能乱序完成，只接受更新的截图
+            if seq >= self.latest_saved_seq:
+                self.latest_saved_seq = seq
+                self.latest_saved_file = saved_path
+        try:
+            size = os.path.getsize(saved_path)
+        except OSError:
+            size = 0
+        if self.history is not None:
+            record = self.history.add(saved_path, digest, size)
+        else:
+            record = CaptureRecord(saved_path, digest, size)
+        if self.ipc is not None:
+            self.ipc.publish(record)
+    
+    def on_screenshot_error(self, error, job):
+        """工作池保存失败的回调"""
+        print(f"保存截图失败: {error}")
+        self.handle_save_error(error)
+    
+    def handle_save_error(self, error):
+        """记录保存失败；磁盘空间不足时立即按保留策略清理"""
+        self.metrics.inc('failed')
+        self.metrics.event('failed', error=f"{type(error).__name__}: {error}")
+        if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+            if self.retention is not None:
+                print("💾 磁盘空间不足，正在按保留策略清理旧截图...")
+                self.retention.wake()
+            else:
+                print("💾 磁盘空间不足，可在配置文件中启用 retention 自动清理旧截图")
+    
     def copy_latest_file_path_to_clipboard(self):
         """将最新保存的文件路径复制到剪贴板"""
         try:
-            if self.latest_saved_file:
-                if Path(self.latest_saved_file).exists():
-                    file_path = str(Path(self.latest_saved_file).resolve())
+            import pyperclip
+            file_path = self.latest_saved_file
+            if file_path:
+                if os.path.exists(file_path):
+                    file_path = self.paste_path_for(file_path)
                     pyperclip.copy(file_path)
-                    print(f"✅ 文件路径已复制到剪贴板: {Path(self.latest_saved_file).name}")
+                    print(f"✅ 文件路径已复制到剪贴板: {Path(file_path).name}")
                     print(f"📋 您现在可以使用 Ctrl+V 粘贴路径: {file_path}")
                     return True
                 else:
-                    print(f"⚠️ 文件不存在: {self.latest_saved_file}")
+                    print(f"⚠️ 文件不存在: {file_path}")
                     return False
             else:
                 print("📝 还没有保存任何截图文件")
@@ -443,6 +1230,9 @@ class ClipboardScreenshotSaver:
     
     def test_hotkey_functionality(self):
         """测试快捷键功能是否正常"""
+        import pyperclip
+        from pynput.keyboard import Controller
+        
         print("\n🧪 开始测试快捷键功能...")
         
         # 创建一个测试文件路径
@@ -485,10 +1275,14 @@ class ClipboardScreenshotSaver:
         print("")
         return True
 
-    def monitor_clipboard(self):
-        """监控剪贴板变化"""
-        self.is_monitoring = True
+    def monitor_clipboard(self, run_self_test=False, hotkeys=True):
+        """
+        监控剪贴板变化
         
+        Args:
+            run_self_test (bool): 是否在开始监控前运行快捷键自检
+            hotkeys (bool): 是否注册全局快捷键
+        """
         print(f"📁 开始监控剪贴板，保存路径: {self.save_path.resolve()}")
         print("📸 使用您的截图软件截图并复制到剪贴板，图片将自动保存")
         print(f"⌨️  使用 {self.hotkey.upper()} 快捷键直接粘贴最新截图的完整路径（包含盘符）")
@@ -496,52 +1290,293 @@ class ClipboardScreenshotSaver:
         print("🚪 按 Ctrl+C 退出程序")
         print("-" * 50)
         
-        # 设置快捷键
-        self.setup_hotkey()
+        if hotkeys:
+            # 设置快捷键
+            self.setup_hotkey()
+            self.hotkeys_registered = True
+            
+            # 设置备用快捷键（复制到剪贴板）
+            try:
+                import keyboard
+                keyboard.add_hotkey('ctrl+shift+c', self.on_copy_latest_hotkey)
+                print(f"⌨️  备用快捷键设置成功: CTRL+SHIFT+C - 复制最新截图路径到剪贴板")
+            except Exception as e:
+                print(f"⚠️ 备用快捷键设置失败: {e}")
+            
+            # 设置截图历史快捷键
+            self.setup_history_hotkeys()
+            self.setup_burst_hotkey()
         
-        # 设置备用快捷键（复制到剪贴板）
-        try:
-            keyboard.add_hotkey('ctrl+shift+c', self.copy_latest_file_path_to_clipboard)
-            print(f"⌨️  备用快捷键设置成功: CTRL+SHIFT+C - 复制最新截图路径到剪贴板")
-        except Exception as e:
-            print(f"⚠️ 备用快捷键设置失败: {e}")
+        # 运行初始测试（仅在需要时）
+        if run_self_test:
+            self.test_hotkey_functionality()
+        
+        if not self.headless:
+            # 显示启动通知
+            self.show_startup_notification()
+            
+            # 隐藏控制台窗口
+            self.hide_console_window()
+        
+        self.run_monitor_loop()
+    
+    def check_clipboard_once(self):
+        """
+        检查一次剪贴板，有新图片时保存
         
-        # 运行初始测试
-        self.test_hotkey_functionality()
+        Returns:
+            bool: 剪贴板内容是否与上次检查时不同
+        """
+        # 检查剪贴板是否有图片（只读取原始数据，不解码）
+        data = self.get_clipboard_dib()
+        if not data:
+            return self.check_clipboard_files()
         
-        # 显示启动通知
-        self.show_startup_notification()
+        # 计算原始数据的指纹
+        current_hash = self.get_fingerprint(data)
+        changed = current_hash != self.last_seen_hash
+        self.last_seen_hash = current_hash
         
-        # 隐藏控制台窗口
-        self.hide_console_window()
+        # 只有当指纹与上次不同时才解码并保存（复用已读取的数据）
+        if current_hash and current_hash != self.last_image_hash:
+            if self.burst is not None:
+                # 连拍: 只把原始数据按顺序放入连拍队列，不查重、不编码
+                self.last_image_hash = current_hash
+                index = self.burst.add(data)
+                self.metrics.inc('burst_frames')
+                print(f"🎞️ 连拍第 {index} 帧")
+                return changed
+            
+            # 以前保存过的内容直接指向已有文件，不编码也不写盘
+            digest, existing = self.find_existing_screenshot(data)
+            if existing:
+                self.last_image_hash = current_hash
+                self.reuse_existing_screenshot(existing, digest)
+                return changed
+            
+            # 与最近截图几乎相同的内容（光标闪烁、时钟变化等）不保存
+            if self.is_near_duplicate(data):
+                self.last_image_hash = current_hash
+                return changed
+            
+            # 前台窗口要在截图时读取，之后可能已经切换
+            info = image_info(data)
+            crop = self.capture_crop(info)
+            if self.worker_pool is not None:
+                self.last_image_hash = current_hash
+                # 交给后台工作池编码和写入，监控线程立即返回
+                self.worker_pool.submit(data, digest, self.namer.next_name(), info, crop)
+                print("检测到新图片，已加入保存队列")
+                return changed
+            
+            # 保存图片
+            saved_path = self.save_clipboard_image(data, digest, crop)
+            if saved_path:
+                self.last_image_hash = current_hash
+                print(f"检测到新图片，已保存: {saved_path}")
+        return changed
+    
+    def check_clipboard_files(self):
+        """
+        剪贴板中没有图片数据时，检查是否复制了图片文件
         
-        while True:
+        Returns:
+            bool: 剪贴板内容是否与上次检查时不同
+        """
+        if self.file_drop == 'ignore':
+            return False
+        paths = self.get_clipboard_files()
+        if not paths:
+            return False
+        current_hash = 'files-' + self.get_fingerprint('\n'.join(paths).encode('utf-8'))
+        changed = current_hash != self.last_seen_hash
+        self.last_seen_hash = current_hash
+        if current_hash != self.last_image_hash:
+            self.last_image_hash = current_hash
+            self.ingest_files(paths)
+        return changed
+    
+    def burst_interval(self):
+        """连拍期间检查剪贴板的间隔（秒）"""
+        from screenshot_burst import DEFAULT_BURST_SETTINGS
+        return self.burst_settings.get('interval') or DEFAULT_BURST_SETTINGS['interval']
+    
+    def start_burst(self, output=None):
+        """
+        开始连拍：缩短剪贴板检查间隔，之后复制的每一帧都按顺序保存到同一个会话路径
+        
+        Args:
+            output (str): frames / webp / apng，None 表示使用配置
+        
+        Returns:
+            BurstSession: 进行中的连拍，无法开始时返回None
+        """
+        with self.config_lock:
+            if self.burst is not None:
+                return self.burst
+            from screenshot_burst import BurstSession
+            settings = self.burst_settings
             try:
-                # 检查剪贴板是否有图片
-                image = self.get_clipboard_image()
-                
-                if image:
-                    # 计算当前图片的哈希值
-                    current_hash = self.get_image_hash(image)
-                    
-                    # 只有当图片哈希值与上次不同时才保存
-                    if current_hash and current_hash != self.last_image_hash:
-                        # 保存图片
-                        saved_path = self.save_clipboard_image()
-                        if saved_path:
-                            self.last_image_hash = current_hash
-                            print(f"检测到新图片，已保存: {saved_path}")
-                    elif current_hash == self.last_image_hash:
-                        # 这是相同的图片，不需要保存
-                        pass
-                
-                # 短暂休眠避免过度占用CPU
-                time.sleep(0.5)
+                self.burst = BurstSession(
+                    self.save_path, self.burst_namer.next_name(), self.encoder,
+                    output=output or settings.get('output', 'frames'),
+                    frame_duration=settings.get('frame_duration', 500),
+                    budget_mb=settings.get('budget_mb', 256),
+                    workers=settings.get('workers', 2),
+                ).start()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 开始连拍失败: {e}")
+                return None
+            if self.watcher is not None:
+                self.watcher.set_burst(self.burst_interval())
+            self.metrics.event('burst_started', session=self.burst.name, output=self.burst.output)
+        hotkey = self.burst_settings.get('hotkey')
+        print(f"🎞️ 连拍开始，复制的每一帧都会保存到 {self.burst.directory.name}"
+              f"{f'，按 {hotkey.upper()} 结束' if hotkey else ''}")
+        return self.burst
+    
+    def stop_burst(self):
+        """
+        结束连拍：恢复检查间隔，剩余的帧在后台线程中写完（或合成动图），不阻塞剪贴板监控
+        
+        Returns:
+            threading.Thread: 写完连拍的线程，没有进行中的连拍时返回None
+        """
+        with self.config_lock:
+            session, self.burst = self.burst, None
+            if session is None:
+                return None
+            if self.watcher is not None:
+                self.watcher.set_burst(None)
+        print(f"🎞️ 连拍结束，共 {session.frames} 帧，正在写入剩余的 {session.pending} 帧")
+        thread = threading.Thread(target=self.finish_burst, args=(session,), name='burst-finish', daemon=True)
+        self.burst_finishers = [finisher for finisher in self.burst_finishers if finisher.is_alive()]
+        self.burst_finishers.append(thread)
+        thread.start()
+        return thread
+    
+    def finish_burst(self, session):
+        """写完一次连拍，把会话路径记为最新截图（粘贴快捷键粘贴该路径）"""
+        try:
+            path = session.finish()
+        except Exception as e:
+            print(f"❌ 写入连拍失败: {e}")
+            return
+        for index, error in session.failed:
+            print(f"⚠️ 连拍第 {index} 帧保存失败: {error}")
+        if path is None:
+            print("连拍期间没有保存任何截图")
+            return
+        saved_path = str(Path(path).resolve())
+        self.record_capture(saved_path)
+        self.metrics.event('burst_saved', path=saved_path, frames=session.saved, spilled=session.spilled)
+        spilled = f"，其中 {session.spilled} 帧曾暂存到磁盘" if session.spilled else ''
+        print(f"✅ 连拍已保存: {saved_path}（{session.saved} 帧{spilled}，"
+              f"用时 {time.monotonic() - session.started:.1f} 秒）")
+    
+    def on_burst_hotkey(self):
+        """连拍快捷键：开始或结束连拍"""
+        if self.burst is None:
+            self.start_burst()
+        else:
+            self.stop_burst()
+    
+    def check_burst_limits(self):
+        """达到最大帧数或长时间没有新帧时自动结束连拍"""
+        session = self.burst
+        if session is None:
+            return
+        max_frames = self.burst_settings.get('max_frames')
+        idle_timeout = self.burst_settings.get('idle_timeout')
+        if max_frames and session.frames >= max_frames:
+            print(f"🎞️ 已达到连拍的最大帧数 {max_frames}")
+            self.stop_burst()
+        elif idle_timeout and time.monotonic() - session.last_frame >= idle_timeout:
+            self.stop_burst()
+    
+    def start_ipc(self):
+        """按配置启动本机 IPC 查询服务，启动失败时只打印警告"""
+        if self.ipc is not None:
+            return self.ipc
+        try:
+            from screenshot_ipc import create_ipc_server
+            self.ipc = create_ipc_server(
+                self.save_path,
+                recent=lambda count: self.history.recent(count) if self.history is not None else [],
+                describe=self.describe_capture,
+                stats=self.ipc_stats,
+                settings=self.ipc_settings,
+                events=self.ipc_events,
+                epoch=self.ipc_epoch,
+            )
+            if self.ipc is not None:
+                self.ipc.start()
+        except Exception as e:
+            print(f"⚠️ 启动 IPC 接口失败: {e}")
+            self.ipc = None
+        return self.ipc
+    
+    def stop_ipc(self):
+        if self.ipc is not None:
+            self.ipc.stop()
+            self.ipc_events = self.ipc.recent_events()
+            self.ipc_epoch = self.ipc.epoch
+            self.ipc = None
+    
+    def describe_capture(self, record):
+        """IPC 返回给客户端的截图补充信息"""
+        return {
+            'paste_path': self.paste_path_for(record.path),
+            'exists': os.path.exists(record.path),
+        }
+    
+    def ipc_stats(self):
+        """IPC stats 请求中保存器自身的状态"""
+        pool = self.worker_pool
+        stats = {
+            'save_path': str(self.save_path.resolve()),
+            'latest': self.latest_saved_file,
+            'history': len(self.history) if self.history is not None else 0,
+            'queue_depth': pool.pending if pool is not None else 0,
+            'queued_mb': pool.held_bytes / 2**20 if pool is not None else 0,
+            'dropped': pool.dropped if pool is not None else 0,
+            'rss_mb': rss_mb(),
+        }
+        if self.metrics.enabled:
+            stats['metrics'] = self.metrics.snapshot()
+        return stats
+    
+    def run_monitor_loop(self):
+        """等待剪贴板变化通知并保存新图片，直到调用 stop_monitoring"""
+        self.is_monitoring = True
+        self.stop_event.clear()
+        self.watcher = self.clipboard.create_watcher()
+        if self.burst is not None:
+            self.watcher.set_burst(self.burst_interval())
+        self.start_workers()
+        self.metrics.gauge('queue_depth', lambda: self.worker_pool.pending if self.worker_pool is not None else 0)
+        self.metrics.gauge('queued_bytes', lambda: self.worker_pool.held_bytes if self.worker_pool is not None else 0)
+        self.metrics.gauge('resident_memory_mb', rss_mb)
+        self.metrics.start()
+        if self.retention is not None:
+            self.retention.start()
+        self.start_ipc()
+        self.config.watch(self.on_config_changed)
+        
+        while not self.stop_event.is_set():
+            try:
+                # 等待剪贴板变化（有序列号的平台不会在空闲时打开剪贴板）
+                if self.watcher.wait(timeout=1.0):
+                    with self.config_lock:
+                        changed = self.check_clipboard_once()
+                    self.watcher.feedback(changed)
+                if self.burst is not None:
+                    self.check_burst_limits()
                 
-                # 每100次循环检查一次快捷键状态
-                self.hotkey_check_counter += 1
-                if self.hotkey_check_counter >= 100:
-                    self.hotkey_check_counter = 0
+                # 定期检查快捷键状态
+                now = time.monotonic()
+                if now - self.last_hotkey_check >= self.HOTKEY_CHECK_INTERVAL:
+                    self.last_hotkey_check = now
                     self.check_and_refresh_hotkey()
                 
             except KeyboardInterrupt:
@@ -549,17 +1584,258 @@ class ClipboardScreenshotSaver:
                 break
             except Exception as e:
                 print(f"监控过程中出现错误: {e}")
-                time.sleep(1)
+                self.stop_event.wait(1)
+        
+        self.watcher.close()
+        self.config.stop()
+        self.stop_burst()
+        for thread in self.burst_finishers:
+            thread.join()
+        self.burst_finishers = []
+        self.stop_workers(wait=True)
+        self.stop_ipc()
+        if self.retention is not None:
+            self.retention.stop()
+        if self.paste_executor is not None:
+            self.paste_executor.stop()
+            if self.paste_executor.histogram.count:
+                print(f"⏱️ 快捷键到粘贴延迟: {self.paste_executor.histogram.summary()}")
+        self.metrics.stop()
+        self.is_monitoring = False
+    
+    def stop_monitoring(self):
+        """停止剪贴板监控"""
+        self.stop_event.set()
+        if self.watcher is not None:
+            self.watcher.close()
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    import argparse
+    from screenshot_burst import BURST_OUTPUTS
+    from screenshot_encoders import ENCODERS
+    from screenshot_export import DEFAULT_SESSION_GAP, EXPORT_FORMATS
+    parser = argparse.ArgumentParser(description="剪贴板截图保存器")
+    parser.add_argument('--save-path', help="截图保存路径（不弹出文件夹选择对话框）")
+    parser.add_argument('--headless', action='store_true',
+                        help="无界面模式：不弹出对话框、不隐藏控制台，保存路径取自配置文件")
+    parser.add_argument('--self-test', action='store_true', help="开始监控前运行快捷键自检")
+    parser.add_argument('--no-hotkeys', action='store_true', help="不注册全局快捷键")
+    parser.add_argument('--daemon', action='store_true',
+                        help="守护进程模式：无界面运行并启用本机 IPC 接口（配合 screenshot_client.py 使用）")
+    parser.add_argument('--burst', action='store_true', help="启动后立即开始连拍")
+    parser.add_argument('--burst-output', choices=BURST_OUTPUTS,
+                        help="连拍保存为编号的文件（frames）或动图（webp / apng），默认取自配置")
+    
+    catalog = parser.add_argument_group('截图目录', "查询保存目录的截图索引，查询完成后直接退出")
+    catalog.add_argument('--find', action='store_true', help="按条件搜索已保存的截图")
+    catalog.add_argument('--since', help="只列出此时间之后的截图，例如 1h / 30m / 2d 或 2024-05-01T09:00")
+    catalog.add_argument('--until', help="只列出此时间之前的截图，格式同 --since")
+    catalog.add_argument('--min-width', type=int, help="最小宽度（像素）")
+    catalog.add_argument('--min-height', type=int, help="最小高度（像素）")
+    catalog.add_argument('--tag', help="只列出带有此标签的截图")
+    catalog.add_argument('--limit', type=int, help="最多列出（或导出最新的）N 张截图（--find 默认50）")
+    catalog.add_argument('--set-tags', nargs=2, metavar=('FILE', 'TAGS'),
+                         help="为截图设置标签，多个标签用逗号分隔")
+    catalog.add_argument('--index', action='store_true', help="为保存目录中尚未登记的截图补建索引")
+    catalog.add_argument('--workers', type=int,
+                         help="补建索引和导出时的并行线程数（默认8），迁移时的进程数（默认为CPU核数）")
+    catalog.add_argument('--export', metavar='OUTPUT',
+                         help="把选出的截图导出为 .zip / .tar 归档或 .png / .jpg 总览图，可与 --since / --until / --tag / --session 组合")
+    catalog.add_argument('--export-format', choices=EXPORT_FORMATS, help="导出格式（默认按 OUTPUT 的扩展名）")
+    catalog.add_argument('--session', type=int, nargs='?', const=1, metavar='N',
+                         help="只导出第 N 近的截图会话（默认1，即最近一次）")
+    catalog.add_argument('--session-gap', type=float, default=DEFAULT_SESSION_GAP / 60,
+                         help="截图间隔超过多少分钟时视为新的会话（默认10）")
+    catalog.add_argument('--migrate', action='store_true',
+                         help="用当前的编码器重新编码保存目录中已有的截图（中断后再次运行会继续）")
+    catalog.add_argument('--migrate-format', choices=tuple(ENCODERS) + ('keep',),
+                         help="迁移的目标格式（默认取配置文件中的 encoder），keep 表示不重新编码")
+    catalog.add_argument('--migrate-rename', action='store_true', help="迁移时把旧的文件名改为当前的命名方式")
+    catalog.add_argument('--dry-run', action='store_true', help="迁移试运行：编码并统计可节省的空间，不修改任何文件")
+    catalog.add_argument('--no-verify', action='store_true', help="迁移时不逐像素校验重新编码的结果")
+    catalog.add_argument('--restart', action='store_true', help="忽略迁移检查点，从头开始")
+    catalog.add_argument('--retention-report', action='store_true',
+                         help="按保留策略试运行，列出将被删除的截图，不删除任何文件")
+    catalog.add_argument('--apply-retention', action='store_true', help="按保留策略删除旧截图")
+    catalog.add_argument('--max-age-days', type=float, help="覆盖配置: 删除超过N天未使用的截图")
+    catalog.add_argument('--max-total-mb', type=float, help="覆盖配置: 截图总大小上限（MB）")
+    catalog.add_argument('--max-files', type=int, help="覆盖配置: 截图数量上限")
+    catalog.add_argument('--keep-recent', type=int, help="覆盖配置: 始终保留最近使用的N张")
+    return parser.parse_args(argv)
+
+def load_config_file():
+    """读取并校验配置文件，不存在或无效时返回默认配置"""
+    return ConfigManager(CONFIG_FILENAME).load().to_dict()
+
+def resolve_catalog_path(args):
+    """目录命令的保存路径：命令行优先，其次是配置文件"""
+    if args.save_path:
+        return Path(args.save_path)
+    return Path(load_config_file().get('save_path', 'screenshots'))
+
+def run_retention_command(store, args):
+    """按配置（可被命令行覆盖）试运行或执行保留策略"""
+    settings = dict(DEFAULT_RETENTION_SETTINGS)
+    settings.update(load_config_file().get('retention', {}))
+    settings.pop('enabled', None)
+    for key in ('max_age_days', 'max_total_mb', 'max_files', 'keep_recent'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    engine = RetentionEngine(store, **settings)
+    folder = load_config_file().get('renditions', {}).get('folder', DEFAULT_RENDITION_SETTINGS['folder'])
+    engine.on_removed = lambda paths: remove_renditions(paths, folder)
+    if not engine.enabled:
+        print("⚠️ 没有设置任何保留策略（max_age_days / max_total_mb / max_files）")
+        return
+    start = time.perf_counter()
+    report = engine.run_once(dry_run=not args.apply_retention)
+    elapsed = time.perf_counter() - start
+    print(report.format())
+    print(f"⏱️ 用时 {elapsed * 1000:.1f} ms")
+
+def run_export_command(store, args):
+    """按时间范围、标签或会话选出截图并导出，输出清单"""
+    from screenshot_export import export_captures, format_manifest, select_captures
+    try:
+        since = parse_since(args.since) if args.since else None
+        until = parse_since(args.until) if args.until else None
+    except ValueError as e:
+        print(f"❌ 无法识别的时间: {e}")
+        return 1
+    items = select_captures(store, since=since, until=until, tag=args.tag, session=args.session,
+                            session_gap=args.session_gap * 60, limit=args.limit)
+    if not items:
+        print("❌ 没有符合条件的截图")
+        return 1
+    start = time.perf_counter()
+    try:
+        entries, skipped = export_captures(items, args.export, args.export_format, workers=args.workers or 8)
+    except FileExistsError:
+        print(f"❌ 输出文件已存在: {args.export}")
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"❌ 导出失败: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(format_manifest(entries), end='')
+    for path, error in skipped:
+        print(f"⚠️ 已跳过无法读取的截图 {path}: {error}")
+    total = sum(entry.size for entry in entries)
+    print(f"📦 已导出 {len(entries)} 张截图（{total / 2**20:.1f} MB）到 {args.export}，"
+          f"用时 {elapsed:.2f} 秒")
+    return 0
+
+def run_migrate_command(store, args):
+    """用配置的（或指定的）编码器重新编码已有截图，按需改名，输出吞吐量和节省的空间"""
+    from screenshot_migrate import migrate_folder
+    config = load_config_file()
+    settings = dict(DEFAULT_ENCODER_SETTINGS)
+    settings.update(config.get('encoder', {}))
+    if args.migrate_format and args.migrate_format != 'keep':
+        settings['format'] = args.migrate_format
+    try:
+        encoder = None if args.migrate_format == 'keep' else create_encoder(settings)
+    except (TypeError, ValueError) as e:
+        print(f"❌ 编码器设置无效: {e}")
+        return 1
+    if encoder is None and not args.migrate_rename:
+        print("⚠️ 既不重新编码也不改名，没有需要迁移的内容")
+        return 1
+    target = '保持原格式' if encoder is None else encoder.name
+    print(f"🔄 {'试运行' if args.dry_run else '开始'}迁移 {store.root}（目标: {target}"
+          f"{'，改为当前的命名方式' if args.migrate_rename else ''}）")
+
+    def progress(done, total):
+        if done % 500 == 0 or done == total:
+            print(f"\r   {done}/{total}", end='', flush=True)
+
+    folder = config.get('renditions', {}).get('folder', DEFAULT_RENDITION_SETTINGS['folder'])
+    try:
+        report = migrate_folder(store.root, encoder, rename=args.migrate_rename, workers=args.workers,
+                                verify=not args.no_verify, dry_run=args.dry_run, limit=args.limit,
+                                restart=args.restart, store=store, rendition_folder=folder, progress=progress)
+    except KeyboardInterrupt:
+        print("\n⏸️ 迁移已中断，进度已保存，再次运行同一命令即可继续")
+        return 130
+    if report.planned:
+        print()
+    print(report.format())
+    return 1 if report.counts['failed'] else 0
+
+def run_catalog_command(args):
+    """执行 --index / --migrate / --find / --set-tags / --export / 保留策略命令，不启动监控也不导入图形界面相关模块"""
+    save_path = resolve_catalog_path(args)
+    if not save_path.is_dir():
+        print(f"❌ 保存目录不存在: {save_path}")
+        return 1
+    store = ScreenshotStore(save_path)
+    try:
+        if args.index:
+            start = time.perf_counter()
+            added = index_folder(store, workers=args.workers or 8)
+            print(f"✅ 新登记 {added} 个文件，索引共 {len(store)} 条，"
+                  f"用时 {time.perf_counter() - start:.2f} 秒")
+        if args.migrate:
+            status = run_migrate_command(store, args)
+            if status:
+                return status
+        if args.retention_report or args.apply_retention:
+            run_retention_command(store, args)
+        if args.set_tags:
+            path, tags = args.set_tags
+            if store.set_tags(path, tags.split(',')):
+                print(f"✅ 已设置标签: {path}")
+            else:
+                print(f"❌ 索引中没有该文件: {path}")
+        if args.find:
+            try:
+                since = parse_since(args.since) if args.since else None
+                until = parse_since(args.until) if args.until else None
+            except ValueError as e:
+                print(f"❌ 无法识别的时间: {e}")
+                return 1
+            start = time.perf_counter()
+            results = store.find(since=since, until=until, min_width=args.min_width,
+                                 min_height=args.min_height, tag=args.tag,
+                                 limit=args.limit if args.limit is not None else 50)
+            elapsed = (time.perf_counter() - start) * 1000
+            for item in results:
+                captured = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['created']))
+                size = f"{item['width']}x{item['height']}" if item['width'] else '?'
+                tags = f"  [{','.join(item['tags'])}]" if item['tags'] else ''
+                print(f"{captured}  {size:>11}  {item['size'] / 1024:8.1f} KB  {item['path']}{tags}")
+            print(f"🔍 找到 {len(results)} 个截图（查询用时 {elapsed:.1f} ms）")
+        if args.export:
+            return run_export_command(store, args)
+    finally:
+        store.close()
+    return 0
 
-def main():
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
+    if (args.find or args.index or args.set_tags or args.export or args.migrate
+            or args.retention_report or args.apply_retention):
+        sys.exit(run_catalog_command(args))
     print("=== 剪贴板截图保存器 ===")
     
     # 创建截图保存器
-    saver = ClipboardScreenshotSaver()
+    try:
+        saver = ClipboardScreenshotSaver(save_path=args.save_path, headless=args.headless or args.daemon)
+    except RuntimeError as e:
+        # 没有可用的剪贴板（无图形会话或缺少剪贴板工具）时无法监控
+        print(f"❌ 无法读取剪贴板: {e}")
+        sys.exit(1)
+    if args.daemon:
+        saver.set_override('ipc', 'enabled', True)
+    if args.burst_output:
+        saver.set_override('burst', 'output', args.burst_output)
+    if args.burst:
+        saver.start_burst()
     
     # 启动剪贴板监控
-    saver.monitor_clipboard()
+    saver.monitor_clipboard(run_self_test=args.self_test, hotkeys=not args.no_hotkeys)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
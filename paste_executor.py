@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步粘贴执行器
+
+全局快捷键的回调运行在 keyboard 库的钩子线程上，在回调里等待、读写剪贴板会拖慢
+所有按键的处理。这里用一个专门的粘贴线程执行所有粘贴：
+  - 快捷键回调只把请求放进队列并立即返回
+  - 同一种请求在队列中尚未执行时再次按下会被合并，快速连按不会堆积
+  - 粘贴后恢复剪贴板原内容的操作由粘贴线程按截止时间执行，不再为每次粘贴创建定时器线程；
+    新的粘贴会取消尚未执行的恢复，并沿用最初备份的剪贴板内容
+  - 恢复前检查剪贴板序列号（不支持时比较文本），期间剪贴板被其他程序改写则不恢复
+  - 记录从按下快捷键到发出粘贴按键的延迟直方图
+"""
+import threading
+import time
+from collections import deque
+
+from pipeline_metrics import LatencyHistogram
+
+
+class PasteRequest:
+    """一次待执行的粘贴"""
+    __slots__ = ('key', 'action', 'pressed')
+
+    def __init__(self, key, action, pressed):
+        self.key = key
+        self.action = action
+        self.pressed = pressed
+
+
+class _PendingRestore:
+    """粘贴后待恢复的剪贴板内容"""
+    __slots__ = ('text', 'pasted', 'sequence', 'deadline')
+
+    def __init__(self, text, pasted, sequence, deadline):
+        self.text = text
+        self.pasted = pasted
+        self.sequence = sequence
+        self.deadline = deadline
+
+
+class PasteExecutor:
+    """单线程粘贴执行器"""
+
+    def __init__(self, copy_text, read_text, get_sequence=None, restore_delay=0.5, histogram=None):
+        """
+        Args:
+            copy_text (callable): 把文本写入剪贴板
+            read_text (callable): 读取剪贴板中的文本
+            get_sequence (callable): 读取剪贴板序列号，平台不支持时返回None
+            restore_delay (float): 粘贴后多久恢复剪贴板原内容（秒）
+            histogram (LatencyHistogram): 记录按键到粘贴延迟的直方图
+        """
+        self.copy_text = copy_text
+        self.read_text = read_text
+        self.get_sequence = get_sequence
+        self.restore_delay = restore_delay
+        self.histogram = histogram if histogram is not None else LatencyHistogram()
+        self.coalesced = 0          # 被合并掉的请求数
+        self.skipped_restores = 0   # 因剪贴板已被改写而放弃的恢复次数
+        self.current = None         # 正在执行的请求
+        self._pending = deque()
+        self._restore = None        # 只在粘贴线程中访问
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def submit(self, key, action, coalesce=True):
+        """
+        提交粘贴请求（在快捷键回调中调用，立即返回）
+
+        Args:
+            key (str): 请求类型，coalesce 为True时同类型的未执行请求只保留一个
+            action (callable): 在粘贴线程中执行的函数
+            coalesce (bool): 是否与队列中同类型的请求合并
+
+        Returns:
+            bool: False 表示请求已与队列中的请求合并
+        """
+        pressed = time.perf_counter()
+        with self._cond:
+            if coalesce and any(request.key == key for request in self._pending):
+                self.coalesced += 1
+                return False
+            self._pending.append(PasteRequest(key, action, pressed))
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='paste-executor', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def _next(self):
+        """等待下一个请求；到达恢复截止时间时返回None"""
+        with self._cond:
+            while not self._pending and not self._stopping:
+                if self._restore is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._restore.deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._pending:
+                return self._pending.popleft()
+            return None
+
+    def _run(self):
+        while True:
+            request = self._next()
+            if request is None:
+                self._restore_clipboard()
+                with self._cond:
+                    if self._stopping and not self._pending:
+                        break
+                continue
+            self.current = request
+            try:
+                request.action()
+            except Exception as e:
+                print(f"❌ 粘贴失败: {e}")
+            finally:
+                self.current = None
+
+    def paste_text(self, text, send_paste, type_text=None):
+        """
+        把文本放入剪贴板并发送粘贴按键，剪贴板失败时直接键盘输入
+
+        应在粘贴线程中调用（也就是在提交的 action 中）。
+
+        Args:
+            send_paste (callable): 发送 Ctrl+V
+            type_text (callable): 备用方案，直接输入文本
+
+        Returns:
+            str: 使用的方式
+        """
+        pending = self._restore
+        original = sequence = None
+        copied = False
+        try:
+            # 上一次的恢复还没执行时沿用最初备份的剪贴板内容
+            original = pending.text if pending is not None else self.read_text()
+            self.copy_text(text)
+            copied = True
+            # 剪贴板已被改写，上一次的恢复由这一次接替
+            self._restore = None
+            sequence = self.get_sequence() if self.get_sequence is not None else None
+            send_paste()
+            method = '剪贴板'
+        except Exception as clipboard_error:
+            if not copied:
+                # 剪贴板没有被改写，无需恢复；上一次的恢复保持不变
+                original = None
+            if type_text is None:
+                self._schedule_restore(original, text, sequence)
+                raise
+            print(f"⚠️ 剪贴板粘贴失败，尝试直接输入: {clipboard_error}")
+            type_text(text)
+            method = '键盘输入'
+        if self.current is not None:
+            self.histogram.record(time.perf_counter() - self.current.pressed)
+        self._schedule_restore(original, text, sequence)
+        return method
+
+    def _schedule_restore(self, original, pasted, sequence):
+        """粘贴完成 restore_delay 秒后把剪贴板恢复为 original"""
+        if original:
+            self._restore = _PendingRestore(original, pasted, sequence,
+                                            time.monotonic() + self.restore_delay)
+
+    def _restore_clipboard(self):
+        restore, self._restore = self._restore, None
+        if restore is None:
+            return
+        try:
+            # 剪贴板在此期间被改写（用户又复制了别的内容）时不恢复，避免覆盖更新的内容
+            if restore.sequence is not None:
+                unchanged = self.get_sequence() == restore.sequence
+            else:
+                unchanged = self.read_text() == restore.pasted
+            if not unchanged:
+                self.skipped_restores += 1
+                return
+            self.copy_text(restore.text)
+        except Exception as e:
+            print(f"⚠️ 恢复剪贴板内容失败: {e}")
+
+    def join(self, timeout=None):
+        """等待队列中的请求执行完（不等待剪贴板恢复）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if not self._pending and self.current is None:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+    def stop(self):
+        """执行完已提交的请求和待恢复的剪贴板内容后停止粘贴线程"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        with self._cond:
+            self._thread = None
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+感知哈希与近似重复检测
+
+在缩小后的灰度缩略图上计算 dHash 或 pHash，汉明距离小于阈值的两张截图视为
+几乎相同（例如只有光标闪烁或时钟数字变化）。安装了 NumPy 时使用向量化计算，
+否则退回纯 Python 实现。PIL 和 NumPy 在第一次计算哈希时才导入。
+"""
+import math
+from collections import deque
+
+
+_numpy = None
+
+
+def _np():
+    """导入 NumPy，未安装时返回None（NumPy 是可选依赖）"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+DEFAULT_NEAR_DUPLICATE_SETTINGS = {
+    'enabled': False,
+    'method': 'dhash',   # dhash 或 phash
+    'threshold': 4,      # 汉明距离不超过该值视为几乎相同
+    'history': 64,       # 与最近多少张截图比较
+}
+
+
+def _thumbnail(image, width, height):
+    """先缩小再转灰度，避免在全分辨率上做颜色转换"""
+    from PIL import Image
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+    small = image.resize((width, height), Image.BILINEAR, reducing_gap=2.0)
+    return small.convert('L')
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def dhash(image, size=8):
+    """差异哈希：比较缩略图中每行相邻像素的亮度，返回 size*size 位整数"""
+    thumb = _thumbnail(image, size + 1, size)
+    np = _np()
+    if np is not None:
+        pixels = np.asarray(thumb, dtype=np.int16)
+        return _bits_to_int((pixels[:, 1:] > pixels[:, :-1]).ravel())
+    pixels = list(thumb.getdata())
+    bits = []
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits.append(pixels[offset + col + 1] > pixels[offset + col])
+    return _bits_to_int(bits)
+
+
+_dct_cache = {}
+
+
+def _dct_matrix(n):
+    np = _np()
+    if n not in _dct_cache:
+        k = np.arange(n)[:, None]
+        x = np.arange(n)[None, :]
+        matrix = np.cos(math.pi * (2 * x + 1) * k / (2 * n)) * math.sqrt(2.0 / n)
+        matrix[0] /= math.sqrt(2.0)
+        _dct_cache[n] = matrix
+    return _dct_cache[n]
+
+
+def phash(image, size=8, highfreq_factor=4):
+    """感知哈希：对缩略图做二维DCT，低频系数与其中位数比较，需要 NumPy"""
+    np = _np()
+    if np is None:
+        raise RuntimeError("pHash 需要安装 numpy，请改用 dhash")
+    n = size * highfreq_factor
+    pixels = np.asarray(_thumbnail(image, n, n), dtype=np.float64)
+    matrix = _dct_matrix(n)
+    low = (matrix @ pixels @ matrix.T)[:size, :size]
+    return _bits_to_int((low > np.median(low)).ravel())
+
+
+HASH_METHODS = {
+    'dhash': dhash,
+    'phash': phash,
+}
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """最近若干张截图的感知哈希索引"""
+
+    def __init__(self, method='dhash', threshold=4, capacity=64):
+        """
+        Args:
+            method (str): dhash 或 phash
+            threshold (int): 汉明距离不超过该值时视为近似重复
+            capacity (int): 保留最近多少张截图的哈希
+        """
+        if method not in HASH_METHODS:
+            raise ValueError(f"未知的感知哈希算法: {method}")
+        if method == 'phash' and _np() is None:
+            raise ValueError("pHash 需要安装 numpy")
+        self.hash_image = HASH_METHODS[method]
+        self.threshold = int(threshold)
+        self.recent = deque(maxlen=max(1, int(capacity)))
+
+    def find(self, value):
+        """返回最接近的近似重复哈希的距离，没有时返回None"""
+        if not self.recent:
+            return None
+        np = _np()
+        if np is not None and max(value, *self.recent).bit_length() <= 64:
+            values = np.array(self.recent, dtype=np.uint64)
+            xor = np.bitwise_xor(values, np.uint64(value))
+            distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            best = int(distances.min())
+        else:
+            best = min(hamming_distance(value, other) for other in self.recent)
+        return best if best <= self.threshold else None
+
+    def check(self, image):
+        """
+        检查图片是否与最近的截图近似重复，不重复时加入索引
+
+        Returns:
+            int: 近似重复时返回汉明距离，否则返回None
+        """
+        value = self.hash_image(image)
+        distance = self.find(value)
+        if distance is None:
+            self.recent.append(value)
+        return distance
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图流水线的指标与结构化日志
+
+记录各阶段（读取剪贴板、计算指纹、查询索引、编码、写盘、粘贴等）的耗时直方图，
+截图保存/去重/丢弃/失败次数、写入字节数和队列深度，并通过以下方式导出：
+  - 结构化日志: 每个事件一行 JSON，控制台被隐藏后仍然可以查看
+  - Prometheus 文本格式快照文件，定期原子地重写
+  - 可选的本机 HTTP 端点 http://127.0.0.1:<port>/metrics
+
+未启用时使用 NullMetrics，所有埋点都是空方法，几乎没有开销。
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+DEFAULT_METRICS_SETTINGS = {
+    'enabled': False,
+    'log_file': '.metrics.jsonl',        # 结构化事件日志（相对保存目录）
+    'snapshot_file': '.metrics.prom',    # Prometheus 文本格式快照（相对保存目录）
+    'snapshot_interval': 15,             # 快照重写间隔（秒）
+    'http_port': None,                   # 设置后在 127.0.0.1 上提供 /metrics
+}
+
+# 计数器名称 -> (Prometheus 指标名, 标签)
+COUNTERS = {
+    'captured': ('screenshot_saver_captures_total', 'result="saved"'),
+    'deduplicated': ('screenshot_saver_captures_total', 'result="deduplicated"'),
+    'near_duplicate': ('screenshot_saver_captures_total', 'result="near_duplicate"'),
+    'linked': ('screenshot_saver_captures_total', 'result="linked"'),
+    'referenced': ('screenshot_saver_captures_total', 'result="referenced"'),
+    'dropped': ('screenshot_saver_captures_total', 'result="dropped"'),
+    'failed': ('screenshot_saver_captures_total', 'result="failed"'),
+    'streamed': ('screenshot_saver_streamed_total', ''),
+    'burst_frames': ('screenshot_saver_burst_frames_total', ''),
+    'bytes_written': ('screenshot_saver_bytes_written_total', ''),
+    'pasted': ('screenshot_saver_pastes_total', ''),
+}
+
+
+class LatencyHistogram:
+    """按固定分桶统计的延迟直方图（毫秒），记录一次的开销是常数"""
+
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, bounds_ms=None):
+        self.bounds = tuple(bounds_ms or self.BOUNDS_MS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """记录一次延迟（秒）"""
+        ms = seconds * 1000
+        index = bisect.bisect_left(self.bounds, ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += ms
+            if ms > self.max:
+                self.max = ms
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: (各分桶计数, 总次数, 总毫秒数, 最大毫秒数)
+        """
+        with self._lock:
+            return list(self.counts), self.count, self.total, self.max
+
+    def percentile(self, p):
+        """第 p 百分位所在分桶的上界（毫秒），超出最大分桶时返回观测到的最大值"""
+        counts, count, _, maximum = self.snapshot()
+        if count == 0:
+            return None
+        target = p / 100 * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= target and bucket:
+                return self.bounds[index] if index < len(self.bounds) else maximum
+        return maximum
+
+    def summary(self):
+        """一行可读的统计"""
+        _, count, total, maximum = self.snapshot()
+        if count == 0:
+            return "暂无数据"
+        return (f"{count} 次，平均 {total / count:.1f} ms，"
+                f"p50 ≤{self.percentile(50):g} ms，p95 ≤{self.percentile(95):g} ms，"
+                f"最大 {maximum:.1f} ms")
+
+
+class _StageTimer:
+    """with 语句计时，退出时记录到直方图"""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """未启用指标时使用，所有方法都不做任何事"""
+    enabled = False
+
+    def timer(self, stage):
+        return _NULL_TIMER
+
+    def observe(self, stage, seconds):
+        pass
+
+    def inc(self, name, value=1):
+        pass
+
+    def gauge(self, name, func):
+        pass
+
+    def event(self, name, **fields):
+        pass
+
+    def histogram(self, stage):
+        return LatencyHistogram()
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+class PipelineMetrics:
+    """启用时的指标收集与导出"""
+    enabled = True
+
+    def __init__(self, log_path=None, snapshot_path=None, snapshot_interval=15, http_port=None):
+        """
+        Args:
+            log_path (str): 结构化事件日志路径，None 表示不写日志
+            snapshot_path (str): Prometheus 文本快照路径，None 表示不写快照
+            snapshot_interval (float): 快照重写间隔（秒）
+            http_port (int): 本机 HTTP 端点端口，None 表示不启动
+        """
+        self.log_path = Path(log_path) if log_path else None
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_interval = float(snapshot_interval)
+        self.http_port = http_port
+        self.histograms = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._log = None
+        self._stopping = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def histogram(self, stage):
+        """取得（必要时创建）某个阶段的直方图"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def timer(self, stage):
+        """with metrics.timer('encode'): ... 记录该阶段耗时"""
+        return _StageTimer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).record(seconds)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, func):
+        """注册一个在导出时才读取的仪表值，例如队列深度"""
+        self.gauges[name] = func
+
+    def event(self, name, **fields):
+        """向结构化日志追加一个事件"""
+        if self.log_path is None:
+            return
+        record = {'ts': round(time.time(), 6), 'event': name}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._log_lock:
+            try:
+                if self._log is None:
+                    self._log = open(self.log_path, 'a', encoding='utf-8', buffering=1)
+                self._log.write(line)
+            except OSError as e:
+                print(f"⚠️ 写入指标日志失败: {e}")
+
+    def snapshot(self):
+        """当前所有指标的字典形式"""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        stages = {}
+        for stage, histogram in histograms.items():
+            counts, count, total, maximum = histogram.snapshot()
+            stages[stage] = {
+                'count': count,
+                'mean_ms': total / count if count else None,
+                'p50_ms': histogram.percentile(50),
+                'p95_ms': histogram.percentile(95),
+                'max_ms': maximum,
+            }
+        gauges = {}
+        for name, func in list(self.gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception:
+                gauges[name] = None
+        return {'counters': counters, 'stages': stages, 'gauges': gauges}
+
+    def render_prometheus(self):
+        """Prometheus 文本格式"""
+        lines = [
+            '# HELP screenshot_saver_stage_seconds 截图流水线各阶段耗时',
+            '# TYPE screenshot_saver_stage_seconds histogram',
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = dict(self.counters)
+        for stage, histogram in histograms:
+            counts, count, total, _ = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket in zip(histogram.bounds, counts):
+                cumulative += bucket
+                lines.append(f'screenshot_saver_stage_seconds_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'screenshot_saver_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'screenshot_saver_stage_seconds_sum{{stage="{stage}"}} {total / 1000:.6f}')
+            lines.append(f'screenshot_saver_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        declared = set()
+        for name, (metric, labels) in COUNTERS.items():
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{{{labels}}} {counters.get(name, 0)}' if labels
+                         else f'{metric} {counters.get(name, 0)}')
+
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            if value is None:
+                # 当前平台读不到的值（例如 Windows 上的 resident_memory_mb）不输出
+                continue
+            lines.append(f'# TYPE screenshot_saver_{name} gauge')
+            lines.append(f'screenshot_saver_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self):
+        """原子地重写快照文件"""
+        if self.snapshot_path is None:
+            return
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.render_prometheus())
+            # 快照需要覆盖旧文件，直接用 os.replace
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            print(f"⚠️ 写入指标快照失败: {e}")
+
+    def start(self):
+        """启动定期快照线程和可选的 HTTP 端点"""
+        if self._thread is not None:
+            return self
+        self._stopping.clear()
+        if self.http_port:
+            self._start_server()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopping.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', int(self.http_port)), Handler)
+        except OSError as e:
+            print(f"⚠️ 指标端点启动失败: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"📈 指标端点: http://127.0.0.1:{self._server.server_address[1]}/metrics")
+
+    def stop(self):
+        """停止导出线程，写最后一次快照并关闭日志"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.write_snapshot()
+        with self._log_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def create_metrics(settings=None, root='.'):
+    """
+    根据配置创建指标收集器，未启用时返回 NullMetrics
+
+    Args:
+        settings (dict): 形如 DEFAULT_METRICS_SETTINGS 的配置
+        root (str): 日志和快照的相对路径所基于的目录（保存目录）
+    """
+    settings = settings or DEFAULT_METRICS_SETTINGS
+    if not settings.get('enabled'):
+        return NullMetrics()
+    root = Path(root)
+    log_file = settings.get('log_file')
+    snapshot_file = settings.get('snapshot_file')
+    return PipelineMetrics(
+        log_path=root / log_file if log_file else None,
+        snapshot_path=root / snapshot_file if snapshot_file else None,
+        snapshot_interval=settings.get('snapshot_interval', 15),
+        http_port=settings.get('http_port'),
+    )
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连拍模式
+
+逐步复现界面操作时，截图的复制速度可能快于平时检查剪贴板的间隔，两次检查之间复制的截图
+只有最后一张会被看到。连拍期间:
+  - 剪贴板监视器临时缩短检查间隔（Windows 序列号和轮询），事件驱动的监视器本来就会立即唤醒
+  - 监控线程只把剪贴板原始数据放入连拍队列，不做近似重复过滤、不查索引、不编码
+  - 连拍队列不丢帧：排队的原始数据超过 budget_mb 后，新的帧原样写入会话目录中的溢出文件
+  - 整个序列保存在一个会话路径下: 编号的单独文件（burst_.../frame_000001.png），
+    或在结束时合成一个动图（burst_....webp，或 APNG 格式的 burst_....png）
+
+按下连拍快捷键、达到 max_frames 或 idle_timeout 秒没有新帧时连拍结束。
+合成动图时所有帧会同时解码，长时间的连拍请使用 frames。
+"""
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from screenshot_encoders import decode_dib
+from screenshot_files import atomic_write, atomic_write_stream
+from screenshot_memory import megabytes
+
+
+DEFAULT_BURST_SETTINGS = {
+    'hotkey': 'ctrl+shift+b',   # 开始/结束连拍，null 表示不注册
+    'interval': 0.005,          # 连拍期间检查剪贴板的间隔（秒），只影响没有变化通知的平台
+    'output': 'frames',         # frames（编号的单独文件）/ webp / apng（结束时合成动图）
+    'frame_duration': 500,      # 动图中每帧显示的毫秒数
+    'max_frames': 1000,         # 达到此帧数后自动结束连拍
+    'idle_timeout': 60,         # 超过N秒没有新帧时自动结束连拍，null 表示只能手动结束
+    'budget_mb': 256,           # 内存中排队的原始帧总量上限，超出的帧先写入溢出文件
+    'workers': 2,               # 编码并写入编号文件的线程数
+}
+
+BURST_OUTPUTS = ('frames', 'webp', 'apng')
+
+ANIMATION_FORMATS = {
+    'webp': ('WEBP', '.webp', {'lossless': True}),
+    'apng': ('PNG', '.png', {}),
+}
+
+
+class BurstSession:
+    """一次连拍: 按顺序接收原始帧，写成编号的文件，或在结束时合成动图"""
+
+    def __init__(self, root, name, encoder, output='frames', frame_duration=500, budget_mb=256, workers=2):
+        """
+        Args:
+            root (Path): 保存目录
+            name (str): 会话名称，编号文件所在的子目录和动图的文件名
+            encoder (Encoder): 编号文件使用的编码器
+            output (str): frames / webp / apng
+            frame_duration (int): 动图中每帧显示的毫秒数
+            budget_mb (float): 内存中排队的原始帧总量上限，0 表示不限制
+            workers (int): 写入编号文件的线程数
+        """
+        if output not in BURST_OUTPUTS:
+            raise ValueError(f"未知的连拍输出格式: {output}")
+        self.root = Path(root)
+        self.name = name
+        self.directory = self.root / name
+        self.encoder = encoder
+        self.output = output
+        self.frame_duration = int(frame_duration)
+        self.budget = megabytes(budget_mb)
+        self.workers = max(1, int(workers))
+
+        self.frames = 0       # 已接收的帧数
+        self.saved = 0        # 已写入的帧数
+        self.spilled = 0      # 写入过溢出文件的帧数
+        self.held_bytes = 0   # 内存中排队的原始数据字节数
+        self.failed = []      # (帧序号, 错误)
+        self.started = time.monotonic()
+        self.last_frame = self.started
+        self._queue = deque()  # 编号文件: 等待写入的 (序号, 原始数据, 溢出文件)
+        self._frames = []      # 动图: 全部的 (序号, 原始数据, 溢出文件)
+        self._cond = threading.Condition()
+        self._closing = False
+        self._threads = []
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.output == 'frames':
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._writer, name=f"burst-writer-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def frame_path(self, index, extension):
+        return self.directory / f"frame_{index:06d}{extension}"
+
+    def add(self, data):
+        """
+        接收一帧，在监控线程中调用：只排队（或写入溢出文件），不解码也不编码
+
+        Returns:
+            int: 帧序号，从1开始
+        """
+        with self._cond:
+            self.frames += 1
+            index = self.frames
+            self.last_frame = time.monotonic()
+            spill = self.budget is not None and self.held_bytes > 0 and self.held_bytes + len(data) > self.budget
+            if not spill:
+                self.held_bytes += len(data)
+        spill_path = None
+        if spill:
+            # 以点开头，不会被当作截图
+            spill_path = self.directory / f".frame_{index:06d}.raw"
+            with open(spill_path, 'wb') as f:
+                f.write(data)
+            data = None
+        item = (index, data, spill_path)
+        with self._cond:
+            if spill_path is not None:
+                self.spilled += 1
+            if self.output == 'frames':
+                self._queue.append(item)
+                self._cond.notify()
+            else:
+                self._frames.append(item)
+        return index
+
+    def _load(self, item):
+        index, data, spill_path = item
+        return data if data is not None else spill_path.read_bytes()
+
+    def _release(self, item):
+        index, data, spill_path = item
+        if data is not None:
+            with self._cond:
+                self.held_bytes -= len(data)
+        if spill_path is not None:
+            try:
+                os.remove(spill_path)
+            except OSError:
+                pass
+
+    def _fail(self, index, error):
+        with self._cond:
+            self.failed.append((index, error))
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closing)
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+            try:
+                encoded = self.encoder.encode(self._load(item))
+                atomic_write(self.frame_path(item[0], self.encoder.extension_for(encoded)), encoded)
+                with self._cond:
+                    self.saved += 1
+            except Exception as e:
+                self._fail(item[0], e)
+            finally:
+                self._release(item)
+
+    @property
+    def pending(self):
+        """还没有写入的帧数"""
+        with self._cond:
+            return len(self._queue) if self.output == 'frames' else len(self._frames)
+
+    def _write_animation(self):
+        """按顺序解码全部帧并合成动图，尺寸不同的帧放在左上角，其余部分填白"""
+        from PIL import Image
+        images = []
+        for item in self._frames:
+            try:
+                images.append(decode_dib(self._load(item)).convert('RGB'))
+            except Exception as e:
+                self._fail(item[0], e)
+            finally:
+                self._release(item)
+        self._frames = []
+        if not images:
+            return None
+        size = (max(image.width for image in images), max(image.height for image in images))
+        for position, image in enumerate(images):
+            if image.size != size:
+                canvas = Image.new('RGB', size, (255, 255, 255))
+                canvas.paste(image, (0, 0))
+                images[position] = canvas
+        image_format, extension, options = ANIMATION_FORMATS[self.output]
+        path = self.root / f"{self.name}{extension}"
+        atomic_write_stream(path, lambda f: images[0].save(
+            f, image_format, save_all=True, append_images=images[1:],
+            duration=self.frame_duration, loop=0, **options))
+        self.saved = len(images)
+        return path
+
+    def finish(self):
+        """
+        结束连拍：等待所有帧写完，或合成动图
+
+        Returns:
+            Path: 编号文件所在的目录或动图文件；没有收到任何帧时返回None
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        path = self.directory
+        if self.output != 'frames':
+            path = self._write_animation()
+        if path != self.directory or not self.saved:
+            # 只剩下（或只有）空的会话目录
+            try:
+                self.directory.rmdir()
+            except OSError:
+                pass
+        return path if self.saved else None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图保存器 IPC 接口的命令行客户端
+
+连接正在运行的保存器（python clipboard_screenshot_saver.py --daemon，或在配置中启用 ipc），
+不导入主程序，启动只需几十毫秒，适合在脚本和 CLI 工具中调用:
+
+  python screenshot_client.py latest              # 输出最新截图的路径
+  python screenshot_client.py list -n 5           # 最近 5 张截图的路径，最新的在前
+  python screenshot_client.py wait --timeout 30   # 等待下一张截图并输出路径
+  python screenshot_client.py stats               # 保存器的运行状态（JSON）
+
+默认输出粘贴路径（启用了缩小版副本且配置为粘贴副本时为副本路径），--json 输出完整信息。
+没有截图或等待超时时退出码为 1，无法连接保存器时为 2。
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# 与主程序使用同一个配置文件；这里只读取保存路径，不导入主程序也不做完整校验
+from screenshot_config import CONFIG_FILENAME
+from screenshot_ipc import CaptureClient, IpcError
+
+
+def default_save_path():
+    try:
+        with open(CONFIG_FILENAME, 'r', encoding='utf-8') as f:
+            return Path(json.load(f).get('save_path', 'screenshots'))
+    except (OSError, ValueError):
+        return Path('screenshots')
+
+
+def print_captures(captures, as_json, single=False):
+    if as_json:
+        value = (captures[0] if captures else None) if single else captures
+        print(json.dumps(value, ensure_ascii=False, indent=2))
+        return
+    for capture in captures:
+        print(capture.get('paste_path') or capture['path'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="查询正在运行的截图保存器")
+    parser.add_argument('--save-path', help="保存器的保存目录（默认取自配置文件）")
+    parser.add_argument('--json', action='store_true', help="输出完整的 JSON 信息")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('latest', help="最新一张截图")
+    recent = commands.add_parser('list', help="最近的截图")
+    recent.add_argument('-n', '--count', type=int, default=10)
+    wait = commands.add_parser('wait', help="等待下一张截图")
+    wait.add_argument('--timeout', type=float, default=60, help="最长等待秒数（默认60）")
+    wait.add_argument('--after', type=int, help="返回序号大于此值的截图（来自 latest --json 的 seq）")
+    wait.add_argument('--epoch', help="--after 的序号所属的 epoch（来自 latest --json），保存器重启过时从重启后的第一张开始")
+    commands.add_parser('stats', help="运行状态")
+    commands.add_parser('ping', help="检查保存器是否在运行")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = Path(args.save_path) if args.save_path else default_save_path()
+    try:
+        with CaptureClient(root) as client:
+            if args.command == 'latest':
+                capture = client.latest()
+                captures = [capture] if capture else []
+            elif args.command == 'list':
+                captures = client.recent(args.count)
+            elif args.command == 'wait':
+                capture = client.wait(args.timeout, after=args.after, epoch=args.epoch)
+                captures = [capture] if capture else []
+                if not captures:
+                    print("⏱️ 等待超时，没有新的截图", file=sys.stderr)
+            elif args.command == 'stats':
+                print(json.dumps(client.stats(), ensure_ascii=False, indent=2))
+                return 0
+            else:
+                client.request('ping')
+                print("✅ 截图保存器正在运行")
+                return 0
+    except IpcError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    print_captures(captures, args.json, single=args.command != 'list')
+    return 0 if captures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
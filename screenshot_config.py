@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置文件的读取、校验、写入和热加载
+
+screenshot_config.json 只在启动和文件被修改时读取一次，按模式校验后保存为内存中只读的
+ConfigSnapshot，之后的读取都使用快照:
+  - 每一项按默认值的类型校验，枚举项检查取值，数值项检查上下限；无效的值打印警告后
+    使用默认值（热加载时保持当前值），未知的配置项被忽略，缺少的配置项补上默认值
+  - 写入先写临时文件再原子地替换；短时间内的多次修改合并为一次写入，
+    内容没有变化时不写
+  - watch 在后台按修改时间检查文件，被外部修改时读取新配置并回调，
+    主程序据此在不重启的情况下应用新的快捷键、保存路径和编码设置
+
+校验模式在第一次使用时才构建（需要导入各模块的默认设置），只读取 CONFIG_FILENAME
+的轻量工具不会因此变慢。
+"""
+import json
+import os
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from types import MappingProxyType
+
+
+CONFIG_FILENAME = "screenshot_config.json"
+
+# 复制的图片文件（CF_HDROP / text/uri-list）的处理方式
+#   link: 以硬链接（跨文件系统时复制）放入保存目录，不解码也不重新编码
+#   reference: 直接使用原文件路径，不登记到索引，保留策略不会删除它
+#   ignore: 忽略复制的文件
+FILE_DROP_MODES = ('link', 'reference', 'ignore')
+
+# 早期版本写入、现在已不再使用的配置项，读取时静默忽略
+LEGACY_KEYS = ('total_screenshots', 'auto_copy_path')
+
+# 允许为 null（表示禁用）的字符串配置项
+NULLABLE = {
+    ('history', 'paste_recent_hotkey'),
+    ('history', 'cycle_hotkey'),
+    ('burst', 'hotkey'),
+}
+
+_schema = None
+
+
+def config_schema():
+    """
+    配置模式: (默认值, 枚举取值, 数值范围)
+
+    Returns:
+        tuple: (defaults, choices, ranges)，defaults 是完整的默认配置，
+            choices 把配置项路径（元组）映射到允许的取值，
+            ranges 把数值配置项路径映射到 (最小值, 最大值)，None 表示该侧不限制
+    """
+    global _schema
+    if _schema is not None:
+        return _schema
+    from clipboard_backends import BACKENDS
+    from screenshot_burst import DEFAULT_BURST_SETTINGS, BURST_OUTPUTS
+    from capture_history import DEFAULT_HISTORY_SETTINGS
+    from perceptual_hash import DEFAULT_NEAR_DUPLICATE_SETTINGS
+    from pipeline_metrics import DEFAULT_METRICS_SETTINGS
+    from screenshot_encoders import DEFAULT_ENCODER_SETTINGS, ENCODERS
+    from screenshot_ipc import DEFAULT_IPC_SETTINGS
+    from screenshot_memory import DEFAULT_MEMORY_SETTINGS
+    from screenshot_renditions import DEFAULT_RENDITION_SETTINGS, RENDITION_EXTENSIONS
+    from screenshot_retention import DEFAULT_RETENTION_SETTINGS
+    from screenshot_workers import DEFAULT_WORKER_SETTINGS, BACKPRESSURE_POLICIES
+
+    defaults = {
+        'save_path': 'screenshots',
+        'hotkey': 'ctrl+alt+p',
+        'clipboard_backend': 'auto',
+        'file_drop': 'link',
+        'save_workers': DEFAULT_WORKER_SETTINGS,
+        'encoder': DEFAULT_ENCODER_SETTINGS,
+        'near_duplicate': DEFAULT_NEAR_DUPLICATE_SETTINGS,
+        'history': DEFAULT_HISTORY_SETTINGS,
+        'retention': DEFAULT_RETENTION_SETTINGS,
+        'renditions': DEFAULT_RENDITION_SETTINGS,
+        'memory': DEFAULT_MEMORY_SETTINGS,
+        'metrics': DEFAULT_METRICS_SETTINGS,
+        'ipc': DEFAULT_IPC_SETTINGS,
+        'burst': DEFAULT_BURST_SETTINGS,
+    }
+    choices = {
+        ('clipboard_backend',): ('auto',) + tuple(BACKENDS),
+        ('file_drop',): FILE_DROP_MODES,
+        ('save_workers', 'mode'): ('thread', 'process'),
+        ('save_workers', 'backpressure'): BACKPRESSURE_POLICIES,
+        ('encoder', 'format'): tuple(ENCODERS),
+        ('near_duplicate', 'method'): ('dhash', 'phash'),
+        ('renditions', 'format'): tuple(RENDITION_EXTENSIONS),
+        ('renditions', 'paste'): ('original', 'optimized'),
+        ('ipc', 'transport'): ('auto', 'unix', 'tcp'),
+        ('burst', 'output'): BURST_OUTPUTS,
+    }
+    ranges = {
+        ('save_workers', 'workers'): (1, 64),
+        ('save_workers', 'max_queue'): (1, None),
+        ('encoder', 'png', 'compress_level'): (0, 9),
+        ('encoder', 'webp', 'quality'): (0, 100),
+        ('encoder', 'webp', 'method'): (0, 6),
+        ('near_duplicate', 'threshold'): (0, 64),
+        ('near_duplicate', 'history'): (1, None),
+        ('history', 'capacity'): (1, None),
+        ('history', 'paste_count'): (1, None),
+        ('history', 'cycle_timeout'): (0, None),
+        ('retention', 'max_age_days'): (0, None),
+        ('retention', 'max_total_mb'): (0, None),
+        ('retention', 'max_files'): (0, None),
+        ('retention', 'keep_recent'): (0, None),
+        ('retention', 'interval'): (1, None),
+        ('retention', 'batch_size'): (1, None),
+        ('renditions', 'max_width'): (1, None),
+        ('renditions', 'max_height'): (1, None),
+        ('renditions', 'quality'): (0, 100),
+        ('memory', 'budget_mb'): (0, None),
+        ('memory', 'stream_threshold_mb'): (0, None),
+        ('memory', 'strip_rows'): (1, None),
+        ('metrics', 'snapshot_interval'): (1, None),
+        ('metrics', 'http_port'): (1, 65535),
+        ('ipc', 'max_wait'): (0, None),
+        ('burst', 'interval'): (0, None),
+        ('burst', 'frame_duration'): (1, None),
+        ('burst', 'max_frames'): (1, None),
+        ('burst', 'idle_timeout'): (1, None),
+        ('burst', 'budget_mb'): (0, None),
+        ('burst', 'workers'): (1, 64),
+    }
+    _schema = (defaults, choices, ranges)
+    return _schema
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check(value, default, path, choices, ranges):
+    """检查单个值，返回错误说明，合法时返回None"""
+    if default is None or _is_number(default):
+        # 数值项可以为 null，表示不限制 / 不启用
+        if value is not None and not _is_number(value):
+            return "应为数字或 null"
+        low, high = ranges.get(path, (None, None))
+        if value is not None and low is not None and value < low:
+            return f"应不小于 {low}"
+        if value is not None and high is not None and value > high:
+            return f"应不大于 {high}"
+    elif isinstance(default, bool):
+        if not isinstance(value, bool):
+            return "应为 true 或 false"
+    elif isinstance(default, str):
+        if value is None and path in NULLABLE:
+            return None
+        if not isinstance(value, str) or not value.strip():
+            return "应为非空字符串"
+    allowed = choices.get(path)
+    if allowed is not None and value not in allowed:
+        return f"应为 {' / '.join(allowed)} 之一"
+    return None
+
+
+def _validate(values, defaults, choices, ranges, path, warn, previous=None):
+    result = {}
+    for key, default in defaults.items():
+        key_path = path + (key,)
+        name = '.'.join(key_path)
+        if key not in values:
+            result[key] = _thaw(default)
+            continue
+        value = values[key]
+        # 无效的值在热加载时保持当前值，启动时使用默认值
+        kept = previous is not None and key in previous
+        fallback = previous[key] if kept else default
+        if isinstance(default, Mapping):
+            if isinstance(value, Mapping):
+                result[key] = _validate(value, default, choices, ranges, key_path, warn,
+                                        fallback if kept else None)
+            else:
+                warn(f"⚠️ 配置项 {name} 应为对象，{'保持当前值' if kept else '使用默认值'}")
+                result[key] = _thaw(fallback)
+            continue
+        error = _check(value, default, key_path, choices, ranges)
+        if error is None:
+            result[key] = value
+        else:
+            warn(f"⚠️ 配置项 {name} 的值 {value!r} 无效（{error}），"
+                 f"{'保持当前值' if kept else '使用默认值'} {_thaw(fallback)!r}")
+            result[key] = _thaw(fallback)
+    for key in values:
+        if key not in defaults and not (not path and key in LEGACY_KEYS):
+            warn(f"⚠️ 未知的配置项 {'.'.join(path + (key,))}，已忽略")
+    return result
+
+
+def validate_config(values, warn=print, previous=None):
+    """
+    按配置模式校验配置
+
+    Args:
+        values (dict): 从配置文件读取的原始内容
+        warn (callable): 输出警告的函数
+        previous (Mapping): 当前生效的配置；给出时无效的值保持当前值而不是使用默认值
+
+    Returns:
+        dict: 完整、合法的配置（缺少的项使用默认值）
+    """
+    defaults, choices, ranges = config_schema()
+    if not isinstance(values, Mapping):
+        warn("⚠️ 配置文件的内容应为 JSON 对象，使用默认配置")
+        values = {}
+    return _validate(values, defaults, choices, ranges, (), warn, previous)
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """校验后的只读配置，嵌套的对象也是只读的"""
+
+    def __init__(self, values):
+        self._values = _freeze(values)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def section(self, key):
+        """某个配置分组的可修改副本"""
+        return _thaw(self._values.get(key, {}))
+
+    def to_dict(self):
+        """全部配置的可修改副本，用于写入文件"""
+        return _thaw(self._values)
+
+    def changed_keys(self, other):
+        """与另一个快照相比值不同的顶层配置项"""
+        keys = set(self) | set(other)
+        return sorted(key for key in keys if self.get(key) != other.get(key))
+
+
+class ConfigManager:
+    """配置文件的读取、合并写入和变化监视"""
+
+    # 多次修改合并为一次写入的等待时间（秒）
+    WRITE_DELAY = 0.2
+    # 检查配置文件是否被修改的间隔（秒）
+    WATCH_INTERVAL = 1.0
+
+    def __init__(self, path=CONFIG_FILENAME, warn=print):
+        """
+        Args:
+            path (str): 配置文件路径
+            warn (callable): 输出校验警告的函数
+        """
+        self.path = Path(path)
+        self.warn = warn
+        self.snapshot = ConfigSnapshot(validate_config({}, warn))
+        self.writes = 0  # 实际写入文件的次数
+        self._signature = None  # 最近一次读取或写入后文件的 (修改时间, 大小)
+        self._pending = None  # 等待写入的快照
+        self._timer = None
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        self._watcher = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def exists(self):
+        return self.path.exists()
+
+    def read(self, previous=None):
+        """
+        读取并校验配置文件
+
+        Args:
+            previous (ConfigSnapshot): 当前生效的配置，无效的值保持当前值
+
+        Returns:
+            ConfigSnapshot: 文件不存在时为默认配置
+
+        Raises:
+            ValueError: 文件不是合法的 JSON
+            OSError: 文件无法读取
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                values = json.load(f)
+        except FileNotFoundError:
+            values = {}
+        return ConfigSnapshot(validate_config(values, self.warn, previous))
+
+    def load(self):
+        """读取配置文件并作为当前快照，文件无效时打印错误并使用默认配置"""
+        with self._lock:
+            signature = self._stat()
+            try:
+                snapshot = self.read()
+            except (OSError, ValueError) as e:
+                print(f"加载配置文件失败: {e}")
+                snapshot = ConfigSnapshot(validate_config({}, self.warn))
+            self.snapshot = snapshot
+            self._signature = signature
+            return snapshot
+
+    def update(self, values):
+        """
+        用新的值替换当前配置（未给出的顶层配置项保持不变），稍后合并写入文件
+
+        Returns:
+            ConfigSnapshot: 新的快照
+        """
+        with self._lock:
+            merged = self.snapshot.to_dict()
+            merged.update(values)
+            snapshot = ConfigSnapshot(validate_config(merged, self.warn))
+            if snapshot == self.snapshot and self._signature is not None:
+                return self.snapshot
+            self.snapshot = snapshot
+            self._pending = snapshot
+            if self._timer is None:
+                # 非守护线程: 程序退出前会等待这次写入完成
+                self._timer = threading.Timer(self.WRITE_DELAY, self.flush)
+                self._timer.start()
+            return snapshot
+
+    def flush(self):
+        """立即写入等待中的修改"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                return False
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot.to_dict(), f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # 配置文件需要覆盖旧文件，直接用 os.replace
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"保存配置文件失败: {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                return False
+            # 记下自己写入后的状态，监视线程不会把它当成外部修改
+            self._signature = self._stat()
+            self.writes += 1
+            return True
+
+    def check(self):
+        """
+        检查配置文件是否被外部修改，有变化时读取新配置
+
+        Returns:
+            tuple: (旧快照, 新快照)，没有变化时返回None
+        """
+        with self._lock:
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                return None
+            self._signature = signature
+            try:
+                snapshot = self.read(self.snapshot)
+            except (OSError, ValueError) as e:
+                # 可能是编辑器正在写入；保持当前配置，文件再次变化时重新读取
+                print(f"⚠️ 配置文件无效，保持当前配置: {e}")
+                return None
+            if snapshot == self.snapshot:
+                return None
+            # 外部修改优先，丢弃尚未写入的修改
+            self._pending = None
+            old, self.snapshot = self.snapshot, snapshot
+            return old, snapshot
+
+    def watch(self, callback, interval=None):
+        """
+        启动后台线程监视配置文件
+
+        Args:
+            callback (callable): callback(old, new)，文件内容变化后在监视线程中调用
+            interval (float): 检查间隔（秒）
+        """
+        if self._watcher is not None:
+            return self
+        interval = self.WATCH_INTERVAL if interval is None else interval
+        self._stopping.clear()
+
+        def run():
+            while not self._stopping.wait(interval):
+                try:
+                    change = self.check()
+                    if change is not None:
+                        callback(*change)
+                except Exception as e:
+                    print(f"⚠️ 应用新配置失败: {e}")
+
+        self._watcher = threading.Thread(target=run, name='config-watcher', daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        """停止监视并写入等待中的修改"""
+        self._stopping.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+        self.flush()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图解码与编码
+
+可选的输出编码器:
+  - png: 可调 compress_level 的PNG
+  - webp: WebP 无损或有损
+  - qoi: QOI 快速无损编码（Pillow 不支持写入QOI时退回最快压缩级别的PNG）
+  - dib: 不重新编码，直接加上文件头把剪贴板中的DIB保存为BMP
+
+剪贴板中已经是PNG（Windows 注册的 PNG 格式、Linux 的 image/png）时，默认不解码、
+原样写成 .png 文件（png_passthrough），与所选的输出格式无关。
+
+png 和 dib 编码器还可以把 24/32 位 DIB 按行条带直接写入文件（stream），
+不解码整帧，内存占用只有一个条带，用于超大截图。
+
+编码器都是可pickle的普通对象，可以在后台线程或子进程中执行。
+PIL 在第一次编码或解码时才导入。
+"""
+import io
+import struct
+import zlib
+
+
+DEFAULT_ENCODER_SETTINGS = {
+    'format': 'png',
+    'png_passthrough': True,  # 剪贴板中已是PNG时原样写盘，不解码也不重新编码
+    'png': {'compress_level': 6},
+    'webp': {'lossless': True, 'quality': 80, 'method': 4},
+    'qoi': {},
+    'dib': {},
+}
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# DIB 信息头长度: BITMAPINFOHEADER / V2 / V3 / V4 / V5
+DIB_HEADER_SIZES = (40, 52, 56, 108, 124)
+
+BI_RGB = 0
+BI_BITFIELDS = 3
+BI_ALPHABITFIELDS = 6
+
+# (红, 绿, 蓝) 掩码 -> 对应的原始像素排列
+_BITFIELD_RAWMODES = {
+    (0x00FF0000, 0x0000FF00, 0x000000FF): 'BGR',
+    (0x000000FF, 0x0000FF00, 0x00FF0000): 'RGB',
+}
+
+
+def parse_dib_header(data):
+    """
+    解析 CF_DIB 数据的信息头
+
+    Returns:
+        tuple: (mode, size, rawmode, offset, stride, orientation)，
+            格式不是 24/32 位真彩色时返回None，由PIL的通用解码器处理
+    """
+    if len(data) < 40:
+        return None
+    header_size, width, height, planes, bit_count, compression = struct.unpack_from('<IiiHHI', data, 0)
+    if header_size not in DIB_HEADER_SIZES or width <= 0 or height == 0 or bit_count not in (24, 32):
+        return None
+
+    offset = header_size
+    alpha_mask = 0
+    if compression in (BI_BITFIELDS, BI_ALPHABITFIELDS):
+        if bit_count != 32:
+            return None
+        if header_size >= 52:
+            # V2 及以上的信息头内已包含颜色掩码
+            masks = struct.unpack_from('<III', data, 40)
+            if header_size >= 56:
+                alpha_mask, = struct.unpack_from('<I', data, 52)
+        else:
+            count = 4 if compression == BI_ALPHABITFIELDS else 3
+            if len(data) < offset + 4 * count:
+                return None
+            masks = struct.unpack_from('<III', data, offset)
+            if count == 4:
+                alpha_mask, = struct.unpack_from('<I', data, offset + 12)
+            offset += 4 * count
+        order = _BITFIELD_RAWMODES.get(masks)
+        if order is None:
+            return None
+        if alpha_mask == 0xFF000000:
+            mode, rawmode = 'RGBA', order + 'A'
+        else:
+            mode, rawmode = 'RGB', order + 'X'
+    elif compression == BI_RGB:
+        mode = 'RGB'
+        rawmode = 'BGR' if bit_count == 24 else 'BGRX'
+    else:
+        return None
+
+    # 每行按4字节对齐；高度为正表示自下而上存储
+    stride = ((width * bit_count + 31) // 32) * 4
+    rows = abs(height)
+    if len(data) < offset + stride * rows:
+        return None
+    orientation = -1 if height > 0 else 1
+    return mode, (width, rows), rawmode, offset, stride, orientation
+
+
+def is_png(data):
+    """数据是否为已编码的PNG文件"""
+    return data[:8] == PNG_SIGNATURE
+
+
+def image_info(data):
+    """
+    只读取文件头，获取剪贴板原始数据的尺寸和来源格式
+
+    Returns:
+        tuple: (width, height, source_format)，无法识别时尺寸为None
+    """
+    if is_png(data) and len(data) >= 24:
+        width, height = struct.unpack_from('>II', data, 16)
+        return width, height, 'png'
+    if data[:2] == b'BM' and len(data) >= 26:
+        width, height = struct.unpack_from('<ii', data, 18)
+        return width, abs(height), 'bmp'
+    if len(data) >= 12:
+        header_size, = struct.unpack_from('<I', data, 0)
+        if header_size == 12:
+            width, height = struct.unpack_from('<HH', data, 4)
+            return width, height, 'dib'
+        if header_size in DIB_HEADER_SIZES:
+            width, height = struct.unpack_from('<ii', data, 4)
+            return width, abs(height), 'dib'
+    return None, None, None
+
+
+def decode_dib(data):
+    """
+    将剪贴板原始数据解码为PIL Image
+
+    24/32 位真彩色 DIB 直接用 Image.frombuffer 在剪贴板缓冲区的 memoryview 上解码，
+    不经过 BytesIO 和格式探测，也不复制整帧数据；其他格式（调色板、RLE、PNG等）交给PIL。
+    """
+    from PIL import Image
+    layout = parse_dib_header(data)
+    if layout is None:
+        return Image.open(io.BytesIO(data))
+    mode, size, rawmode, offset, stride, orientation = layout
+    pixels = memoryview(data)[offset:]
+    image = Image.frombuffer(mode, size, pixels, 'raw', rawmode, stride, orientation)
+    if image.mode != mode:
+        # RGBX 等原始排列会被 PIL 直接映射为同名模式的图片，编码器无法写入，转为 RGB
+        image = image.convert(mode)
+    return image
+
+
+def iter_dib_strips(data, strip_rows=256, top=0, bottom=None):
+    """
+    把 24/32 位真彩色 DIB 按从上到下的顺序切成若干行条带，每次只解码一个条带
+
+    Args:
+        data (bytes): 剪贴板中的DIB数据，必须能被 parse_dib_header 解析
+        strip_rows (int): 每个条带的行数
+        top (int): 起始行（含）
+        bottom (int): 结束行（不含），None 表示到最后一行
+
+    Yields:
+        tuple: (条带第一行的行号, 该条带的PIL Image)
+    """
+    from PIL import Image
+    layout = parse_dib_header(data)
+    if layout is None:
+        raise ValueError("不是 24/32 位真彩色 DIB，无法按条带解码")
+    mode, (width, height), rawmode, offset, stride, orientation = layout
+    bottom = height if bottom is None else min(bottom, height)
+    strip_rows = max(1, int(strip_rows))
+    pixels = memoryview(data)
+    for row in range(max(0, top), bottom, strip_rows):
+        rows = min(strip_rows, bottom - row)
+        # 自下而上存储时，第 row 行在缓冲区中的位置从末尾算起
+        first = height - row - rows if orientation == -1 else row
+        start = offset + first * stride
+        strip = pixels[start:start + rows * stride]
+        image = Image.frombuffer(mode, (width, rows), strip, 'raw', rawmode, stride, orientation)
+        if image.mode != mode:
+            # 与 decode_dib 相同，RGBX 条带转为 RGB，每个像素的字节数与 mode 一致
+            image = image.convert(mode)
+        yield row, image
+
+
+def _png_chunk(fileobj, kind, payload):
+    fileobj.write(struct.pack('>I', len(payload)))
+    fileobj.write(kind)
+    fileobj.write(payload)
+    fileobj.write(struct.pack('>I', zlib.crc32(payload, zlib.crc32(kind))))
+
+
+def stream_png(data, fileobj, compress_level=6, strip_rows=256):
+    """
+    把 24/32 位 DIB 按行条带编码为PNG并写入 fileobj
+
+    每行使用 Up 过滤（与上一行逐字节相减），由 ImageChops 在C中完成；截图的压缩率
+    与PIL的自适应过滤相当，内存中只有一个条带和 zlib 的压缩状态。
+
+    Returns:
+        int: 写入的字节数
+    """
+    from PIL import Image, ImageChops
+    layout = parse_dib_header(data)
+    if layout is None:
+        raise ValueError("不是 24/32 位真彩色 DIB，无法按条带编码")
+    mode, (width, height), _, _, _, _ = layout
+    channels = 4 if mode == 'RGBA' else 3
+    row_bytes = width * channels
+
+    start = fileobj.tell()
+    fileobj.write(PNG_SIGNATURE)
+    color_type = 6 if mode == 'RGBA' else 2
+    _png_chunk(fileobj, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+
+    compressor = zlib.compressobj(int(compress_level))
+    previous = None  # 上一个条带的最后一行
+    for _, strip in iter_dib_strips(data, strip_rows):
+        if strip.mode != mode:
+            raise ValueError(f"条带的像素格式 {strip.mode} 与 {mode} 不一致，无法按条带编码")
+        rows = strip.size[1]
+        # 按字节把条带看作灰度图，上一行下移一行后逐字节相减即为 Up 过滤
+        current = Image.frombytes('L', (row_bytes, rows), strip.tobytes())
+        del strip
+        above = Image.new('L', (row_bytes, rows))
+        if previous is not None:
+            above.paste(previous, (0, 0))
+        if rows > 1:
+            above.paste(current.crop((0, 0, row_bytes, rows - 1)), (0, 1))
+        previous = current.crop((0, rows - 1, row_bytes, rows))
+        filtered = memoryview(ImageChops.subtract_modulo(current, above).tobytes())
+        del current, above
+        # 每行前面加上过滤类型字节 2（Up）
+        scanlines = b'\x02' + b'\x02'.join(filtered[i:i + row_bytes]
+                                            for i in range(0, rows * row_bytes, row_bytes))
+        del filtered
+        compressed = compressor.compress(scanlines)
+        del scanlines
+        if compressed:
+            _png_chunk(fileobj, b'IDAT', compressed)
+    _png_chunk(fileobj, b'IDAT', compressor.flush())
+    _png_chunk(fileobj, b'IEND', b'')
+    return fileobj.tell() - start
+
+
+def encode_png(image, compress_level=6):
+    """将解码后的图片编码为PNG数据"""
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+class Encoder:
+    """编码器基类"""
+    name = None
+    extension = None
+    # 剪贴板中已是PNG时原样返回，写入时使用 .png 扩展名（见 extension_for）
+    png_passthrough = False
+
+    def encode_image(self, image):
+        """将解码后的图片编码为文件数据"""
+        raise NotImplementedError
+
+    def encode(self, data):
+        """将剪贴板原始数据编码为文件数据"""
+        if self.png_passthrough and is_png(data):
+            return bytes(data)
+        return self.encode_image(decode_dib(data))
+
+    def extension_for(self, encoded):
+        """编码结果对应的文件扩展名，原样写入的PNG总是 .png"""
+        if self.png_passthrough and is_png(encoded):
+            return '.png'
+        return self.extension
+
+    def can_stream(self, data):
+        """这份数据能否用 stream 按条带写入文件"""
+        return False
+
+    def stream(self, data, fileobj, strip_rows=256):
+        """
+        把剪贴板原始数据编码后直接写入 fileobj，不在内存中保留完整的解码图片和编码结果
+
+        Returns:
+            int: 写入的字节数
+        """
+        raise NotImplementedError
+
+
+class PngEncoder(Encoder):
+    """PNG编码器，compress_level 0-9，越小越快、文件越大"""
+    name = 'png'
+    extension = '.png'
+
+    def __init__(self, compress_level=6):
+        self.compress_level = int(compress_level)
+
+    def encode_image(self, image):
+        return encode_png(image, self.compress_level)
+
+    def can_stream(self, data):
+        return parse_dib_header(data) is not None
+
+    def stream(self, data, fileobj, strip_rows=256):
+        return stream_png(data, fileobj, self.compress_level, strip_rows)
+
+
+class WebpEncoder(Encoder):
+    """WebP编码器，支持无损和有损两种模式"""
+    name = 'webp'
+    extension = '.webp'
+
+    def __init__(self, lossless=True, quality=80, method=4):
+        self.lossless = bool(lossless)
+        self.quality = int(quality)
+        self.method = int(method)
+
+    def encode_image(self, image):
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', lossless=self.lossless, quality=self.quality, method=self.method)
+        return buffer.getvalue()
+
+
+class QoiEncoder(Encoder):
+    """QOI快速无损编码器"""
+    name = 'qoi'
+    extension = '.qoi'
+
+    def __init__(self):
+        from PIL import Image
+        Image.init()
+        self.supported = 'QOI' in Image.SAVE
+        if not self.supported:
+            # 旧版本 Pillow 无法写入QOI，使用最快的PNG压缩代替
+            self.extension = '.png'
+
+    def encode_image(self, image):
+        if not self.supported:
+            return encode_png(image, compress_level=1)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'QOI')
+        return buffer.getvalue()
+
+
+class RawDibEncoder(Encoder):
+    """不重新编码，直接把剪贴板DIB数据加上文件头保存为BMP"""
+    name = 'dib'
+    extension = '.bmp'
+
+    def encode(self, data):
+        if self.png_passthrough and is_png(data):
+            return bytes(data)
+        if data[:2] == b'BM':
+            # 已经是完整的BMP文件
+            return bytes(data)
+        if not self.passthrough(data):
+            # 不是DIB数据（例如 Linux 剪贴板中的PNG），或看图软件读不了的排列，解码后再保存为BMP
+            return self.encode_image(decode_dib(data))
+        return self.file_header(data) + bytes(data)
+
+    def passthrough(self, data):
+        """
+        DIB数据能否加上文件头原样保存
+
+        BI_ALPHABITFIELDS 和 RGB 顺序的颜色掩码虽然是合法的DIB，但PIL和大多数看图软件
+        都无法读取这样的BMP，这两种情况需要重新编码。
+        """
+        if self.file_header(data) is None:
+            return False
+        compression, = struct.unpack_from('<I', data, 16)
+        if compression == BI_ALPHABITFIELDS:
+            return False
+        layout = parse_dib_header(data)
+        return layout is None or not layout[2].startswith('RGB')
+
+    def file_header(self, data):
+        """DIB数据前面需要加上的BMP文件头，不是DIB数据时返回None"""
+        if len(data) < 40:
+            return None
+        header_size, = struct.unpack_from('<I', data, 0)
+        if header_size not in (12, 40, 52, 56, 64, 108, 124):
+            return None
+        offset = 14 + header_size
+        if header_size == 12:
+            # BITMAPCOREHEADER: 调色板每项3字节，没有 biClrUsed
+            bit_count, = struct.unpack_from('<H', data, 10)
+            if bit_count <= 8:
+                offset += 3 * (1 << bit_count)
+            return b'BM' + struct.pack('<IHHI', 14 + len(data), 0, 0, offset)
+        bit_count, compression = struct.unpack_from('<HI', data, 14)
+        colors_used, = struct.unpack_from('<I', data, 32)
+        if header_size == 40:
+            if compression == BI_BITFIELDS:
+                # BI_BITFIELDS: 信息头后面跟着三个颜色掩码
+                offset += 12
+            elif compression == BI_ALPHABITFIELDS:
+                # BI_ALPHABITFIELDS: 还有一个 alpha 掩码
+                offset += 16
+        # 调色板跟在信息头（和掩码）后面，与信息头的版本无关；8位以上只有 biClrUsed 不为0时才有
+        if colors_used:
+            offset += 4 * colors_used
+        elif bit_count <= 8:
+            offset += 4 * (1 << bit_count)
+        return b'BM' + struct.pack('<IHHI', 14 + len(data), 0, 0, offset)
+
+    def can_stream(self, data):
+        return not is_png(data) and data[:2] != b'BM' and self.passthrough(data)
+
+    def stream(self, data, fileobj, strip_rows=256):
+        # 文件头之后直接写入剪贴板缓冲区，不拼接出完整文件的副本
+        file_header = self.file_header(data)
+        fileobj.write(file_header)
+        fileobj.write(memoryview(data))
+        return len(file_header) + len(data)
+
+    def encode_image(self, image):
+        if image.mode == 'RGBA':
+            # PIL 写出的32位BMP不带 alpha 掩码，读回时透明度丢失；改用 V5 信息头和 BGRA 掩码
+            width, height = image.size
+            pixels = image.tobytes('raw', 'BGRA')
+            info = struct.pack('<IiiHHIIiiII', 124, width, -height, 1, 32, BI_BITFIELDS, len(pixels), 2835, 2835, 0, 0)
+            info += struct.pack('<4I', 0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000)
+            # LCS_sRGB，端点和伽马不使用；渲染意图 LCS_GM_IMAGES
+            info += struct.pack('<I36x12xIIII', 0x73524742, 4, 0, 0, 0)
+            dib = info + pixels
+            return self.file_header(dib) + dib
+        buffer = io.BytesIO()
+        image.save(buffer, 'BMP')
+        return buffer.getvalue()
+
+
+ENCODERS = {
+    'png': PngEncoder,
+    'webp': WebpEncoder,
+    'qoi': QoiEncoder,
+    'dib': RawDibEncoder,
+}
+
+
+def create_encoder(settings=None):
+    """
+    根据配置创建编码器
+
+    Args:
+        settings (dict): 形如 DEFAULT_ENCODER_SETTINGS 的配置，format 选择编码器，
+            同名的子字典是该编码器的参数
+    """
+    settings = settings or DEFAULT_ENCODER_SETTINGS
+    name = settings.get('format', 'png')
+    if name not in ENCODERS:
+        raise ValueError(f"未知的输出格式: {name}")
+    encoder = ENCODERS[name](**settings.get(name, {}))
+    encoder.png_passthrough = bool(settings.get('png_passthrough', True))
+    return encoder
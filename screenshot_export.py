@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导出截图
+
+从保存目录的索引中按时间范围、标签或会话（时间上连续的一组截图）选出截图，导出为:
+  - zip: 存储模式（不压缩），PNG/WebP 本身已经压缩过，再压缩只会浪费时间
+  - tar: 不压缩的 tar 包
+  - sheet: 缩略图拼成的一张总览图（PNG 或 JPEG）
+
+文件由多个线程并行读取并计算 SHA-256，主线程按截图时间顺序依次写入归档，
+同时读取的文件数有上限，导出上千张截图时内存占用不会随数量增长。
+归档中附带 manifest.json，并输出与 sha256sum -c 兼容的清单。
+输出文件先写到临时文件，完成后原子地重命名。
+"""
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from collections import deque
+from functools import partial
+from pathlib import Path
+
+from screenshot_files import atomic_write_stream
+
+
+EXPORT_FORMATS = ('zip', 'tar', 'sheet')
+
+# 归档中清单文件的名称
+MANIFEST_NAME = 'manifest.json'
+
+# 截图之间间隔超过该秒数时视为新的会话
+DEFAULT_SESSION_GAP = 600
+
+
+class ExportEntry:
+    """导出的一张截图"""
+    __slots__ = ('name', 'path', 'size', 'sha256', 'created', 'width', 'height', 'tags')
+
+    def __init__(self, name, path, size, sha256, created, width=None, height=None, tags=None):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.created = created
+        self.width = width
+        self.height = height
+        self.tags = tags or []
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'sha256': self.sha256,
+            'size': self.size,
+            'captured': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.created)),
+            'width': self.width,
+            'height': self.height,
+            'tags': self.tags,
+        }
+
+
+def split_sessions(items, gap=DEFAULT_SESSION_GAP):
+    """
+    把截图按时间间隔分成会话
+
+    Args:
+        items (list): store.find 返回的截图（任意顺序）
+        gap (float): 相邻两张截图的间隔超过该秒数时开始新的会话
+
+    Returns:
+        list: 会话列表，每个会话内按时间先后排列，最近的会话在前
+    """
+    sessions = []
+    for item in sorted(items, key=lambda item: item['created']):
+        if sessions and item['created'] - sessions[-1][-1]['created'] <= gap:
+            sessions[-1].append(item)
+        else:
+            sessions.append([item])
+    sessions.reverse()
+    return sessions
+
+
+def select_captures(store, since=None, until=None, tag=None, session=None, session_gap=DEFAULT_SESSION_GAP,
+                    limit=None):
+    """
+    从索引中选出要导出的截图
+
+    Args:
+        store (ScreenshotStore): 保存目录的索引
+        since (float), until (float): 时间范围（时间戳）
+        tag (str): 只选带有此标签的截图
+        session (int): 只选第 N 近的会话（1 为最近的会话），None 表示不按会话选择
+        session_gap (float): 划分会话的时间间隔（秒）
+        limit (int): 最多选出的截图数（最新的优先）
+
+    Returns:
+        list: 按时间先后排列的截图
+    """
+    items = store.find(since=since, until=until, tag=tag)
+    if session is not None:
+        sessions = split_sessions(items, session_gap)
+        if not 1 <= session <= len(sessions):
+            return []
+        items = sessions[session - 1]
+    items = sorted(items, key=lambda item: item['created'])
+    if limit is not None:
+        items = items[-limit:]
+    return items
+
+
+def format_from_path(path):
+    """按输出文件的扩展名推断导出格式"""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.zip':
+        return 'zip'
+    if suffix == '.tar':
+        return 'tar'
+    if suffix in ('.png', '.jpg', '.jpeg', '.webp'):
+        return 'sheet'
+    return None
+
+
+def _read(item):
+    """在线程池中读取一个文件并计算 SHA-256"""
+    path = item['path']
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return item, None, None, e
+    return item, data, hashlib.sha256(data).hexdigest(), None
+
+
+def read_ahead(items, read=_read, workers=8):
+    """
+    并行读取，按原顺序逐个返回结果；同时进行（和已读完未取走）的读取不超过 workers * 2 个
+
+    Yields:
+        read(item) 的返回值
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    workers = max(1, int(workers))
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(read, item) for item in itertools.islice(items, workers * 2))
+        while pending:
+            future = pending.popleft()
+            item = next(items, None)
+            if item is not None:
+                pending.append(executor.submit(read, item))
+            yield future.result()
+
+
+def _member_names(items):
+    """归档中的文件名: 原文件名，重名时加上序号"""
+    seen = set()
+    for item in items:
+        name = Path(item['path']).name
+        stem, suffix = os.path.splitext(name)
+        counter = 1
+        while name in seen or name == MANIFEST_NAME:
+            counter += 1
+            name = f"{stem}_{counter}{suffix}"
+        seen.add(name)
+        yield name
+
+
+def _entries(items, workers, skipped):
+    """并行读取截图，逐个返回 (ExportEntry, 文件内容)；无法读取的文件记入 skipped"""
+    names = dict(zip((id(item) for item in items), _member_names(items)))
+    for item, data, digest, error in read_ahead(items, workers=workers):
+        if error is not None:
+            skipped.append((item['path'], error))
+            continue
+        entry = ExportEntry(names[id(item)], item['path'], len(data), digest, item['created'],
+                            item.get('width'), item.get('height'), item.get('tags'))
+        yield entry, data
+
+
+def _manifest_bytes(entries):
+    return json.dumps([entry.to_dict() for entry in entries], ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _write_zip(f, items, workers, entries, skipped):
+    import zipfile
+    with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for entry, data in _entries(items, workers, skipped):
+            info = zipfile.ZipInfo(entry.name, date_time=time.localtime(entry.created)[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            archive.writestr(info, data)
+            entries.append(entry)
+        info = zipfile.ZipInfo(MANIFEST_NAME, date_time=time.localtime()[:6])
+        archive.writestr(info, _manifest_bytes(entries))
+
+
+def _write_tar(f, items, workers, entries, skipped):
+    import tarfile
+    with tarfile.open(fileobj=f, mode='w', format=tarfile.PAX_FORMAT) as archive:
+        for entry, data in _entries(items, workers, skipped):
+            info = tarfile.TarInfo(entry.name)
+            info.size = len(data)
+            info.mtime = entry.created
+            archive.addfile(info, io.BytesIO(data))
+            entries.append(entry)
+        manifest = _manifest_bytes(entries)
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest)
+        info.mtime = time.time()
+        archive.addfile(info, io.BytesIO(manifest))
+
+
+def _thumbnail(item, size):
+    """在线程池中读取、计算哈希并缩小一张截图"""
+    from PIL import Image
+    item, data, digest, error = _read(item)
+    if error is not None:
+        return item, None, None, error
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft('RGB', (size, size))
+            image.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+            thumbnail = image.convert('RGB')
+    except Exception as e:
+        return item, None, None, e
+    return item, (len(data), thumbnail), digest, None
+
+
+def _write_sheet(f, output, items, workers, entries, skipped, columns=6, thumb_size=240):
+    from PIL import Image, ImageDraw
+    padding, label = 8, 16
+    cell_width, cell_height = thumb_size + padding, thumb_size + padding + label
+    rows = max(1, -(-len(items) // columns))
+    sheet = Image.new('RGB', (columns * cell_width + padding, rows * cell_height + padding), (246, 246, 246))
+    draw = ImageDraw.Draw(sheet)
+    names = dict(zip((id(item) for item in items), _member_names(items)))
+    index = 0
+    for item, result, digest, error in read_ahead(items, read=partial(_thumbnail, size=thumb_size),
+                                                  workers=workers):
+        if error is not None:
+            skipped.append((item['path'], error))
+            continue
+        size, thumbnail = result
+        x = padding + (index % columns) * cell_width
+        y = padding + (index // columns) * cell_height
+        # 缩略图在格子中居中
+        sheet.paste(thumbnail, (x + (thumb_size - thumbnail.width) // 2, y + (thumb_size - thumbnail.height) // 2))
+        caption = f"{index + 1}  {time.strftime('%H:%M:%S', time.localtime(item['created']))}"
+        draw.text((x, y + thumb_size + 2), caption, fill=(60, 60, 60))
+        entries.append(ExportEntry(names[id(item)], item['path'], size, digest, item['created'],
+                                   item.get('width'), item.get('height'), item.get('tags')))
+        index += 1
+    if index < len(items):
+        # 有文件无法读取时去掉多余的空行
+        used_rows = max(1, -(-index // columns))
+        sheet = sheet.crop((0, 0, sheet.width, used_rows * cell_height + padding))
+    image_format = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.webp': 'WEBP'}.get(Path(output).suffix.lower(), 'PNG')
+    options = {'quality': 85} if image_format in ('JPEG', 'WEBP') else {'compress_level': 6}
+    sheet.save(f, image_format, **options)
+
+
+def export_captures(items, output, format=None, workers=8, columns=6, thumb_size=240):
+    """
+    导出截图
+
+    Args:
+        items (list): select_captures 选出的截图（按时间先后排列）
+        output (str): 输出文件路径，已存在时抛出 FileExistsError
+        format (str): zip / tar / sheet，None 表示按扩展名推断
+        workers (int): 并行读取的线程数
+        columns (int), thumb_size (int): 总览图的列数和缩略图边长
+
+    Returns:
+        tuple: (导出的 ExportEntry 列表, 跳过的 (路径, 错误) 列表)
+    """
+    format = format or format_from_path(output)
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"无法确定导出格式，请使用 .zip / .tar / .png / .jpg 扩展名或指定格式: {output}")
+    entries, skipped = [], []
+
+    def write(f):
+        entries.clear()
+        skipped.clear()
+        if format == 'zip':
+            _write_zip(f, items, workers, entries, skipped)
+        elif format == 'tar':
+            _write_tar(f, items, workers, entries, skipped)
+        else:
+            _write_sheet(f, output, items, workers, entries, skipped, columns, thumb_size)
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_stream(output, write)
+    return entries, skipped
+
+
+def format_manifest(entries):
+    """与 sha256sum -c 兼容的清单文本"""
+    return ''.join(f"{entry.sha256}  {entry.name}\n" for entry in entries)
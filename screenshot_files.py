@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图文件命名与原子写入
+
+文件名由微秒级时间戳加单调递增的序号组成，例如
+screenshot_20241201_143022_123456_000001.png，同一秒内的多张截图不会互相覆盖，
+按文件名排序即为截图顺序。
+
+写入时先写到同目录下以点开头的临时文件，再原子地重命名为最终文件名，
+读取方（例如粘贴路径后的CLI工具）永远不会看到写了一半的图片；大截图可以
+分多次写入临时文件（atomic_write_stream）。
+复制到剪贴板的图片文件优先以硬链接的方式放入保存目录，不读取也不重新编码。
+"""
+import errno
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class ScreenshotNamer:
+    """生成单调递增、互不冲突的截图文件名（不含扩展名）"""
+
+    def __init__(self, prefix='screenshot_'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._last_ns = 0
+        self._seq = 0
+
+    def next_name(self):
+        with self._lock:
+            now = time.time_ns()
+            # 系统时钟回拨或同一微秒内多次调用时，保证时间戳仍然递增
+            if now <= self._last_ns:
+                now = self._last_ns + 1000
+            self._last_ns = now
+            self._seq += 1
+            seq = self._seq
+        stamp = datetime.fromtimestamp(now // 1_000_000_000).strftime("%Y%m%d_%H%M%S")
+        micros = (now // 1000) % 1_000_000
+        return f"{self.prefix}{stamp}_{micros:06d}_{seq:06d}"
+
+
+def _rename_no_replace(src, dst):
+    """原子地重命名，目标已存在时抛出 FileExistsError 而不是覆盖"""
+    if os.name == 'nt':
+        # Windows 上目标存在时 os.rename 本身就会失败
+        os.rename(src, dst)
+        return
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno == errno.EEXIST:
+            raise FileExistsError(errno.EEXIST, "目标文件已存在", str(dst)) from e
+        if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EXDEV):
+            raise
+        # 文件系统不支持硬链接时退回普通重命名
+        if os.path.exists(dst):
+            raise FileExistsError(errno.EEXIST, "目标文件已存在", str(dst))
+        os.rename(src, dst)
+        return
+    os.remove(src)
+
+
+def atomic_write(path, data, fsync=True, replace=False):
+    """
+    把数据原子地写入 path
+
+    Args:
+        path (Path): 最终文件路径
+        data (bytes): 文件内容
+        fsync (bool): 重命名前是否把数据刷到磁盘
+        replace (bool): 目标文件已存在时原子地替换它
+
+    Raises:
+        FileExistsError: 目标文件已存在且 replace 为 False
+    """
+    return atomic_write_stream(path, lambda f: f.write(data), fsync, replace)
+
+
+def atomic_write_stream(path, write, fsync=True, replace=False):
+    """
+    与 atomic_write 相同，但内容由 write(f) 分多次写入临时文件，
+    用于大截图的按条带编码，完整的文件内容不需要先放在内存中
+
+    Args:
+        path (Path): 最终文件路径
+        write (callable): write(f)，向已打开的二进制文件写入内容
+        fsync (bool): 重命名前是否把数据刷到磁盘
+        replace (bool): 目标文件已存在时原子地替换它
+
+    Raises:
+        FileExistsError: 目标文件已存在且 replace 为 False
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'wb') as f:
+            write(f)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        if replace:
+            os.replace(tmp, path)
+        else:
+            _rename_no_replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def link_or_copy(src, dst):
+    """
+    把已有文件放入保存目录：优先创建硬链接，跨文件系统或不支持硬链接时原子地复制
+
+    Args:
+        src (str): 源文件
+        dst (Path): 目标路径
+
+    Returns:
+        bool: True 表示创建了硬链接，False 表示复制了文件
+
+    Raises:
+        FileExistsError: 目标文件已存在
+    """
+    try:
+        os.link(src, dst)
+        return True
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EXDEV, errno.EACCES):
+            raise
+    import shutil
+    dst = Path(dst)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        _rename_no_replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return False
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图保存器的本机 IPC 接口
+
+常驻运行的保存器在本机套接字上提供查询接口，其他进程（例如 CLI 工具）无需模拟按键、
+也不用自己读剪贴板就能取得截图：
+  - latest: 最新一张截图
+  - list: 最近 N 张截图，最新的在前
+  - wait: 等待下一张截图（可设超时）；传入 after=<seq> 时返回序号大于 seq 的第一张，
+          两次请求之间发生的截图也不会漏掉
+  - stats: 运行时间、截图数、队列深度、连接数等
+
+协议为每行一个 JSON 对象的请求/响应，一个连接可以连续发送多个请求。每个响应都带有服务的
+epoch（启动编号），序号只在同一个 epoch 内有意义：wait 请求同时传入 after 所属的 epoch，
+守护进程重启过（epoch 不同）时从新服务的第一张截图开始返回。
+POSIX 上使用权限为 0600 的 Unix 域套接字；Windows 上监听 127.0.0.1 的随机端口，
+并要求请求带上只写在保存目录中的令牌。连接方式写在保存目录的 .screenshot_saver.endpoint
+文件中，客户端据此连接。每个连接由一个线程处理。
+"""
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+
+
+ENDPOINT_FILENAME = '.screenshot_saver.endpoint'
+
+DEFAULT_IPC_SETTINGS = {
+    'enabled': False,
+    'transport': 'auto',     # auto（POSIX 用 unix，Windows 用 tcp）/ unix / tcp
+    'max_wait': 300,         # wait 请求的最长等待秒数
+}
+
+# 客户端请求一行的最大长度
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class CaptureEvent:
+    """发布给客户端的一次截图"""
+    __slots__ = ('seq', 'record')
+
+    def __init__(self, seq, record):
+        self.seq = seq
+        self.record = record
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接上的所有请求"""
+
+    def handle(self):
+        server = self.server.capture_server
+        server._connection_opened()
+        try:
+            while True:
+                line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+                if not line:
+                    break
+                if len(line) > MAX_REQUEST_BYTES:
+                    self._send({'ok': False, 'error': '请求过长'})
+                    break
+                response = server.handle_line(line)
+                if not self._send(response):
+                    break
+        finally:
+            server._connection_closed()
+
+    def _send(self, response):
+        try:
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            return True
+        except OSError:
+            return False
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = False
+    request_queue_size = 256
+
+
+class CaptureServer:
+    """本机截图查询服务"""
+
+    def __init__(self, root, recent, describe=None, stats=None, transport='auto', max_wait=300, events=None,
+                 epoch=None):
+        """
+        Args:
+            root (str): 保存目录，连接方式文件写在这里
+            recent (callable): recent(n) -> 最近 n 条 CaptureRecord，最新的在前
+            describe (callable): describe(record) -> dict，补充返回给客户端的字段（例如粘贴路径）
+            stats (callable): stats() -> dict，补充 stats 请求的内容
+            transport (str): auto / unix / tcp
+            max_wait (float): wait 请求的最长等待秒数
+            events (list): 上一个服务实例的 recent_events()。保存路径或 ipc 配置变化时服务会重建，
+                序号接着编号，客户端的 wait(after=seq) 不会因为序号重置而漏掉或久等截图
+            epoch (str): 上一个服务实例的 epoch，与 events 一起传入；为None时生成新的
+        """
+        if transport == 'auto':
+            transport = 'unix' if hasattr(socket, 'AF_UNIX') and os.name != 'nt' else 'tcp'
+        if transport not in ('unix', 'tcp'):
+            raise ValueError(f"未知的 IPC 传输方式: {transport}")
+        self.root = Path(root)
+        self.recent = recent
+        self.describe = describe
+        self.extra_stats = stats
+        self.transport = transport
+        self.max_wait = float(max_wait)
+        self.endpoint_path = self.root / ENDPOINT_FILENAME
+        self.token = None
+        self.address = None
+        self.started = None
+        self.published = 0
+        self.requests = 0
+        self.connections = 0
+        self._events = deque(events or (), maxlen=256)   # 最近发布的截图，供 wait(after=seq) 补发
+        self._seq = self._events[-1].seq if self._events else 0
+        # 进程重启后序号从 0 开始，客户端据此判断手中的序号是否还有效
+        self.epoch = epoch or f"{os.getpid():x}-{time.time_ns():x}"
+        self._changed = threading.Condition()
+        self._stopping = False
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """开始监听并写入连接方式文件"""
+        if self._server is not None:
+            return self
+        if self.transport == 'unix':
+            path = self._socket_path()
+            self._remove_stale_socket(path)
+            old_umask = os.umask(0o177)
+            try:
+                self._server = _UnixServer(str(path), _Handler)
+            finally:
+                os.umask(old_umask)
+            self.address = str(path)
+            endpoint = {'transport': 'unix', 'path': self.address}
+        else:
+            import secrets
+            self.token = secrets.token_hex(16)
+            self._server = _TcpServer(('127.0.0.1', 0), _Handler)
+            self.address = self._server.server_address
+            endpoint = {'transport': 'tcp', 'host': self.address[0], 'port': self.address[1],
+                        'token': self.token}
+        self._server.capture_server = self
+        endpoint['pid'] = os.getpid()
+        self._write_endpoint(endpoint)
+        self._stopping = False
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='ipc-server', daemon=True)
+        self._thread.start()
+        print(f"🔌 IPC 接口已启动: {self.describe_address()}")
+        return self
+
+    def describe_address(self):
+        if self.transport == 'unix':
+            return f"unix:{self.address}"
+        return f"tcp://{self.address[0]}:{self.address[1]}"
+
+    def _socket_path(self):
+        """保存目录中的套接字路径；路径太长（超过 Unix 套接字的限制）时放到临时目录"""
+        path = self.root.resolve() / '.screenshot_saver.sock'
+        if len(str(path).encode('utf-8')) < 100:
+            return path
+        digest = zlib.crc32(str(self.root.resolve()).encode('utf-8'))
+        return Path(tempfile.gettempdir()) / f"screenshot_saver_{digest:08x}.sock"
+
+    def _remove_stale_socket(self, path):
+        """删除上次异常退出留下的套接字文件；已有服务在监听时报错"""
+        if not path.exists():
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+        else:
+            raise RuntimeError(f"已有截图保存器在此目录提供服务: {path}")
+        finally:
+            probe.close()
+
+    def _write_endpoint(self, endpoint):
+        tmp = self.endpoint_path.with_name(self.endpoint_path.name + '.tmp')
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(endpoint, f)
+        os.replace(tmp, self.endpoint_path)
+
+    def stop(self):
+        """停止监听，唤醒所有等待中的 wait 请求，删除连接方式文件和套接字"""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for path in (self.endpoint_path, self.address if self.transport == 'unix' else None):
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def publish(self, record):
+        """保存器记录了一张新截图（在保存线程中调用，只做内存操作）"""
+        with self._changed:
+            self._seq += 1
+            self._events.append(CaptureEvent(self._seq, record))
+            self.published += 1
+            self._changed.notify_all()
+
+    def recent_events(self):
+        """最近发布的截图，传给重建的服务（见 events 参数）"""
+        with self._changed:
+            return list(self._events)
+
+    def _event_after(self, after):
+        """序号大于 after 的第一张截图；更早的已不在缓冲区中时返回缓冲区里最早的一张"""
+        for event in self._events:
+            if event.seq > after:
+                return event
+        return None
+
+    def wait_for_capture(self, after=None, timeout=None):
+        """
+        等待下一张截图
+
+        Args:
+            after (int): 返回序号大于此值的截图，None 表示从现在起的下一张
+            timeout (float): 最长等待秒数
+
+        Returns:
+            CaptureEvent: 超时或服务停止时返回None
+        """
+        timeout = self.max_wait if timeout is None else max(0.0, min(float(timeout), self.max_wait))
+        with self._changed:
+            if after is None:
+                after = self._seq
+            self._changed.wait_for(lambda: self._stopping or self._seq > after, timeout)
+            if self._stopping:
+                return None
+            return self._event_after(after)
+
+    def capture_dict(self, record, seq=None):
+        if record is None:
+            return None
+        item = {
+            'seq': seq,
+            'path': record.path,
+            'hash': record.hash,
+            'size': record.size,
+            'timestamp': record.timestamp,
+            'epoch': self.epoch,
+        }
+        if self.describe is not None:
+            item.update(self.describe(record))
+        return item
+
+    def handle_line(self, line):
+        """处理一行请求，返回响应字典（带有服务的 epoch）"""
+        response = self._dispatch(line)
+        response['epoch'] = self.epoch
+        return response
+
+    def _dispatch(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("请求必须是 JSON 对象")
+        except ValueError as e:
+            return {'ok': False, 'error': f"无效的请求: {e}"}
+        with self._changed:
+            self.requests += 1
+        if self.token is not None and request.get('token') != self.token:
+            return {'ok': False, 'error': '令牌无效'}
+        command = request.get('cmd')
+        handler = {
+            'ping': self._cmd_ping,
+            'latest': self._cmd_latest,
+            'list': self._cmd_list,
+            'wait': self._cmd_wait,
+            'stats': self._cmd_stats,
+        }.get(command)
+        if handler is None:
+            return {'ok': False, 'error': f"未知的命令: {command}"}
+        try:
+            response = handler(request)
+        except Exception as e:
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        response['ok'] = True
+        return response
+
+    def _cmd_ping(self, request):
+        return {'pid': os.getpid()}
+
+    def _cmd_latest(self, request):
+        with self._changed:
+            event = self._events[-1] if self._events else None
+            seq = self._seq
+        if event is not None:
+            return {'capture': self.capture_dict(event.record, event.seq), 'seq': seq}
+        # 启动以来还没有新截图：从截图历史中取上次运行保存的最新一张
+        records = self.recent(1)
+        return {'capture': self.capture_dict(records[0]) if records else None, 'seq': seq}
+
+    def _cmd_list(self, request):
+        count = max(1, min(int(request.get('count', 10)), 1000))
+        with self._changed:
+            seq = self._seq
+        return {'captures': [self.capture_dict(record) for record in self.recent(count)], 'seq': seq}
+
+    def _cmd_wait(self, request):
+        after = request.get('after')
+        if after is not None and request.get('epoch') not in (None, self.epoch):
+            # after 来自重启前的服务，新服务的序号从 0 开始
+            after = 0
+        event = self.wait_for_capture(None if after is None else int(after), request.get('timeout'))
+        if event is None:
+            return {'capture': None, 'timeout': True}
+        return {'capture': self.capture_dict(event.record, event.seq), 'timeout': False}
+
+    def _cmd_stats(self, request):
+        with self._changed:
+            stats = {
+                'pid': os.getpid(),
+                'uptime': time.time() - self.started if self.started else 0,
+                'captures': self.published,
+                'seq': self._seq,
+                'requests': self.requests,
+                'connections': self.connections,
+            }
+        if self.extra_stats is not None:
+            stats.update(self.extra_stats())
+        return {'stats': stats}
+
+    def _connection_opened(self):
+        with self._changed:
+            self.connections += 1
+
+    def _connection_closed(self):
+        with self._changed:
+            self.connections -= 1
+
+
+def create_ipc_server(root, recent, describe=None, stats=None, settings=None, events=None, epoch=None):
+    """
+    根据配置创建 IPC 服务，未启用时返回None
+
+    Args:
+        settings (dict): 形如 DEFAULT_IPC_SETTINGS 的配置
+        events (list): 上一个服务实例最近发布的截图，见 CaptureServer
+        epoch (str): 上一个服务实例的 epoch，见 CaptureServer
+    """
+    settings = settings or DEFAULT_IPC_SETTINGS
+    if not settings.get('enabled'):
+        return None
+    return CaptureServer(root, recent, describe, stats,
+                         transport=settings.get('transport', 'auto'),
+                         max_wait=settings.get('max_wait', 300),
+                         events=events,
+                         epoch=epoch)
+
+
+class IpcError(Exception):
+    """IPC 请求失败（守护进程未运行、连接断开或返回错误）"""
+
+
+class CaptureClient:
+    """截图保存器 IPC 接口的客户端，一个实例保持一个连接，可以连续发送多个请求"""
+
+    def __init__(self, root, timeout=5.0):
+        """
+        Args:
+            root (str): 保存器的保存目录（读取其中的连接方式文件）
+            timeout (float): 连接和普通请求的超时秒数，wait 请求会自动加上等待时间
+        """
+        self.root = Path(root)
+        self.timeout = timeout
+        self.endpoint = None
+        self._sock = None
+        self._file = None
+
+    def connect(self):
+        if self._sock is not None:
+            return self
+        try:
+            with open(self.root / ENDPOINT_FILENAME, 'r', encoding='utf-8') as f:
+                self.endpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            raise IpcError(f"截图保存器没有在 {self.root} 提供 IPC 接口（未运行或未启用 ipc）") from e
+        try:
+            if self.endpoint['transport'] == 'unix':
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.endpoint['path'])
+            else:
+                sock = socket.create_connection((self.endpoint['host'], self.endpoint['port']), self.timeout)
+        except OSError as e:
+            raise IpcError(f"无法连接截图保存器: {e}") from e
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+        return self
+
+    def request(self, cmd, read_timeout=None, **params):
+        """
+        发送一个请求并返回响应字典
+
+        Args:
+            cmd (str): 命令名
+            read_timeout (float): 等待响应的秒数，None 表示使用 self.timeout
+            params: 请求参数
+
+        Raises:
+            IpcError: 连接失败或服务端返回错误
+        """
+        self.connect()
+        params['cmd'] = cmd
+        if self.endpoint.get('token'):
+            params['token'] = self.endpoint['token']
+        try:
+            self._sock.settimeout(self.timeout if read_timeout is None else read_timeout)
+            self._file.write(json.dumps(params).encode('utf-8') + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as e:
+            self.close()
+            raise IpcError(f"与截图保存器通信失败: {e}") from e
+        if not line:
+            self.close()
+            raise IpcError("截图保存器关闭了连接")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise IpcError(response.get('error', '未知错误'))
+        return response
+
+    def latest(self):
+        """最新一张截图的信息，没有截图时返回None"""
+        return self.request('latest')['capture']
+
+    def recent(self, count=10):
+        """最近 count 张截图，最新的在前"""
+        return self.request('list', count=count)['captures']
+
+    def wait(self, timeout=30, after=None, epoch=None):
+        """
+        等待下一张截图
+
+        Args:
+            after (int): 返回序号大于此值的截图（例如 latest() 返回的 seq），
+                两次请求之间发生的截图不会漏掉；None 表示从现在起的下一张
+            epoch (str): after 所属服务的 epoch（与 seq 一起返回）。守护进程重启过时
+                旧的序号作废，返回重启后的第一张截图
+
+        Returns:
+            dict: 截图信息，超时时返回None
+        """
+        params = {'timeout': timeout}
+        if after is not None:
+            params['after'] = after
+        if epoch is not None:
+            params['epoch'] = epoch
+        return self.request('wait', read_timeout=self.timeout + timeout, **params)['capture']
+
+    def stats(self):
+        return self.request('stats')['stats']
+
+    def close(self):
+        for item in (self._file, self._sock):
+            if item is not None:
+                try:
+                    item.close()
+                except OSError:
+                    pass
+        self._file = None
+        self._sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存预算与大截图的内存回收
+
+8K 拼接截图的剪贴板原始数据接近 100 MB，完整解码后还要再占一份同样大小的内存，
+编码结果又是一份。为了让长时间运行的进程内存保持平稳:
+  - 后台工作池按字节数限制排队和处理中的截图总量（budget_mb），超出时按背压策略处理
+  - 超过 stream_threshold_mb 的 24/32 位 DIB 按行条带编码并直接写入文件，
+    不解码整帧，也不在内存中保留完整的编码结果
+  - 处理完大截图后把已释放的堆内存归还给操作系统（glibc 的 malloc_trim）
+"""
+import sys
+
+
+DEFAULT_MEMORY_SETTINGS = {
+    'budget_mb': 256,               # 排队和处理中的截图原始数据总量上限，0 表示只按 max_queue 限制
+    'stream_threshold_mb': 16,      # 超过此大小的截图按行条带编码写盘，0 表示不使用
+    'strip_rows': 256,              # 每个条带的行数
+    'trim': True,                   # 处理完大截图后把空闲的堆内存归还给系统（仅 glibc）
+}
+
+_malloc_trim = None
+
+
+def megabytes(value):
+    """配置中的 MB 数转换为字节数，0 或 None 返回None（不限制）"""
+    if not value:
+        return None
+    return int(float(value) * 1024 * 1024)
+
+
+def release_memory():
+    """
+    把空闲的堆内存归还给操作系统
+
+    大块缓冲区释放后，glibc 可能把它们留在进程的堆中以备复用，RSS 不会下降；
+    malloc_trim 立即归还。其他平台（或非 glibc）上什么都不做。
+
+    Returns:
+        bool: 是否执行了回收
+    """
+    global _malloc_trim
+    if not sys.platform.startswith('linux'):
+        return False
+    if _malloc_trim is None:
+        try:
+            import ctypes
+            _malloc_trim = ctypes.CDLL('libc.so.6').malloc_trim
+            _malloc_trim.argtypes = [ctypes.c_size_t]
+        except (OSError, AttributeError):
+            _malloc_trim = False
+    if not _malloc_trim:
+        return False
+    _malloc_trim(0)
+    return True
+
+
+def rss_mb():
+    """
+    当前进程的常驻内存（MB），无法读取时返回None
+
+    Linux 读取 /proc/self/statm；其他平台退回 resource 模块报告的峰值。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        import os
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    except ImportError:
+        return None
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量迁移已有的截图文件
+
+新的编码器和命名方式只对之后的截图生效。迁移命令遍历保存目录中已有的截图，用进程池
+并行地:
+  - 用当前（或指定的）编码器重新编码，结果比原文件小时才替换
+  - 可选把旧版本的文件名（screenshot_20241201_143022.png）改为当前的命名方式
+
+重新编码的结果会先解码并与原图逐像素比较（有损 WebP 只比较尺寸），一致后才原子地写入
+新文件、删除原文件；文件修改时间保持不变，索引中的路径和大小同步更新，副本随原图改名。
+
+每处理完一个文件就向保存目录中的检查点文件追加一行，中断后再次运行会跳过已处理的文件，
+目标格式或命名方式改变后检查点自动作废。试运行同样编码和校验，但不写入任何文件。
+"""
+import io
+import itertools
+import json
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+from screenshot_files import atomic_write, link_or_copy
+from screenshot_renditions import move_renditions
+from screenshot_store import IMAGE_SUFFIXES
+
+
+CHECKPOINT_FILENAME = '.screenshot_migration.jsonl'
+
+# 当前的命名方式: screenshot_日期_时间_微秒_序号
+CURRENT_NAME = re.compile(r'screenshot_\d{8}_\d{6}_\d{6}_\d{6}')
+
+# 旧版本的命名方式: screenshot_日期_时间（精确到秒）
+LEGACY_NAME = re.compile(r'screenshot_(\d{8}_\d{6})')
+
+# 能够无损比较的像素格式，其他格式（16 位灰度、CMYK 等）不迁移
+SUPPORTED_MODES = ('1', 'L', 'LA', 'P', 'PA', 'RGB', 'RGBA')
+
+
+class MigrationTask:
+    """迁移一个文件所需的全部信息，会被发送到子进程"""
+    __slots__ = ('src', 'stem', 'encoder', 'verify', 'dry_run', 'rendition_folder')
+
+    def __init__(self, src, stem, encoder=None, verify=True, dry_run=False, rendition_folder='optimized'):
+        self.src = src
+        self.stem = stem
+        self.encoder = encoder
+        self.verify = verify
+        self.dry_run = dry_run
+        self.rendition_folder = rendition_folder
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def _verify(image, encoded, exact=True):
+    """
+    解码重新编码的结果并与原图比较
+
+    Raises:
+        ValueError: 尺寸或像素不一致
+    """
+    from PIL import Image
+    with Image.open(io.BytesIO(encoded)) as result:
+        if result.size != image.size:
+            raise ValueError(f"校验失败: 尺寸 {result.size} 与原图 {image.size} 不一致")
+        if not exact:
+            return
+        mode = 'RGBA' if _has_alpha(image) else 'RGB'
+        if result.convert(mode).tobytes() != image.convert(mode).tobytes():
+            raise ValueError("校验失败: 重新编码后的像素与原图不一致")
+
+
+def reencode(data, encoder, verify=True):
+    """
+    把一个图片文件的内容用 encoder 重新编码
+
+    Args:
+        data (bytes): 原文件内容
+        encoder (Encoder): 目标编码器
+        verify (bool): 编码后解码并与原图比较
+
+    Raises:
+        ValueError: 不支持的图片或校验失败
+    """
+    from PIL import Image, UnidentifiedImageError
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise ValueError("无法识别的图片文件") from None
+    with image:
+        if getattr(image, 'n_frames', 1) > 1:
+            raise ValueError("动画图片不迁移")
+        if image.mode not in SUPPORTED_MODES:
+            raise ValueError(f"不支持的像素格式: {image.mode}")
+        image.load()
+        encoded = encoder.encode_image(image)
+        if verify:
+            _verify(image, encoded, exact=getattr(encoder, 'lossless', True))
+    return encoded
+
+
+def _same_content(path, data):
+    """path 的内容是否就是 data（上次迁移中断在删除原文件之前时，新文件已经写好）"""
+    try:
+        return Path(path).read_bytes() == data
+    except OSError:
+        return False
+
+
+def migrate_file(task):
+    """
+    迁移一个文件（在子进程中执行），失败时原文件保持不变
+
+    Returns:
+        dict: src / dst（文件名）、status（converted / renamed / kept / failed）、
+            before / after（字节数）、error
+    """
+    src = Path(task.src)
+    result = {'src': src.name, 'dst': src.name, 'status': 'kept', 'before': 0, 'after': 0, 'error': None}
+    try:
+        stat = src.stat()
+        result['before'] = result['after'] = stat.st_size
+        encoded = None
+        if task.encoder is not None:
+            data = src.read_bytes()
+            encoded = reencode(data, task.encoder, task.verify)
+            if len(encoded) >= len(data):
+                # 没有变小：保留原文件，只按需要改名
+                encoded = None
+        if encoded is not None:
+            dst = src.with_name(task.stem + task.encoder.extension)
+            result.update(status='converted', after=len(encoded))
+        else:
+            dst = src.with_name(task.stem + src.suffix)
+            if dst != src:
+                result['status'] = 'renamed'
+        result['dst'] = dst.name
+        if task.dry_run or result['status'] == 'kept':
+            return result
+
+        if encoded is not None:
+            if dst == src:
+                atomic_write(dst, encoded, replace=True)
+            else:
+                try:
+                    atomic_write(dst, encoded)
+                except FileExistsError:
+                    if not _same_content(dst, encoded):
+                        raise
+            os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        else:
+            try:
+                link_or_copy(src, dst)
+            except FileExistsError:
+                if not _same_content(dst, src.read_bytes()):
+                    raise
+            os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        if dst != src:
+            os.remove(src)
+            if dst.stem != src.stem and task.rendition_folder:
+                move_renditions(src, dst, task.rendition_folder)
+    except Exception as e:
+        result.update(status='failed', dst=src.name, after=result['before'], error=str(e) or type(e).__name__)
+    return result
+
+
+def migrated_stem(path, mtime_ns, taken):
+    """
+    文件按当前命名方式的新文件名（不含扩展名）
+
+    旧版本的文件名只精确到秒，时间取自文件名；修改时间落在同一秒内时使用修改时间的微秒。
+    序号固定从 000000 开始，与已有的文件名冲突时递增。
+
+    Args:
+        path (Path): 原文件
+        mtime_ns (int): 原文件的修改时间（纳秒）
+        taken (set): 已被占用的文件名（不含扩展名），新文件名会加入其中
+    """
+    if CURRENT_NAME.fullmatch(path.stem):
+        return path.stem
+    seconds, micros = mtime_ns // 1_000_000_000, (mtime_ns // 1000) % 1_000_000
+    match = LEGACY_NAME.match(path.stem)
+    if match:
+        try:
+            named = int(datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').timestamp())
+        except ValueError:
+            named = None
+        if named is not None and named != seconds:
+            seconds, micros = named, 0
+    stamp = datetime.fromtimestamp(seconds).strftime('%Y%m%d_%H%M%S')
+    for seq in itertools.count():
+        stem = f"screenshot_{stamp}_{micros:06d}_{seq:06d}"
+        if stem not in taken:
+            taken.add(stem)
+            return stem
+
+
+def migration_target(encoder=None, rename=False):
+    """描述迁移目标的字符串，目标改变时检查点作废"""
+    settings = None
+    if encoder is not None:
+        settings = {'format': encoder.name,
+                    'options': dict(vars(encoder))}
+    return json.dumps({'encoder': settings, 'rename': bool(rename)}, sort_keys=True)
+
+
+class MigrationCheckpoint:
+    """逐个文件追加的迁移进度，中断后再次运行时跳过已处理的文件"""
+
+    def __init__(self, path, target):
+        self.path = Path(path)
+        self.target = target
+        self.done = {}  # 原文件名 -> 迁移结果
+        self.valid = False
+        self._file = None
+        self._partial = False
+
+    def load(self):
+        """读取上次的进度；目标不同时视为没有进度。失败的文件下次会重试"""
+        try:
+            text = self.path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return self
+        lines = text.splitlines()
+        self._partial = bool(text) and not text.endswith('\n')
+        try:
+            self.valid = bool(lines) and json.loads(lines[0]).get('target') == self.target
+        except ValueError:
+            self.valid = False
+        if not self.valid:
+            return self
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时只写了一半的最后一行
+                continue
+            if record.get('status') != 'failed':
+                self.done[record['src']] = record
+        return self
+
+    @property
+    def outputs(self):
+        """已迁移得到的文件名，重新扫描目录时不再当作待迁移的文件"""
+        return {record['dst'] for record in self.done.values()}
+
+    def open(self):
+        if self.valid:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._partial:
+                self._file.write('\n')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'target': self.target}) + '\n')
+            self.valid = True
+        return self
+
+    def record(self, result):
+        self.done[result['src']] = result
+        self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MigrationReport:
+    """一次迁移（或试运行）的结果"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.counts = dict.fromkeys(('converted', 'renamed', 'kept', 'failed'), 0)
+        self.planned = 0
+        self.resumed = 0
+        self.size_before = 0
+        self.size_after = 0
+        self.failures = []
+        self.elapsed = 0.0
+
+    def add(self, result):
+        self.counts[result['status']] += 1
+        self.size_before += result['before']
+        self.size_after += result['after']
+        if result['status'] == 'failed':
+            self.failures.append((result['src'], result['error']))
+
+    @property
+    def processed(self):
+        return sum(self.counts.values())
+
+    @property
+    def saved(self):
+        return self.size_before - self.size_after
+
+    def format(self, limit=20):
+        """生成可读的报告文本"""
+        action = "将" if self.dry_run else "已"
+        elapsed = max(self.elapsed, 1e-9)
+        saved_percent = self.saved / self.size_before * 100 if self.size_before else 0
+        lines = [
+            f"待迁移: {self.planned} 个文件" + (f"（检查点中已完成 {self.resumed} 个，跳过）" if self.resumed else ''),
+            f"{action}重新编码 {self.counts['converted']} 个，{action}改名 {self.counts['renamed']} 个，"
+            f"保持不变 {self.counts['kept']} 个，失败 {self.counts['failed']} 个",
+            f"大小: {self.size_before / 2**20:.1f} MB -> {self.size_after / 2**20:.1f} MB，"
+            f"{'预计' if self.dry_run else ''}节省 {self.saved / 2**20:.1f} MB（{saved_percent:.1f}%）",
+            f"用时 {self.elapsed:.1f} 秒，{self.processed / elapsed:.0f} 个文件/秒，"
+            f"{self.size_before / 2**20 / elapsed:.1f} MB/秒",
+        ]
+        for src, error in self.failures[:limit]:
+            lines.append(f"  失败 {src}: {error}")
+        if len(self.failures) > limit:
+            lines.append(f"  ……另外 {len(self.failures) - limit} 个失败的文件")
+        return '\n'.join(lines)
+
+
+def plan_migration(root, encoder=None, rename=False, skip=(), before=None, limit=None, verify=True,
+                   dry_run=False, rendition_folder='optimized'):
+    """
+    列出需要迁移的截图文件
+
+    Args:
+        root (Path): 保存目录
+        encoder (Encoder): 目标编码器，None 表示不重新编码
+        rename (bool): 是否改为当前的命名方式
+        skip (set): 不处理的文件名（检查点中已完成的文件和它们的迁移结果）
+        before (float): 只处理修改时间早于该时间戳的文件，不碰正在运行的保存器刚写入的截图
+        limit (int): 最多处理的文件数
+
+    Returns:
+        list: 按文件名排序的 MigrationTask
+    """
+    entries = []
+    taken = set()
+    with os.scandir(root) as scan:
+        for entry in scan:
+            if not entry.name.startswith('screenshot_'):
+                continue
+            stem, suffix = os.path.splitext(entry.name)
+            if suffix.lower() not in IMAGE_SUFFIXES or not entry.is_file():
+                continue
+            taken.add(stem)
+            if entry.name in skip:
+                continue
+            stat = entry.stat()
+            if before is not None and stat.st_mtime >= before:
+                continue
+            entries.append((entry.name, stat.st_mtime_ns))
+    entries.sort()
+
+    tasks = []
+    for name, mtime_ns in entries:
+        path = Path(root) / name
+        stem = migrated_stem(path, mtime_ns, taken) if rename else path.stem
+        if encoder is None and stem == path.stem:
+            continue
+        tasks.append(MigrationTask(str(path), stem, encoder, verify, dry_run, rendition_folder))
+        if limit is not None and len(tasks) >= limit:
+            break
+    return tasks
+
+
+def _run_tasks(tasks, workers):
+    """在进程池中执行迁移，同时提交的任务数有上限，按完成顺序返回结果"""
+    if workers <= 1:
+        for task in tasks:
+            yield migrate_file(task)
+        return
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(migrate_file, task) for task in itertools.islice(tasks, workers * 4)}
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = next(tasks, None)
+                    if task is not None:
+                        pending.add(executor.submit(migrate_file, task))
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def migrate_folder(root, encoder=None, rename=False, workers=None, verify=True, dry_run=False, limit=None,
+                   restart=False, store=None, rendition_folder='optimized', batch_size=500, progress=None):
+    """
+    迁移保存目录中已有的截图
+
+    Args:
+        root (str): 保存目录
+        encoder (Encoder): 目标编码器，None 表示只改名
+        rename (bool): 是否改为当前的命名方式
+        workers (int): 进程数，默认为CPU核数；1 表示在当前进程中执行
+        verify (bool): 重新编码后解码并与原图比较
+        dry_run (bool): 只编码和统计，不写入任何文件
+        limit (int): 本次最多处理的文件数
+        restart (bool): 忽略检查点，从头开始
+        store (ScreenshotStore): 需要同步路径和大小的索引
+        rendition_folder (str): 副本所在的子目录，原图改名时副本一起改名
+        batch_size (int): 每处理多少个文件刷新一次检查点并更新索引
+        progress (callable): progress(已处理数, 总数)
+
+    Returns:
+        MigrationReport: 中断（KeyboardInterrupt）时已处理的部分也会写入检查点
+    """
+    root = Path(root)
+    start = time.perf_counter()
+    started = time.time()
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    checkpoint = MigrationCheckpoint(root / CHECKPOINT_FILENAME, migration_target(encoder, rename))
+    if not restart:
+        checkpoint.load()
+    report = MigrationReport(dry_run)
+    report.resumed = len(checkpoint.done)
+    moves = [(root / record['src'], root / record['dst'], record['after'])
+             for record in checkpoint.done.values() if record['src'] != record['dst']]
+    if store is not None and moves and not dry_run:
+        # 上次中断时可能还没来得及更新索引
+        store.relocate(moves)
+    moves = []
+
+    tasks = plan_migration(root, encoder, rename, set(checkpoint.done) | checkpoint.outputs, started, limit,
+                           verify, dry_run, rendition_folder)
+    report.planned = len(tasks)
+    if not dry_run:
+        checkpoint.open()
+    results = _run_tasks(tasks, workers)
+    try:
+        for done, result in enumerate(results, 1):
+            report.add(result)
+            if not dry_run:
+                checkpoint.record(result)
+                if result['status'] in ('converted', 'renamed'):
+                    moves.append((root / result['src'], root / result['dst'], result['after']))
+                if done % batch_size == 0:
+                    checkpoint.flush()
+                    if store is not None and moves:
+                        store.relocate(moves)
+                    moves = []
+            if progress is not None:
+                progress(done, len(tasks))
+    finally:
+        results.close()
+        checkpoint.close()
+        if store is not None and moves:
+            store.relocate(moves)
+        report.elapsed = time.perf_counter() - start
+    return report
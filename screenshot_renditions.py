@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图的缩小版副本
+
+把截图路径粘贴给 Gemini CLI 等工具时，对方会上传整张原图；4K 截图的PNG上传慢、
+占用的 token 也多，而大多数情况下宽 1280 的版本已经足够。启用后，每张截图保存后
+在后台工作池中额外生成一个副本:
+  - 按 max_width / max_height 等比缩小（只缩小不放大），使用快速的双线性缩放，
+    大倍数缩小时先用 reduce 整数倍降采样；24/32 位 DIB 按行条带边解码边降采样，
+    不解码整帧
+  - 可选只保留截图时前台窗口的区域（仅 Windows 全屏截图）
+  - 以 JPEG / WebP / PNG 按给定质量编码
+
+副本保存在保存目录的 optimized 子目录中，与原图同名（扩展名不同），粘贴快捷键可以
+配置为粘贴原图还是副本的路径。渲染器和编码器一样是可pickle的普通对象。
+"""
+import io
+import sys
+from pathlib import Path
+
+from screenshot_encoders import decode_dib, iter_dib_strips, parse_dib_header
+
+
+DEFAULT_RENDITION_SETTINGS = {
+    'enabled': False,
+    'max_width': 1280,              # 副本的最大宽度，None 表示不限制
+    'max_height': 1280,             # 副本的最大高度，None 表示不限制
+    'format': 'jpeg',               # jpeg / webp / png
+    'quality': 80,                  # JPEG / WebP 质量
+    'crop_active_window': False,    # 只保留截图时前台窗口的区域
+    'folder': 'optimized',          # 副本所在的子目录（相对保存目录）
+    'paste': 'original',            # 粘贴快捷键粘贴 original（原图）还是 optimized（副本）
+}
+
+RENDITION_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'webp': '.webp',
+    'png': '.png',
+}
+
+
+class RenditionRenderer:
+    """把剪贴板原始数据渲染为缩小、重新编码后的副本"""
+
+    def __init__(self, max_width=1280, max_height=1280, format='jpeg', quality=80, strip_rows=256):
+        """
+        Args:
+            max_width (int): 最大宽度，None 表示不限制
+            max_height (int): 最大高度，None 表示不限制
+            format (str): jpeg / webp / png
+            quality (int): JPEG / WebP 质量 1-100
+            strip_rows (int): 按条带降采样时每个条带的行数
+        """
+        if format not in RENDITION_EXTENSIONS:
+            raise ValueError(f"未知的副本格式: {format}")
+        self.max_width = int(max_width) if max_width else None
+        self.max_height = int(max_height) if max_height else None
+        self.format = format
+        self.quality = max(1, min(100, int(quality)))
+        self.extension = RENDITION_EXTENSIONS[format]
+        self.strip_rows = max(1, int(strip_rows))
+
+    def target_size(self, size):
+        """等比缩小到最大尺寸以内后的大小，不放大"""
+        width, height = size
+        scale = 1.0
+        if self.max_width and width > self.max_width:
+            scale = min(scale, self.max_width / width)
+        if self.max_height and height > self.max_height:
+            scale = min(scale, self.max_height / height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def render(self, data, crop=None):
+        """
+        Args:
+            data (bytes): 剪贴板原始数据（DIB、PNG 或图片文件内容）
+            crop (tuple): (left, top, right, bottom) 先裁剪到这个区域，None 表示不裁剪
+
+        Returns:
+            bytes: 副本的文件数据
+        """
+        from PIL import Image
+        image, size = self.decode(data, crop)
+        if size != image.size:
+            image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+        buffer = io.BytesIO()
+        if self.format == 'jpeg':
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=self.quality)
+        elif self.format == 'webp':
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.save(buffer, 'WEBP', quality=self.quality, method=4)
+        else:
+            image.save(buffer, 'PNG', compress_level=6)
+        return buffer.getvalue()
+
+
+    def decode(self, data, crop=None):
+        """
+        解码并裁剪；缩小倍数较大的 24/32 位 DIB 按条带解码并整数倍降采样
+
+        Returns:
+            tuple: (解码后的图片, 副本的最终尺寸)
+        """
+        from PIL import Image
+        layout = parse_dib_header(data)
+        if layout is None:
+            image = decode_dib(data)
+            if crop is not None:
+                image = image.crop(crop)
+            return image, self.target_size(image.size)
+
+        mode, (width, height) = layout[:2]
+        left, top, right, bottom = crop or (0, 0, width, height)
+        size = self.target_size((right - left, bottom - top))
+        # 与 resize 的 reducing_gap=2.0 相同: 先整数倍降采样到不小于目标尺寸的两倍
+        factor = int(min((right - left) / size[0], (bottom - top) / size[1]) / 2.0)
+        if factor < 2:
+            image = decode_dib(data)
+            if crop is not None:
+                image = image.crop(crop)
+            return image, size
+
+        # 条带行数取 factor 的整数倍，每个条带降采样后正好拼接在一起
+        rows = max(factor, self.strip_rows // factor * factor)
+        reduced = Image.new(mode, (-(-(right - left) // factor), -(-(bottom - top) // factor)))
+        for row, strip in iter_dib_strips(data, rows, top, bottom):
+            if left or right != width:
+                strip = strip.crop((left, 0, right, strip.size[1]))
+            reduced.paste(strip.reduce(factor), (0, (row - top) // factor))
+        return reduced, size
+
+
+def rendition_path(original, folder='optimized', extension='.jpg'):
+    """原图对应的副本路径: <原图目录>/<folder>/<原图文件名去掉扩展名><extension>"""
+    original = Path(original)
+    return original.parent / folder / f"{original.stem}{extension}"
+
+
+def remove_renditions(paths, folder='optimized'):
+    """删除原图对应的副本（任何格式），原图被保留策略清理时调用"""
+    import os
+    for path in paths:
+        for extension in set(RENDITION_EXTENSIONS.values()):
+            try:
+                os.remove(rendition_path(path, folder, extension))
+            except OSError:
+                pass
+
+
+def move_renditions(original, renamed, folder='optimized'):
+    """原图改名后，把它的副本（任何格式）改成对应的新文件名"""
+    import os
+    for extension in set(RENDITION_EXTENSIONS.values()):
+        try:
+            os.rename(rendition_path(original, folder, extension), rendition_path(renamed, folder, extension))
+        except OSError:
+            pass
+
+
+def active_window_box(image_size):
+    """
+    截图时前台窗口在截图中的区域
+
+    只有截图恰好是整个虚拟桌面或主显示器时，窗口坐标才能对应到截图像素；
+    区域截图、其他平台或坐标被系统缩放（程序不感知 DPI）时返回None，不裁剪。
+
+    Returns:
+        tuple: (left, top, right, bottom) 或 None
+    """
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        rect = wintypes.RECT()
+        if not user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+            return None
+        metrics = user32.GetSystemMetrics
+        # (左, 上, 宽, 高): 虚拟桌面, 主显示器
+        screens = ((metrics(76), metrics(77), metrics(78), metrics(79)),
+                   (0, 0, metrics(0), metrics(1)))
+        for left, top, width, height in screens:
+            if (width, height) != tuple(image_size):
+                continue
+            box = (max(rect.left - left, 0), max(rect.top - top, 0),
+                   min(rect.right - left, width), min(rect.bottom - top, height))
+            if box[2] <= box[0] or box[3] <= box[1] or box == (0, 0, width, height):
+                return None
+            return box
+    except Exception:
+        pass
+    return None
+
+
+def create_renderer(settings=None):
+    """
+    根据配置创建副本渲染器，未启用时返回None
+
+    Args:
+        settings (dict): 形如 DEFAULT_RENDITION_SETTINGS 的配置
+    """
+    settings = settings or DEFAULT_RENDITION_SETTINGS
+    if not settings.get('enabled'):
+        return None
+    return RenditionRenderer(
+        max_width=settings.get('max_width', 1280),
+        max_height=settings.get('max_height', 1280),
+        format=settings.get('format', 'jpeg'),
+        quality=settings.get('quality', 80),
+    )
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保存目录的保留策略与配额清理
+
+按截图目录索引中的“最后使用时间”（保存、再次截取或粘贴路径的时间）从旧到新清理：
+  - max_age_days: 超过N天没有用过的截图
+  - max_total_mb: 登记文件总大小的上限
+  - max_files: 登记文件数的上限
+最近用过的 keep_recent 张截图永远保留。
+
+清理只查询索引，不列目录。后台线程在内存中累计每次保存的文件数和字节数，
+只有超出配额（或到了定期检查按时间过期的时间）时才查询索引并删除一批文件。
+"""
+import os
+import threading
+import time
+
+
+DEFAULT_RETENTION_SETTINGS = {
+    'enabled': False,
+    'max_age_days': None,   # 超过N天未使用的截图被删除
+    'max_total_mb': None,   # 保存目录中截图的总大小上限
+    'max_files': None,      # 保存目录中截图的数量上限
+    'keep_recent': 20,      # 最近使用的N张截图永远保留
+    'interval': 600,        # 后台检查按时间过期的间隔（秒）
+    'batch_size': 500,      # 每批删除的最大文件数
+}
+
+
+class RetentionReport:
+    """一次清理（或试运行）的结果"""
+
+    def __init__(self, count, size, dry_run=True, keep_recent=0):
+        self.count_before = count
+        self.size_before = size
+        self.count_after = count
+        self.size_after = size
+        self.dry_run = dry_run
+        self.keep_recent = keep_recent
+        self.candidates = []  # (索引记录, 原因)
+        self.deleted = 0
+        self.freed = 0
+        self.failed = 0
+        self.reasons = {}
+
+    def add(self, item, reason):
+        self.candidates.append((item, reason))
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        self.count_after -= 1
+        self.size_after -= item['size']
+
+    def format(self, limit=20):
+        """生成可读的报告文本"""
+        labels = {'age': '超过保留天数', 'files': '超出数量上限', 'size': '超出总大小上限'}
+        action = "将删除" if self.dry_run else "已删除"
+        lines = [
+            f"当前: {self.count_before} 个文件，{self.size_before / 2**20:.1f} MB",
+            f"{action}: {len(self.candidates)} 个文件，{(self.size_before - self.size_after) / 2**20:.1f} MB",
+            f"清理后: {self.count_after} 个文件，{self.size_after / 2**20:.1f} MB"
+            f"（最近使用的 {self.keep_recent} 张始终保留）",
+        ]
+        for reason, count in self.reasons.items():
+            lines.append(f"  {labels.get(reason, reason)}: {count} 个")
+        if self.failed:
+            lines.append(f"  删除失败: {self.failed} 个")
+        for item, reason in self.candidates[:limit]:
+            used = time.strftime('%Y-%m-%d %H:%M', time.localtime(item['last_used']))
+            lines.append(f"  {used}  {item['size'] / 1024:8.1f} KB  {item['path']}")
+        if len(self.candidates) > limit:
+            lines.append(f"  ……另有 {len(self.candidates) - limit} 个")
+        return '\n'.join(lines)
+
+
+class RetentionEngine:
+    """按最后使用时间从旧到新清理保存目录"""
+
+    def __init__(self, store, max_age_days=None, max_total_mb=None, max_files=None,
+                 keep_recent=20, interval=600, batch_size=500):
+        """
+        Args:
+            store (ScreenshotStore): 保存目录的截图索引
+            max_age_days (float): 未使用超过该天数的截图被删除，None 表示不限制
+            max_total_mb (float): 总大小上限，None 表示不限制
+            max_files (int): 文件数上限，None 表示不限制
+            keep_recent (int): 最近使用的N张永远保留
+            interval (float): 后台检查按时间过期的间隔秒数
+            batch_size (int): 后台每批删除的最大文件数
+        """
+        self.store = store
+        self.max_age = float(max_age_days) * 86400 if max_age_days else None
+        self.max_bytes = int(float(max_total_mb) * 2**20) if max_total_mb else None
+        self.max_files = int(max_files) if max_files else None
+        self.keep_recent = max(0, int(keep_recent))
+        self.interval = float(interval)
+        self.batch_size = max(1, int(batch_size))
+        self.count = 0
+        self.size = 0
+        self.on_removed = None  # on_removed(paths)，删除一批文件后回调（例如同时删除副本）
+        self._counter_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.max_age or self.max_bytes or self.max_files)
+
+    def over_quota(self, count=None, size=None):
+        """文件数或总大小是否超出配额"""
+        count = self.count if count is None else count
+        size = self.size if size is None else size
+        return bool((self.max_files and count > self.max_files)
+                    or (self.max_bytes and size > self.max_bytes))
+
+    def plan(self, now=None, limit=None):
+        """
+        计算需要删除的文件，不做任何修改
+
+        从最久未使用的文件开始逐页读取索引，遇到第一个不需要删除的文件就停止，
+        索引中较新的大部分记录不会被读取。
+
+        Args:
+            limit (int): 最多列出的文件数，None 表示不限制
+
+        Returns:
+            RetentionReport: 试运行报告
+        """
+        now = time.time() if now is None else now
+        count, size = self.store.totals()
+        report = RetentionReport(count, size, keep_recent=self.keep_recent)
+        if not self.enabled:
+            return report
+        expire_before = now - self.max_age if self.max_age else None
+        after = None
+        while limit is None or len(report.candidates) < limit:
+            page = self.store.least_recently_used(self.batch_size, after)
+            if not page:
+                break
+            for item in page:
+                if report.count_after <= self.keep_recent:
+                    return report
+                if expire_before is not None and item['last_used'] < expire_before:
+                    reason = 'age'
+                elif self.max_files and report.count_after > self.max_files:
+                    reason = 'files'
+                elif self.max_bytes and report.size_after > self.max_bytes:
+                    reason = 'size'
+                else:
+                    # 按最后使用时间排序，后面的文件更新，不会再需要删除
+                    return report
+                report.add(item, reason)
+                if limit is not None and len(report.candidates) >= limit:
+                    return report
+            after = (page[-1]['last_used'], page[-1]['hash'])
+        return report
+
+    def run_once(self, dry_run=False, now=None, limit=None):
+        """
+        执行一次清理
+
+        Args:
+            dry_run (bool): 只生成报告，不删除文件
+            limit (int): 本次最多删除的文件数
+
+        Returns:
+            RetentionReport: 清理报告
+        """
+        report = self.plan(now, limit)
+        report.dry_run = dry_run
+        if dry_run or not report.candidates:
+            return report
+        removed = []
+        removed_paths = []
+        for item, reason in report.candidates:
+            try:
+                os.remove(item['path'])
+            except FileNotFoundError:
+                pass  # 已被手动删除，只清理登记
+            except OSError as e:
+                print(f"⚠️ 删除截图失败: {item['path']} ({e})")
+                report.failed += 1
+                report.count_after += 1
+                report.size_after += item['size']
+                continue
+            removed.append(item['hash'])
+            removed_paths.append(item['path'])
+            report.deleted += 1
+            report.freed += item['size']
+        self.store.remove(removed)
+        if self.on_removed is not None and removed_paths:
+            self.on_removed(removed_paths)
+        with self._counter_lock:
+            self.count -= report.deleted
+            self.size -= report.freed
+        return report
+
+    def refresh(self):
+        """从索引重新读取文件数和总大小"""
+        count, size = self.store.totals()
+        with self._counter_lock:
+            self.count, self.size = count, size
+
+    def notify_saved(self, size):
+        """
+        登记了一个新文件（在保存路径上调用，只做内存计数）
+
+        超出配额时唤醒后台线程清理。
+        """
+        with self._counter_lock:
+            self.count += 1
+            self.size += size
+            over = self.over_quota()
+        if over:
+            self._wake.set()
+
+    def wake(self):
+        """立即唤醒后台清理（例如磁盘空间不足时）"""
+        self._wake.set()
+
+    def start(self):
+        """启动后台清理线程"""
+        if self._thread is not None or not self.enabled:
+            return self
+        self.refresh()
+        self._stopping.clear()
+        self._wake.set()  # 启动后先检查一次
+        self._thread = threading.Thread(target=self._run, name='screenshot-retention', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopping.is_set():
+            woken = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                if not woken:
+                    # 定期检查：校正计数（文件可能被手动删除）并处理按时间过期的文件
+                    self.refresh()
+                self._drain()
+            except Exception as e:
+                print(f"⚠️ 清理保存目录失败: {e}")
+
+    def _drain(self):
+        """分批删除直到满足所有策略"""
+        while not self._stopping.is_set():
+            report = self.run_once(limit=self.batch_size)
+            if report.deleted:
+                print(f"🧹 已清理 {report.deleted} 个旧截图，释放 {report.freed / 2**20:.1f} MB")
+            if len(report.candidates) < self.batch_size or not report.deleted:
+                break
+
+    def stop(self):
+        """停止后台清理线程"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def create_retention_engine(store, settings=None):
+    """
+    根据配置创建清理引擎，未启用时返回None
+
+    Args:
+        settings (dict): 形如 DEFAULT_RETENTION_SETTINGS 的配置
+    """
+    settings = dict(settings or DEFAULT_RETENTION_SETTINGS)
+    if not settings.pop('enabled', False):
+        return None
+    engine = RetentionEngine(store, **settings)
+    return engine if engine.enabled else None
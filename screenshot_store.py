@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的截图存储与目录索引
+
+保存目录下的每个截图文件都以其内容哈希登记在 SQLite 索引中。
+再次复制任何一张以前保存过的截图时，直接返回已有文件，不再编码和写盘；
+索引持久化在磁盘上，重启程序后依然有效。
+
+索引同时记录截图时间、尺寸、文件大小、剪贴板来源格式和可选标签，
+按时间和尺寸搜索直接查询索引，不需要列目录或打开图片。
+已有的截图文件夹可以用 index_folder 并行补建索引。
+"""
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+
+
+INDEX_FILENAME = '.screenshot_index.sqlite3'
+
+# 补建索引时识别的截图文件
+SCREENSHOT_PATTERN = 'screenshot_*'
+IMAGE_SUFFIXES = ('.png', '.webp', '.qoi', '.bmp', '.jpg', '.jpeg')
+
+# 后加入的列（旧版本索引打开时自动补上）
+_CATALOG_COLUMNS = (
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+    ('source_format', 'TEXT'),
+    ('tags', 'TEXT'),
+    ('last_used', 'REAL'),
+)
+
+
+def content_hash(data):
+    """计算剪贴板原始数据的内容哈希（BLAKE2b，128位）"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def parse_since(value, now=None):
+    """
+    把 1h / 30m / 2d / 90s 或 ISO 日期时间解析为时间戳
+
+    Raises:
+        ValueError: 格式无法识别
+    """
+    from datetime import datetime
+    now = time.time() if now is None else now
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*', value)
+    if match:
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+        return now - float(match.group(1)) * units[match.group(2)]
+    return datetime.fromisoformat(value).timestamp()
+
+
+class ScreenshotStore:
+    """保存目录的内容哈希索引和截图目录"""
+
+    def __init__(self, root, index_name=INDEX_FILENAME):
+        """
+        Args:
+            root (str): 截图保存目录
+            index_name (str): 索引数据库文件名（位于保存目录下）
+        """
+        import sqlite3
+        self.root = Path(root)
+        self.index_path = self.root / index_name
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' hash TEXT PRIMARY KEY,'
+            ' path TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created REAL NOT NULL)'
+        )
+        existing = {row['name'] for row in self._db.execute('PRAGMA table_info(files)')}
+        for name, column_type in _CATALOG_COLUMNS:
+            if name not in existing:
+                self._db.execute(f'ALTER TABLE files ADD COLUMN {name} {column_type}')
+        self._db.execute('UPDATE files SET last_used = created WHERE last_used IS NULL')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_path ON files (path)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used, hash)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_created ON files (created)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_width ON files (width)')
+        self._db.commit()
+
+    def _resolve(self, stored_path):
+        path = Path(stored_path)
+        return path if path.is_absolute() else self.root / path
+
+    def _stored_path(self, path):
+        """保存目录内的文件以相对路径登记，目录整体移动后索引仍然有效"""
+        path = Path(path)
+        if path.parent == self.root:
+            # 直接位于保存目录下的文件（最常见的情况）不需要逐个 resolve
+            return path.name
+        try:
+            return str(Path(path).resolve().relative_to(self.root.resolve()))
+        except ValueError:
+            return str(Path(path).resolve())
+
+    def lookup(self, digest):
+        """
+        查找内容哈希对应的已保存文件
+
+        Returns:
+            str: 文件的绝对路径；没有记录或文件已被删除时返回None
+        """
+        with self._lock:
+            row = self._db.execute('SELECT path FROM files WHERE hash = ?', (digest,)).fetchone()
+            if row is None:
+                return None
+            path = self._resolve(row[0])
+            if path.exists():
+                return str(path.resolve())
+            # 文件已被删除，清理过期记录
+            self._db.execute('DELETE FROM files WHERE hash = ?', (digest,))
+            self._db.commit()
+            return None
+
+    def add(self, digest, path, width=None, height=None, source_format=None, tags=None, created=None):
+        """
+        登记一个新写入的文件
+
+        Args:
+            digest (str): 内容哈希
+            path (str): 文件路径
+            width (int), height (int): 图片尺寸
+            source_format (str): 剪贴板中的原始格式，例如 dib / png
+            tags (list): 可选标签
+            created (float): 截图时间戳，默认为当前时间
+
+        Returns:
+            str: 该内容对应的文件路径。如果并发保存导致同一内容已经登记过，
+                返回先登记的文件路径
+        """
+        path = Path(path)
+        stored = self._stored_path(path)
+        with self._lock:
+            row = self._db.execute('SELECT path FROM files WHERE hash = ?', (digest,)).fetchone()
+            if row is not None and self._resolve(row[0]).exists():
+                return str(self._resolve(row[0]).resolve())
+            created = time.time() if created is None else created
+            self._db.execute(
+                'INSERT OR REPLACE INTO files'
+                ' (hash, path, size, created, width, height, source_format, tags, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (digest, stored, path.stat().st_size, created,
+                 width, height, source_format, _join_tags(tags), created),
+            )
+            self._db.commit()
+        return str(path.resolve())
+
+    def set_tags(self, path, tags):
+        """设置某个文件的标签"""
+        with self._lock:
+            cursor = self._db.execute('UPDATE files SET tags = ? WHERE path = ?',
+                                      (_join_tags(tags), self._stored_path(path)))
+            self._db.commit()
+            return cursor.rowcount > 0
+
+    def find(self, since=None, until=None, min_width=None, min_height=None, tag=None, limit=None):
+        """
+        按条件搜索截图，最新的在前
+
+        Returns:
+            list: 每项为包含 path/hash/size/created/width/height/source_format/tags 的字典
+        """
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('created >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('created <= ?')
+            params.append(until)
+        if min_width is not None:
+            conditions.append('width >= ?')
+            params.append(min_width)
+        if min_height is not None:
+            conditions.append('height >= ?')
+            params.append(min_height)
+        if tag is not None:
+            conditions.append("(',' || tags || ',') LIKE ?")
+            params.append(f'%,{tag},%')
+        sql = 'SELECT * FROM files'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY created DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item['path'] = str(self._resolve(item['path']))
+            item['tags'] = item['tags'].split(',') if item['tags'] else []
+            results.append(item)
+        return results
+
+    def indexed_paths(self):
+        """已登记的全部文件路径（相对保存目录）"""
+        with self._lock:
+            return {row[0] for row in self._db.execute('SELECT path FROM files')}
+
+    def add_many(self, entries):
+        """
+        批量登记补建索引得到的条目，已存在的哈希保持不变
+
+        Returns:
+            int: 实际新登记的条目数（内容重复、哈希已登记的文件不计入）
+        """
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                'INSERT OR IGNORE INTO files'
+                ' (hash, path, size, created, width, height, source_format, tags, last_used)'
+                ' VALUES (:hash, :path, :size, :created, :width, :height, :source_format, NULL, :created)',
+                entries,
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def relocate(self, moves):
+        """
+        文件被改名或重新编码后更新登记的路径和大小，内容哈希和截图时间保持不变
+
+        Args:
+            moves (list): (原路径, 新路径, 新文件大小) 列表
+        """
+        with self._lock:
+            self._db.executemany('UPDATE files SET path = ?, size = ? WHERE path = ?',
+                                 [(self._stored_path(new), size, self._stored_path(old))
+                                  for old, new, size in moves])
+            self._db.commit()
+
+    def touch(self, paths, when=None):
+        """记录文件被粘贴或再次截取的时间，清理时最近用过的文件最后删除"""
+        when = time.time() if when is None else when
+        with self._lock:
+            self._db.executemany('UPDATE files SET last_used = ? WHERE path = ?',
+                                 [(when, self._stored_path(path)) for path in paths])
+            self._db.commit()
+
+    def totals(self):
+        """
+        Returns:
+            tuple: (已登记文件数, 总字节数)
+        """
+        with self._lock:
+            count, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        return count, size
+
+    def least_recently_used(self, limit, after=None):
+        """
+        按最后使用时间从旧到新列出登记的文件
+
+        Args:
+            limit (int): 本页条数
+            after (tuple): 上一页最后一条的 (last_used, hash)，从它之后继续
+        """
+        sql = 'SELECT hash, path, size, created, last_used FROM files'
+        params = []
+        if after is not None:
+            sql += ' WHERE (last_used, hash) > (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY last_used, hash LIMIT ?'
+        params.append(int(limit))
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item['path'] = str(self._resolve(item['path']))
+            results.append(item)
+        return results
+
+    def remove(self, digests):
+        """删除登记记录（不删除文件）"""
+        with self._lock:
+            self._db.executemany('DELETE FROM files WHERE hash = ?', [(digest,) for digest in digests])
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _join_tags(tags):
+    if not tags:
+        return None
+    return ','.join(tag.strip() for tag in tags if tag.strip())
+
+
+def describe_file(path):
+    """
+    读取单个截图文件的索引信息（在线程池中执行）
+
+    补建索引时没有剪贴板原始数据，内容哈希按文件字节计算。
+    """
+    from PIL import Image
+    data = path.read_bytes()
+    stat = path.stat()
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            source_format = (image.format or '').lower() or None
+    except Exception:
+        width = height = source_format = None
+    return {
+        'hash': content_hash(data),
+        'size': stat.st_size,
+        'created': stat.st_mtime,
+        'width': width,
+        'height': height,
+        'source_format': source_format,
+    }
+
+
+def index_folder(store, workers=8, batch_size=500, progress=None):
+    """
+    为保存目录中尚未登记的截图文件补建索引
+
+    Args:
+        store (ScreenshotStore): 目标索引
+        workers (int): 并行读取文件的线程数
+        batch_size (int): 每批写入数据库的条目数
+        progress (callable): progress(已处理数, 总数)
+
+    Returns:
+        int: 新登记的文件数（与已登记文件内容相同的文件被跳过，不计入）
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    known = store.indexed_paths()
+    pending = [path for path in store.root.glob(SCREENSHOT_PATTERN)
+               if path.suffix.lower() in IMAGE_SUFFIXES and path.name not in known]
+    added = 0
+    batch = []
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        for done, (path, info) in enumerate(
+                zip(pending, executor.map(_describe_or_none, pending)), 1):
+            if info is not None:
+                info['path'] = store._stored_path(path)
+                batch.append(info)
+            if len(batch) >= batch_size:
+                added += store.add_many(batch)
+                batch = []
+            if progress is not None:
+                progress(done, len(pending))
+    if batch:
+        added += store.add_many(batch)
+    return added
+
+
+def _describe_or_none(path):
+    try:
+        return describe_file(path)
+    except OSError:
+        return None
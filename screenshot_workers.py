@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台编码/写入工作池
+
+监控线程只负责读取剪贴板并把原始数据放入有界队列，编码和写盘由工作池完成，
+大截图的PNG压缩不会再阻塞剪贴板监控。
+
+队列已满时的背压策略:
+  - drop_oldest: 丢弃队列中最旧的一张，保证最新截图能进入队列
+  - block: 阻塞监控线程直到队列有空位
+  - spill: 把原始数据先写到磁盘的溢出目录，工作线程与队列中的任务一起按提交顺序处理
+
+配置了 render 时，工作线程在写入原图后还会生成并写入缩小版副本。
+
+设置了 max_bytes 时，排队和处理中的截图原始数据总量也受限制，超出时同样按背压策略处理；
+超过 stream_threshold 的截图交给 stream 按条带直接写入文件，处理完后调用 release 回收内存。
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from pipeline_metrics import NullMetrics
+
+
+DEFAULT_WORKER_SETTINGS = {
+    'mode': 'thread',           # thread 或 process
+    'workers': 2,
+    'max_queue': 8,
+    'backpressure': 'drop_oldest',  # drop_oldest / block / spill
+}
+
+BACKPRESSURE_POLICIES = ('drop_oldest', 'block', 'spill')
+
+
+class SaveJob:
+    """一次待保存的截图"""
+    __slots__ = ('seq', 'data', 'fingerprint', 'name', 'spill_path', 'info', 'crop', 'submitted', 'charged')
+
+    def __init__(self, seq, data, fingerprint, name=None, spill_path=None, info=None, crop=None):
+        self.seq = seq
+        self.data = data
+        self.fingerprint = fingerprint
+        self.name = name
+        self.spill_path = spill_path
+        self.info = info
+        self.crop = crop
+        self.submitted = time.perf_counter()
+        self.charged = 0  # 计入内存预算的字节数
+
+    def load(self):
+        """取出原始数据，溢出到磁盘的任务从文件读回"""
+        if self.data is None and self.spill_path is not None:
+            self.data = Path(self.spill_path).read_bytes()
+        return self.data
+
+
+class SaveWorkerPool:
+    """有界队列加工作线程（可选子进程编码）的保存工作池"""
+
+    def __init__(self, encode, write, on_saved=None, on_error=None,
+                 mode='thread', workers=2, max_queue=8,
+                 backpressure='drop_oldest', spill_dir=None, metrics=None,
+                 render=None, write_rendition=None,
+                 max_bytes=None, stream=None, stream_threshold=None, release=None):
+        """
+        Args:
+            encode (callable): encode(data) -> bytes，process模式下必须是可pickle的模块级函数
+            write (callable): write(encoded, job) -> 文件路径，在工作线程中执行
+            on_saved (callable): on_saved(path, job)，写入完成后回调
+            on_error (callable): on_error(exc, job)，编码或写入失败时回调
+            mode (str): thread 在线程中编码，process 在子进程中编码
+            workers (int): 工作线程（及子进程）数量
+            max_queue (int): 队列最大长度
+            backpressure (str): 队列已满时的策略
+            spill_dir (str): spill 策略使用的溢出目录
+            metrics (PipelineMetrics): 记录编码耗时和丢弃次数，None 表示不记录
+            render (callable): render(data, crop) -> bytes，生成缩小版副本，None 表示不生成；
+                process模式下同样在子进程中执行
+            write_rendition (callable): write_rendition(encoded, path, job)，写入原图 path 的副本
+            max_bytes (int): 排队和处理中的截图原始数据总字节数上限，None 表示只按 max_queue 限制；
+                单张超过上限的截图在没有其他截图占用内存时仍然会被接收
+            stream (callable): stream(job) -> 文件路径，按条带编码并写入大截图，
+                编码器不支持时返回None，改走普通的 encode + write；总是在工作线程中执行
+            stream_threshold (int): 原始数据达到此字节数时使用 stream，None 表示不使用
+            release (callable): release()，处理完达到 stream_threshold 的截图后调用，回收内存
+        """
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"未知的工作池模式: {mode}")
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"未知的背压策略: {backpressure}")
+        if backpressure == 'spill' and spill_dir is None:
+            raise ValueError("spill 策略需要指定 spill_dir")
+
+        self.encode = encode
+        self.write = write
+        self.on_saved = on_saved
+        self.on_error = on_error
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.backpressure = backpressure
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.render = render
+        self.write_rendition = write_rendition
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.stream = stream
+        self.stream_threshold = int(stream_threshold) if stream_threshold else None
+        self.release = release
+
+        self.queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self.spilled = deque()
+        self._spill_lock = threading.Lock()
+        self.sequence = itertools.count(1)
+        self.last_seq = 0  # 最近提交的任务序号
+        self.dropped = 0
+        self._stopping = threading.Event()
+        self._threads = []
+        self._executor = None
+        self._outstanding = 0
+        self._idle = threading.Condition()
+        self.held_bytes = 0  # 排队和处理中的截图占用的字节数
+        self._memory = threading.Condition()
+
+    def start(self):
+        """启动工作线程"""
+        if self.mode == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._recover_spilled()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"save-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _recover_spilled(self):
+        """上次退出时留在溢出目录中的截图重新加入处理"""
+        for path in sorted(self.spill_dir.glob('*.dib')):
+            self._add_outstanding(1)
+            self.spilled.append(SaveJob(next(self.sequence), None, None, spill_path=path))
+
+    def _add_outstanding(self, delta):
+        with self._idle:
+            self._outstanding += delta
+            if self._outstanding == 0:
+                self._idle.notify_all()
+
+    def _fits(self, size):
+        """再接收 size 字节是否不超出内存预算（调用方持有 _memory）"""
+        return self.max_bytes is None or self.held_bytes == 0 or self.held_bytes + size <= self.max_bytes
+
+    def _charge(self, job, size):
+        with self._memory:
+            job.charged = size
+            self.held_bytes += size
+
+    def _uncharge(self, job):
+        if job.charged:
+            with self._memory:
+                self.held_bytes -= job.charged
+                job.charged = 0
+                self._memory.notify_all()
+
+    def _drop(self, job):
+        self.dropped += 1
+        self.metrics.inc('dropped')
+        self.metrics.event('dropped', seq=job.seq)
+        self._uncharge(job)
+        job.data = None
+        self._add_outstanding(-1)
+
+    def _spill(self, job):
+        # 文件名按时间排序，重启后恢复时保持原有顺序
+        job.spill_path = self.spill_dir / f"{time.time_ns():020d}_{job.seq:06d}.dib"
+        with open(job.spill_path, 'wb') as f:
+            f.write(job.data)
+        job.data = None
+        with self._spill_lock:
+            self.spilled.append(job)
+        return job
+
+    def submit(self, data, fingerprint=None, name=None, info=None, crop=None):
+        """
+        提交一张截图
+
+        Args:
+            data (bytes): 剪贴板原始数据
+            fingerprint (str): 内容哈希，原样传给回调
+            name (str): 在截图时就确定的文件名，原样传给 write
+            info (tuple): 截图的 (宽, 高, 来源格式)，原样传给回调
+            crop (tuple): 副本的裁剪区域，原样传给 render
+
+        Returns:
+            SaveJob: 已进入队列（或溢出到磁盘）的任务
+        """
+        job = SaveJob(next(self.sequence), data, fingerprint, name, info=info, crop=crop)
+        self.last_seq = job.seq
+        self._add_outstanding(1)
+        size = len(data)
+
+        if self.backpressure == 'block':
+            with self._memory:
+                self._memory.wait_for(lambda: self._fits(size))
+                job.charged = size
+                self.held_bytes += size
+            self.queue.put(job)
+            return job
+
+        while True:
+            with self._memory:
+                fits = self._fits(size)
+            if fits:
+                self._charge(job, size)
+                try:
+                    self.queue.put_nowait(job)
+                    return job
+                except queue.Full:
+                    self._uncharge(job)
+
+            if self.backpressure == 'spill':
+                return self._spill(job)
+
+            # drop_oldest: 丢弃最旧的任务为新截图腾出位置（队列长度或内存预算）
+            try:
+                self._drop(self.queue.get_nowait())
+            except queue.Empty:
+                if fits:
+                    continue
+                # 预算全被处理中的截图占用，已经没有可丢弃的任务：仍然接收最新的截图
+                self._charge(job, size)
+                self.queue.put(job)
+                return job
+
+    @property
+    def pending(self):
+        """排队中的任务数量（包括溢出到磁盘的）"""
+        return self.queue.qsize() + len(self.spilled)
+
+    def _next_job(self):
+        """
+        按提交顺序取下一个任务：内存队列和溢出到磁盘的任务中序号较小的一个
+
+        每次阻塞等待队列之前先检查溢出的任务，持续高负载时溢出的截图也不会一直排不上。
+        """
+        with self._spill_lock:
+            if self.spilled:
+                with self.queue.mutex:
+                    head = self.queue.queue[0].seq if self.queue.queue else None
+                if head is None or self.spilled[0].seq < head:
+                    return self.spilled.popleft()
+        try:
+            return self.queue.get(timeout=0.2)
+        except queue.Empty:
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                if self._stopping.is_set():
+                    return
+                continue
+            try:
+                self._process(job)
+            finally:
+                self._uncharge(job)
+                self._add_outstanding(-1)
+
+    def _process(self, job):
+        large = False
+        try:
+            data = job.load()
+            large = self.stream_threshold is not None and len(data) >= self.stream_threshold
+            path = None
+            if large and self.stream is not None:
+                with self.metrics.timer('stream'):
+                    path = self.stream(job)
+            if path is None:
+                with self.metrics.timer('encode'):
+                    if self._executor is not None:
+                        encoded = self._executor.submit(self.encode, data).result()
+                    else:
+                        encoded = self.encode(data)
+                if self.render is None:
+                    job.data = None
+                del data
+                path = self.write(encoded, job)
+                del encoded
+            else:
+                del data
+            if job.spill_path is not None:
+                try:
+                    os.remove(job.spill_path)
+                except OSError:
+                    pass
+            if self.on_saved is not None:
+                self.on_saved(path, job)
+        except Exception as e:
+            job.data = None
+            if self.on_error is not None:
+                self.on_error(e, job)
+            if large and self.release is not None:
+                self.release()
+            return
+        # 原图已经可以粘贴，之后再生成副本；副本失败不影响原图
+        if self.render is not None:
+            self._render(job, path)
+        job.data = None
+        if large and self.release is not None:
+            self.release()
+
+    def _render(self, job, path):
+        try:
+            with self.metrics.timer('render'):
+                if self._executor is not None:
+                    rendition = self._executor.submit(self.render, job.data, job.crop).result()
+                else:
+                    rendition = self.render(job.data, job.crop)
+            if self.write_rendition is not None:
+                self.write_rendition(rendition, path, job)
+        except Exception as e:
+            print(f"⚠️ 生成截图副本失败: {e}")
+
+    def join(self):
+        """等待所有已提交的截图处理完成"""
+        with self._idle:
+            self._idle.wait_for(lambda: self._outstanding == 0)
+
+    def shutdown(self, wait=True):
+        """停止工作池，wait为True时先处理完已提交的截图"""
+        if wait:
+            self.join()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=5 if wait else 0)
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None